@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步求值模块 - 在工作进程中求值，界面线程不被阻塞
+
+9**9**9、factorial(100000) 这类输入的常量折叠和求值可能要算很久。
+表达式交给一个常驻的工作进程计算，界面每隔一小段时间轮询结果并刷新转圈动画；
+取消时直接终止工作进程，下次求值再启动新的。
+每个任务有 CPU 时间预算（RLIMIT_CPU，超出时内核发出 SIGXCPU 结束进程）
+和内存预算（RLIMIT_AS，超出时求值抛出 MemoryError）。
+没有 resource 模块的平台（Windows）上 CPU 预算按墙钟时间在界面进程中检查，不限制内存。
+"""
+
+import math
+import signal
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CPU_BUDGET = 10.0  # 每个任务的 CPU 秒数
+MEMORY_BUDGET = 1 << 30  # 工作进程地址空间上限，字节
+POLL_INTERVAL = 0.1  # 界面轮询和刷新转圈动画的间隔，秒
+
+SPINNER = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+
+
+def _limit_memory(memory_budget):
+    if resource is None or not memory_budget:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_budget = min(memory_budget, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_budget, hard))
+
+
+def _limit_cpu(cpu_budget):
+    """把 CPU 时间软上限设为 已用时间 + 预算，常驻进程每个任务重新设置"""
+    if resource is None or not cpu_budget:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_budget)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def failure_message(exitcode, cpu_budget):
+    """工作进程意外结束时的错误信息: 被 SIGKILL 终止多半是内存不够，否则是超出了 CPU 预算"""
+    if exitcode == -getattr(signal, "SIGKILL", 9):
+        return "错误: 工作进程被终止（可能超出内存预算）"
+    return f"错误: 超出 CPU 时间预算 ({cpu_budget:g} 秒)"
+
+
+def _serve(conn, cpu_budget, memory_budget):
+    """工作进程主循环: 接收 (任务号, 表达式, 上一次结果, 变量, 模式, 工作表单元格)，
+    返回 (任务号, 结果, 历史记录, 表达式缓存的 (命中, 未命中) 累计次数, 执行后的工作表单元格)
+
+    赋值和删除变量的任务带上受影响的工作表单元格（Worksheet.extract），其他任务为 None。
+    """
+    from logic import CalculatorLogic
+    from worksheet import Worksheet
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C 由界面处理
+    # fork 出的进程继承了 curses 的 SIGTERM 处理函数，它会把共享终端恢复成行缓冲模式，
+    # 取消任务时界面就收不到按键了
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    tracemalloc = sys.modules.get("tracemalloc")
+    if tracemalloc is not None:
+        tracemalloc.stop()  # 界面用 --trace-memory 时 fork 出的进程也在跟踪分配，只会拖慢求值
+    _limit_memory(memory_budget)
+    logic = CalculatorLogic()
+    while True:
+        try:
+            job_id, expr, previous, variables, mode, sheet = conn.recv()
+        except (EOFError, OSError):
+            return
+        _limit_cpu(cpu_budget)
+        logic.result = previous  # ans 取自上一次结果
+        logic.variables = variables
+        if sheet is not None:
+            logic.worksheet = Worksheet.restore(sheet, variables)
+        logic.history.clear()
+        result = logic.evaluate_job(expr, mode)
+        entry = logic.history[-1] if logic.history else None
+        cache = logic.expr_cache
+        updates = None
+        if sheet is not None:
+            updates = logic.worksheet.states(), logic.worksheet.recomputed
+        conn.send((job_id, result, entry, (cache.hits, cache.misses), updates))
+
+
+class AsyncEvaluator:
+    """常驻工作进程的句柄，同一时间只运行一个任务"""
+
+    def __init__(self, cpu_budget=CPU_BUDGET, memory_budget=MEMORY_BUDGET):
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.process = None
+        self.conn = None
+        self.job_id = 0
+        self.started = None  # 当前任务的开始时间，None 表示空闲
+        self.worker_cache = (0, 0)  # 当前工作进程表达式缓存的 (命中, 未命中)
+        self.retired_cache = (0, 0)  # 已结束的工作进程累计的 (命中, 未命中)
+
+    @property
+    def busy(self):
+        return self.started is not None
+
+    def _ensure_worker(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self._stop_worker()
+        import multiprocessing  # 第一次求值时才导入，不拖慢启动
+        parent, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(child, self.cpu_budget, self.memory_budget), daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+
+    def _stop_worker(self):
+        self.retired_cache = tuple(a + b for a, b in zip(self.retired_cache, self.worker_cache))
+        self.worker_cache = (0, 0)
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join(1)
+            self.process = None
+
+    def submit(self, expr, previous="", variables=None, mode=None, sheet=None):
+        """开始求值；已有任务在运行时先取消它。variables 是工作表变量的当前值，
+        mode 是提交时的计算模式（求解模式解方程，其他模式按表达式求值），
+        sheet 是赋值、删除变量时受影响的工作表单元格"""
+        if self.busy:
+            self.cancel()
+        self._ensure_worker()
+        self.job_id += 1
+        self.conn.send((self.job_id, expr, previous, dict(variables or {}), mode, sheet))
+        self.started = time.monotonic()
+
+    def cancel(self):
+        """终止正在运行的任务（连同工作进程）"""
+        if not self.busy:
+            return
+        self._stop_worker()
+        self.started = None
+
+    def poll(self):
+        """任务完成时返回 (结果, 历史记录, 工作表更新)，仍在运行时返回 None
+
+        工作表更新是 (执行后的单元格, 重算的单元格数)，不是工作表命令或任务失败时为 None。
+        """
+        if not self.busy:
+            return None
+        try:
+            while self.conn.poll():
+                job_id, result, entry, self.worker_cache, updates = self.conn.recv()
+                if job_id == self.job_id:
+                    self.started = None
+                    return result, entry, updates
+        except (EOFError, OSError):
+            pass
+        if not self.process.is_alive():
+            return self._failed()
+        if resource is None and self.cpu_budget and self.elapsed() > self.cpu_budget:
+            self._stop_worker()
+            return self._failed()
+        return None
+
+    def _failed(self):
+        """工作进程意外结束: 多半是超出了 CPU 预算"""
+        exitcode = self.process.exitcode if self.process is not None else None
+        self._stop_worker()
+        self.started = None
+        return failure_message(exitcode, self.cpu_budget), None, None
+
+    def cache_counts(self):
+        """工作进程中表达式缓存的 (命中, 未命中) 次数，包括已结束的工作进程"""
+        return tuple(a + b for a, b in zip(self.retired_cache, self.worker_cache))
+
+    def elapsed(self):
+        return time.monotonic() - self.started if self.busy else 0.0
+
+    def progress(self):
+        """转圈动画和已用时间，显示在结果区"""
+        elapsed = self.elapsed()
+        frame = SPINNER[int(elapsed / POLL_INTERVAL) % len(SPINNER)]
+        return f"{frame} 计算中 {elapsed:.1f}s (Esc 取消)"
+
+    def close(self):
+        self._stop_worker()
+        self.started = None
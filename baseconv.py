@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+进制转换模块 - 大整数的分治进制转换
+
+十进制方向使用分治算法并缓存幂表:
+字符串 -> 整数 按位数二分，合并时乘 10**k 写成乘 5**k 再左移 k 位（Karatsuba乘法，次二次），
+5**k 比 10**k 少约 30% 的比特；幂表只缓存分治用到的 叶子块位数 × 2 的幂，其他指数由它们相乘得到；
+整数 -> 字符串 按比特二分，借助 decimal 模块（libmpdec 的快速乘法）合并。
+二、八、十六进制本身与二进制位对齐，直接按位处理即为线性。
+也提供只取前后若干位的预览，界面无需拼出整个字符串。
+"""
+
+import decimal
+
+# 十进制转换时叶子块的大小，需小于 int_max_str_digits 的默认值 4300
+_LEAF_DIGITS = 2048
+_LEAF_BITS = 6800  # 约 2047 位十进制
+
+_FORMAT_CODES = {2: "b", 8: "o", 16: "X"}
+_DIGIT_BITS = {2: 1, 8: 3, 16: 4}
+
+# 进制名称 -> 进制
+BASE_NAMES = {"BIN": 2, "OCT": 8, "DEC": 10, "HEX": 16}
+
+
+class BaseConverter:
+    """二/八/十/十六进制转换，幂表在实例内缓存复用"""
+
+    def __init__(self):
+        self._pow5 = {}  # k -> 5**k (int)，k 为 _LEAF_DIGITS 乘 2 的幂
+        self._pow2 = {}  # k -> 2**k (Decimal)
+        self._context = decimal.Context(
+            prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+    def pow10(self, k):
+        """10**k，由 5**k 左移 k 位得到"""
+        return self._pow5_of(k) << k
+
+    def _pow5_of(self, k):
+        """5**k；只缓存 _LEAF_DIGITS 乘 2 的幂，缓存的大小随最大的 k 对数增长
+
+        其他指数按 k // _LEAF_DIGITS 的二进制位拆成缓存的幂相乘，不进入缓存，
+        否则每个不同位数的数（digit_count、preview）都会留下一串幂。
+        """
+        if k <= _LEAF_DIGITS:
+            return 5 ** k
+        blocks, rest = divmod(k, _LEAF_DIGITS)
+        if not rest and not blocks & (blocks - 1):
+            value = self._pow5.get(k)
+            if value is None:
+                half = self._pow5_of(k // 2)
+                value = self._pow5[k] = half * half
+            return value
+        value = 5 ** rest
+        size = _LEAF_DIGITS
+        while blocks:
+            if blocks & 1:
+                value *= self._pow5_of(size)
+            blocks >>= 1
+            size <<= 1
+        return value
+
+    def _dec_pow2(self, k):
+        value = self._pow2.get(k)
+        if value is None:
+            value = self._context.power(decimal.Decimal(2), k)
+            self._pow2[k] = value
+        return value
+
+    def to_int(self, text, base):
+        """把数字串解析为整数"""
+        text = text.strip().replace("_", "")
+        negative = text.startswith("-")
+        if negative or text.startswith("+"):
+            text = text[1:]
+        if not text:
+            raise ValueError("数字为空")
+        if base == 10:
+            if not text.isdigit() or not text.isascii():
+                raise ValueError(f"无效的十进制数字: {text[:20]}")
+            value = self._parse_decimal(text)
+        else:
+            # 二的幂进制不受 int_max_str_digits 限制，且是线性的
+            value = int(text, base)
+        return -value if negative else value
+
+    def _parse_decimal(self, text):
+        if len(text) <= _LEAF_DIGITS:
+            return int(text)
+        # 低位部分取 2 的幂个叶子块，让各层复用同一组幂
+        k = _LEAF_DIGITS
+        while k * 2 < len(text):
+            k *= 2
+        return ((self._parse_decimal(text[:-k]) * self._pow5_of(k)) << k) + self._parse_decimal(text[-k:])
+
+    def to_str(self, value, base):
+        """把整数格式化为指定进制的数字串（十六进制为大写）"""
+        if base in _FORMAT_CODES:
+            return format(value, _FORMAT_CODES[base])
+        if base != 10:
+            raise ValueError(f"不支持的进制: {base}")
+        if value < 0:
+            return "-" + self.to_str(-value, 10)
+        if value.bit_length() <= _LEAF_BITS:
+            return str(value)
+        return str(self._to_decimal(value, value.bit_length()))
+
+    def _to_decimal(self, value, bits):
+        if bits <= _LEAF_BITS:
+            return decimal.Decimal(value)
+        k = _LEAF_BITS
+        while k * 2 < bits:
+            k *= 2
+        hi = value >> k
+        lo = value - (hi << k)
+        ctx = self._context
+        return ctx.add(ctx.multiply(self._to_decimal(hi, bits - k), self._dec_pow2(k)),
+                       self._to_decimal(lo, k))
+
+    def digit_count(self, value, base):
+        """value 在指定进制下的位数（不含符号）"""
+        value = abs(value)
+        if value == 0:
+            return 1
+        if base in _DIGIT_BITS:
+            return -(-value.bit_length() // _DIGIT_BITS[base])
+        # 先用比特数估计，再和 10**(estimate-1) 比较校正；只算一个大的幂，乘除 10 是线性的
+        estimate = int((value.bit_length() - 1) * 0.30102999566398120) + 1
+        power = self.pow10(estimate - 1)
+        while estimate > 1 and value < power:
+            estimate -= 1
+            power //= 10
+        while value >= power * 10:
+            estimate += 1
+            power *= 10
+        return estimate
+
+    def preview(self, value, base, edge=16):
+        """返回 (前缀, 后缀, 总位数)；位数不超过 2*edge 时后缀为空、前缀为全部数字"""
+        sign = "-" if value < 0 else ""
+        value = abs(value)
+        total = self.digit_count(value, base)
+        if total <= 2 * edge:
+            return sign + self.to_str(value, base), "", total
+        if base in _DIGIT_BITS:
+            shift = _DIGIT_BITS[base] * (total - edge)
+            head = value >> shift
+            tail = value & ((1 << (_DIGIT_BITS[base] * edge)) - 1)
+        else:
+            head = value // self.pow10(total - edge)
+            tail = value % self.pow10(edge)
+        tail = self.to_str(tail, base).rjust(edge, "0")
+        return sign + self.to_str(head, base), tail, total
+
+    def format_preview(self, value, base, edge=16):
+        """预览字符串，例如 '1234…5678 (100000位)'"""
+        head, tail, total = self.preview(value, base, edge)
+        if not tail:
+            return head
+        return f"{head}…{tail} ({total}位)"
+
+    def iter_digits(self, value, base, chunk=65536):
+        """按块产出完整数字串，便于流式写出"""
+        if base in _DIGIT_BITS and value >= 0:
+            bits = _DIGIT_BITS[base]
+            total = self.digit_count(value, base)
+            for end in range(total, 0, -chunk):
+                start = max(0, end - chunk)
+                part = (value >> (bits * start)) & ((1 << (bits * (end - start))) - 1)
+                text = self.to_str(part, base)
+                yield text if end == total else text.rjust(end - start, "0")
+            return
+        text = self.to_str(value, base)
+        for i in range(0, len(text), chunk):
+            yield text[i:i + chunk]
+
+
+def parse_base(name):
+    """把 '16'、'HEX' 之类的进制写法转为整数进制"""
+    name = name.strip().upper()
+    if name in BASE_NAMES:
+        return BASE_NAMES[name]
+    if name.isdigit() and int(name) in (2, 8, 10, 16):
+        return int(name)
+    raise ValueError(f"不支持的进制: {name}")
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批处理模块 - 无界面批量求值
+
+从标准输入或文件逐行读取表达式，用 CalculatorLogic 求值并按输入顺序流式输出。
+输入按块分发给工作进程，每个工作进程持有自己的 CalculatorLogic 实例，同一时间处理一块；
+最多预读 jobs * WINDOW 块，输入再大内存也不会随之增长。
+工作进程和界面的后台求值一样受 CPU 和内存预算限制（见 asynceval），
+某一行超出 CPU 预算时工作进程被终止，该行的结果记为错误，重启工作进程后从这一块的开头重新求值。
+
+标准模式下每块都带上开始时的工作表（变量），结果与进程数和分块无关:
+含赋值或 del 的块算完后传回新的工作表，后面的块等它算完再分发。
+"""
+
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+import modes
+from asynceval import CPU_BUDGET, MEMORY_BUDGET, _limit_cpu, _limit_memory, failure_message
+from logic import CalculatorLogic
+from worksheet import Worksheet
+
+# 命令行模式名 -> 计算器内部模式名
+MODES = modes.cli_modes()
+
+WINDOW = 2  # 每个工作进程对应的预读块数
+
+
+def evaluate_line(logic, mode, line):
+    """在指定模式下对一行输入求值，返回结果字符串"""
+    if mode == "逻辑门":
+        return logic.evaluate_logic_gate(line)
+    if mode == "标准":
+        return logic.evaluate_expression(line)
+    if mode == "求解":
+        return logic.solve_equation(line)
+    logic.expression = line
+    if mode == "进制换算":
+        logic.convert_base()
+    else:
+        logic.test_regex()
+    return logic.result
+
+
+def evaluate_chunk(logic, mode, lines):
+    """求值一块输入，多行结果压成一行以保持一一对应"""
+    results = [evaluate_line(logic, mode, line).replace("\n", " | ") for line in lines]
+    logic.history.clear()  # 批处理不需要历史记录，避免无限增长
+    return results
+
+
+class _CPULimit:
+    """每行的 CPU 时间上限: 介于预算和预算的 1.5 倍之间
+
+    每行都重新设置 RLIMIT_CPU 要两次系统调用，比求值一个简单表达式还慢；
+    上限设为 已用时间 + 1.5 倍预算，已用时间超过上次设置时刻半个预算后才重新设置。
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.renew_at = 0.0
+
+    def check(self):
+        if not self.budget:
+            return
+        now = time.process_time()
+        if now >= self.renew_at:
+            _limit_cpu(self.budget * 1.5)
+            self.renew_at = now + self.budget / 2
+
+
+def _serve(conn, progress, mode, cpu_budget, memory_budget):
+    """工作进程主循环: 接收 (输入行, 已知结果的行号 -> 结果, 工作表, 是否修改工作表)，
+    返回 (结果列表, 修改后的工作表)
+
+    工作表是 (单元格, 变量值)，不是标准模式时为 None；块中没有赋值和 del 时不传回工作表。
+    progress 是与父进程共享的当前行号，工作进程被预算终止时父进程据此知道是哪一行。
+    """
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C 由父进程处理
+    _limit_memory(memory_budget)
+    logic = CalculatorLogic()
+    limit = _CPULimit(cpu_budget)
+    while True:
+        try:
+            lines, known, sheet, modifies = conn.recv()
+        except (EOFError, OSError):
+            return
+        if sheet is not None:
+            logic.worksheet = Worksheet.restore(*sheet)
+            logic.variables = logic.worksheet.values
+        results = []
+        for i, line in enumerate(lines):
+            progress.value = i
+            if i in known:
+                results.append(known[i])
+                continue
+            limit.check()
+            results.append(evaluate_line(logic, mode, line).replace("\n", " | "))
+        logic.history.clear()
+        state = (logic.worksheet.states(), logic.worksheet.values) if modifies else None
+        conn.send((results, state))
+
+
+class _Chunk:
+    """已读入的一块输入"""
+
+    __slots__ = ("lines", "known", "results", "sheet", "modifies", "state")
+
+    def __init__(self, lines, modifies=False):
+        self.lines = lines
+        self.known = {}  # 行号 -> 结果: 使工作进程超出预算的行
+        self.results = None
+        self.sheet = None  # 开始时的工作表
+        self.modifies = modifies  # 是否含赋值或 del
+        self.state = None  # 算完后的工作表
+
+
+class _Worker:
+    """一个求值工作进程的句柄"""
+
+    def __init__(self, mode, cpu_budget, memory_budget):
+        import multiprocessing
+        self.multiprocessing = multiprocessing
+        self.args = (mode, cpu_budget, memory_budget)
+        self.progress = multiprocessing.RawValue("i", 0)
+        self.process = None
+        self.conn = None
+        self.chunk = None  # 正在处理的块
+        self.start()
+
+    def start(self):
+        parent, child = self.multiprocessing.Pipe()
+        self.process = self.multiprocessing.Process(
+            target=_serve, args=(child, self.progress) + self.args, daemon=True)
+        self.process.start()
+        child.close()
+        self.conn = parent
+
+    def stop(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+
+    def submit(self, chunk):
+        self.chunk = chunk
+        self.conn.send((chunk.lines, chunk.known, chunk.sheet, chunk.modifies))
+
+    def collect(self):
+        """取回已完成的结果；工作进程已结束时把当前行记为错误，重启后重新处理这一块"""
+        try:
+            if self.conn.poll():
+                self.chunk.results, self.chunk.state = self.conn.recv()
+                self.chunk = None
+                return
+        except (EOFError, OSError):
+            pass
+        if self.process.is_alive():
+            return
+        self.process.join()
+        self.chunk.known[self.progress.value] = failure_message(self.process.exitcode, self.args[1])
+        self.stop()
+        self.start()
+        self.submit(self.chunk)
+
+
+def iter_chunks(stream, chunk_size):
+    """把输入流切成若干块，跳过空行"""
+    lines = (line.strip() for line in stream)
+    lines = (line for line in lines if line)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_chunk_results(stream, mode="standard", jobs=1, chunk_size=1000,
+                       cpu_budget=CPU_BUDGET, memory_budget=MEMORY_BUDGET):
+    """按输入顺序逐块产出 (输入行列表, 结果列表)
+
+    单进程且不限预算时直接在当前进程中求值，否则交给 jobs 个工作进程。
+    """
+    mode = MODES[mode]
+    chunks = iter_chunks(stream, chunk_size)
+    jobs = max(1, jobs)
+    if jobs == 1 and not cpu_budget and not memory_budget:
+        logic = CalculatorLogic()
+        for chunk in chunks:
+            yield chunk, evaluate_chunk(logic, mode, chunk)
+        return
+
+    from multiprocessing.connection import wait
+    workers = [_Worker(mode, cpu_budget, memory_budget) for _ in range(jobs)]
+    window = deque()  # 已读入、尚未输出的块，按输入顺序
+    queued = deque()  # 其中尚未分发的块
+    exhausted = False
+    sheet = ([], {}) if mode == "标准" else None  # 下一块开始时的工作表
+    barrier = None  # 已分发、尚未算完的含赋值的块
+    try:
+        while True:
+            while not exhausted and len(window) < jobs * WINDOW:
+                lines = next(chunks, None)
+                if lines is None:
+                    exhausted = True
+                    break
+                modifies = sheet is not None and any(
+                    CalculatorLogic.worksheet_target(line) is not None for line in lines)
+                chunk = _Chunk(lines, modifies)
+                window.append(chunk)
+                queued.append(chunk)
+            for worker in workers:
+                if barrier is not None and barrier.results is not None:
+                    sheet = barrier.state
+                    barrier = None
+                if worker.chunk is None and queued and barrier is None:
+                    chunk = queued.popleft()
+                    chunk.sheet = sheet
+                    worker.submit(chunk)
+                    if chunk.modifies:
+                        barrier = chunk
+            while window and window[0].results is not None:
+                chunk = window.popleft()
+                yield chunk.lines, chunk.results
+            if not window:
+                if exhausted:
+                    return
+                continue
+            busy = [worker for worker in workers if worker.chunk is not None]
+            wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy])
+            for worker in busy:
+                worker.collect()
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+def run_batch(stream, out=sys.stdout, mode="standard", jobs=1, chunk_size=1000, echo=False,
+              cpu_budget=CPU_BUDGET, memory_budget=MEMORY_BUDGET):
+    """运行批处理，返回出错的行数"""
+    errors = 0
+    for chunk, results in iter_chunk_results(stream, mode, jobs, chunk_size, cpu_budget, memory_budget):
+        for expr, result in zip(chunk, results):
+            if "错误" in result:
+                errors += 1
+            out.write(f"{expr} = {result}\n" if echo else f"{result}\n")
+        out.flush()  # 每块输出一次，结果就绪即可见
+    return errors
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+BDD模块 - 约简有序二元决策图（ROBDD）
+
+节点存放在平行数组里，用整数编号表示，0 和 1 是两个终结节点。
+唯一表对 (层, 低子节点, 高子节点) 做哈希合并，保证同一函数只有一个节点，
+因此两个表达式等价当且仅当它们的根节点编号相同。
+所有布尔运算都归结为带缓存的 ITE（if-then-else）。
+"""
+
+from logicgate import GateSyntaxError, parse_gate_expression
+
+FALSE = 0
+TRUE = 1
+
+_TERMINAL_LEVEL = 1 << 30  # 终结节点排在所有变量之后
+
+MAX_NODES = 1_000_000
+MAX_CUBES = 64
+
+
+class BDDTooLarge(GateSyntaxError):
+    """节点数或最简式项数超出限制"""
+
+
+class BDD:
+    """共享节点的 BDD 管理器，变量顺序在创建时确定"""
+
+    def __init__(self, order, max_nodes=MAX_NODES):
+        self.order = list(order)
+        self.inputs = self.order
+        self.levels = {name: i for i, name in enumerate(self.order)}
+        self.max_nodes = max_nodes
+        self._level = [_TERMINAL_LEVEL, _TERMINAL_LEVEL]
+        self._low = [FALSE, TRUE]
+        self._high = [FALSE, TRUE]
+        self._unique = {}  # (层, 低, 高) -> 节点
+        self._ite_cache = {}  # (f, g, h) -> 节点
+
+    def __len__(self):
+        return len(self._level)
+
+    def mk(self, level, low, high):
+        """取得唯一节点；两个子节点相同时直接返回子节点"""
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self._unique.get(key)
+        if node is None:
+            node = len(self._level)
+            if node >= self.max_nodes:
+                raise BDDTooLarge(f"BDD 节点超过 {self.max_nodes} 个")
+            self._level.append(level)
+            self._low.append(low)
+            self._high.append(high)
+            self._unique[key] = node
+        return node
+
+    def var(self, name):
+        return self.mk(self.levels[name], FALSE, TRUE)
+
+    def _cofactors(self, node, level):
+        if self._level[node] == level:
+            return self._low[node], self._high[node]
+        return node, node
+
+    def ite(self, f, g, h):
+        """if f then g else h"""
+        if f == TRUE:
+            return g
+        if f == FALSE:
+            return h
+        if g == h:
+            return g
+        if g == TRUE and h == FALSE:
+            return f
+        key = (f, g, h)
+        result = self._ite_cache.get(key)
+        if result is not None:
+            return result
+        level = min(self._level[f], self._level[g], self._level[h])
+        f0, f1 = self._cofactors(f, level)
+        g0, g1 = self._cofactors(g, level)
+        h0, h1 = self._cofactors(h, level)
+        result = self.mk(level, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        self._ite_cache[key] = result
+        return result
+
+    def negate(self, f):
+        return self.ite(f, FALSE, TRUE)
+
+    def conj(self, f, g):
+        return self.ite(f, g, FALSE)
+
+    def disj(self, f, g):
+        return self.ite(f, TRUE, g)
+
+    def xor(self, f, g):
+        return self.ite(f, self.negate(g), g)
+
+    def build(self, tree):
+        """由逻辑门语法树构造 BDD；常量只能是 0 或 1"""
+        kind = tree[0]
+        if kind == "const":
+            if tree[1] not in (0, 1):
+                raise GateSyntaxError("BDD 中常量只能是 0 或 1")
+            return TRUE if tree[1] else FALSE
+        if kind == "var":
+            return self.var(tree[1])
+        args = [self.build(child) for child in tree[1]]
+        if kind == "NOT":
+            return self.negate(args[0])
+        op = {"AND": self.conj, "NAND": self.conj,
+              "OR": self.disj, "NOR": self.disj,
+              "XOR": self.xor, "XNOR": self.xor}[kind]
+        result = args[0]
+        for arg in args[1:]:
+            result = op(result, arg)
+        if kind in ("NAND", "NOR", "XNOR"):
+            result = self.negate(result)
+        return result
+
+    def size(self, root):
+        """从 root 可达的节点数（含终结节点）"""
+        seen = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            if node > TRUE:
+                stack.append(self._low[node])
+                stack.append(self._high[node])
+        return len(seen)
+
+    def sat_count(self, root):
+        """满足赋值的个数（对全部变量计数）"""
+        n = len(self.order)
+        memo = {FALSE: 0, TRUE: 1}
+
+        def level(node):
+            return n if node <= TRUE else self._level[node]
+
+        def count(node):
+            # 返回层 level(node) 及以下变量的满足赋值数
+            if node in memo:
+                return memo[node]
+            lo, hi = self._low[node], self._high[node]
+            here = level(node)
+            result = (count(lo) << (level(lo) - here - 1)) + (count(hi) << (level(hi) - here - 1))
+            memo[node] = result
+            return result
+
+        return count(root) << level(root)
+
+    def any_sat(self, root):
+        """一个满足赋值 {变量: 0/1}，未出现的变量不列出；不可满足时返回 None"""
+        if root == FALSE:
+            return None
+        assignment = {}
+        node = root
+        while node > TRUE:
+            name = self.order[self._level[node]]
+            if self._low[node] != FALSE:
+                assignment[name] = 0
+                node = self._low[node]
+            else:
+                assignment[name] = 1
+                node = self._high[node]
+        return assignment
+
+    def isop(self, root, max_cubes=MAX_CUBES):
+        """不可约的积之和覆盖（Minato-Morreale），返回 [(层, 取值) 元组, ...]"""
+        memo = {}
+
+        def cover(lower, upper):
+            if lower == FALSE:
+                return (), FALSE
+            if upper == TRUE:
+                return ((),), TRUE
+            key = (lower, upper)
+            if key in memo:
+                return memo[key]
+            level = min(self._level[lower], self._level[upper])
+            l0, l1 = self._cofactors(lower, level)
+            u0, u1 = self._cofactors(upper, level)
+            c0, f0 = cover(self.conj(l0, self.negate(u1)), u0)
+            c1, f1 = cover(self.conj(l1, self.negate(u0)), u1)
+            rest = self.disj(self.conj(l0, self.negate(f0)), self.conj(l1, self.negate(f1)))
+            cd, fd = cover(rest, self.conj(u0, u1))
+            cubes = (tuple(((level, 0),) + c for c in c0)
+                     + tuple(((level, 1),) + c for c in c1) + cd)
+            if len(cubes) > max_cubes:
+                raise BDDTooLarge(f"最简式超过 {max_cubes} 项")
+            result = cubes, self.mk(level, self.disj(f0, fd), self.disj(f1, fd))
+            memo[key] = result
+            return result
+
+        return list(cover(root, root)[0])
+
+    def format_cover(self, cubes):
+        """把积之和格式化为可重新解析的中缀表达式"""
+        if not cubes:
+            return "0"
+        terms = []
+        for cube in cubes:
+            if not cube:
+                return "1"
+            literals = [self.order[level] if value else f"NOT {self.order[level]}"
+                        for level, value in sorted(cube)]
+            terms.append(" AND ".join(literals))
+        return " OR ".join(terms)
+
+
+def order_candidates(trees):
+    """候选变量顺序: 深度优先首次出现顺序、其逆序、按出现次数降序"""
+    dfs = []
+    counts = {}
+    stack = list(reversed(trees))
+    while stack:
+        node = stack.pop()
+        if node[0] == "var":
+            counts[node[1]] = counts.get(node[1], 0) + 1
+            if node[1] not in dfs:
+                dfs.append(node[1])
+        elif node[0] != "const":
+            stack.extend(reversed(node[1]))
+    by_count = sorted(dfs, key=lambda name: (-counts[name], dfs.index(name)))
+    candidates = []
+    for order in (dfs, dfs[::-1], by_count):
+        if order not in candidates:
+            candidates.append(order)
+    return candidates
+
+
+def build_shared(texts, max_nodes=MAX_NODES):
+    """在同一个管理器中构造多个表达式的 BDD，返回 (管理器, 根节点列表)
+
+    依次尝试各个候选顺序，保留节点最少的一个；超出节点上限的顺序直接放弃。
+    """
+    trees = []
+    for text in texts:
+        tree, _, explicit = parse_gate_expression(text)
+        if explicit:
+            raise GateSyntaxError("BDD 不支持 @位宽")
+        trees.append(tree)
+
+    candidates = order_candidates(trees)
+    best = None
+    for order in candidates:
+        limit = max_nodes if best is None else min(max_nodes, len(best[0]))
+        manager = BDD(order, limit)
+        try:
+            roots = [manager.build(tree) for tree in trees]
+        except BDDTooLarge:
+            continue
+        if best is None or len(manager) < len(best[0]):
+            best = (manager, roots)
+    if best is None:
+        raise BDDTooLarge(f"BDD 节点超过 {max_nodes} 个")
+    best[0].max_nodes = max_nodes  # 比较顺序时收紧过的上限，后续运算恢复原值
+    best[0].inputs = candidates[0]  # 变量在表达式中的出现顺序，用于显示
+    return best
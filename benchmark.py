@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+微基准测试 - 求值热路径的耗时、JSON 基线和回归比较
+
+覆盖 safe_eval、evaluate_expression、evaluate_logic_gate、convert_base、test_regex
+和 CalculatorUI.draw（画在 headless.FakeScreen 上），每项用有代表性的输入:
+长短表达式、宽位掩码、超长数字的进制转换、会让回溯引擎卡住的正则、整屏重绘和局部重绘。
+每项先按 timeit.autorange 定出循环次数，再重复若干组，取单次耗时的最小值
+（最不受系统噪声影响）作为比较的依据，同时记录中位数。
+"""
+
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+
+REPEAT = 5  # 每项重复的组数
+THRESHOLD = 10.0  # 默认的回归阈值，百分比
+
+
+class Benchmark:
+    """一项基准: setup() 返回要计时的无参函数"""
+
+    def __init__(self, name, setup, description):
+        self.name = name
+        self.setup = setup
+        self.description = description
+
+
+def _logic():
+    """同步求值的 CalculatorLogic，工作表中定义了 x，表达式里的 x 不会被常量折叠掉"""
+    from logic import CalculatorLogic
+    logic = CalculatorLogic()
+    logic.worksheet.assign("x", "0.5")
+    return logic
+
+
+def _long_expression(terms=200):
+    rng = random.Random(1)
+    funcs = ("sin", "cos", "sqrt", "exp", "log")
+    parts = [f"{rng.choice(funcs)}(x+{rng.randint(1, 99)}.{rng.randint(0, 9)})*{rng.randint(1, 9)}"
+             for _ in range(terms)]
+    return "+".join(parts)
+
+
+def _safe_eval(expr, cached=True):
+    def setup():
+        logic = _logic()
+        if cached:
+            logic.safe_eval(expr)  # 预先编译，测缓存命中后的求值
+            return lambda: logic.safe_eval(expr)
+
+        def run():
+            logic.expr_cache.clear()
+            return logic.safe_eval(expr)
+        return run
+    return setup
+
+
+def _evaluate_expression(expr):
+    def setup():
+        logic = _logic()
+        return lambda: logic.evaluate_expression(expr)
+    return setup
+
+
+def _bits(width, seed):
+    rng = random.Random(seed)
+    return format(rng.getrandbits(width) | 1 << (width - 1), "b")
+
+
+def _logic_gate(expr):
+    def setup():
+        logic = _logic()
+        text = expr()
+        return lambda: logic.evaluate_logic_gate(text)
+    return setup
+
+
+def _convert_base(expr):
+    def setup():
+        logic = _logic()
+        text = expr()
+
+        def run():
+            logic.expression = text
+            logic.convert_base()
+            return logic.result
+        return run
+    return setup
+
+
+def _test_regex(expr):
+    def setup():
+        logic = _logic()
+
+        def run():
+            logic.expression = expr
+            logic.test_regex()
+            return logic.result
+        return run
+    return setup
+
+
+def _draw(full, size=(40, 120)):
+    """整屏重绘（每次作废全部面板）或只移动选中按钮的局部重绘；在 headless() 中运行"""
+    def setup():
+        from headless import FakeScreen
+        from ui import CalculatorUI
+        logic = _logic()
+        for i in range(200):
+            logic.history.add(f"sqrt({i})*{i}+sin({i})", str(i * 1.5), "标准")
+        logic.expression = _long_expression(30)
+        logic.result = "12345.678901234"
+        screen = FakeScreen(*size)
+        ui = CalculatorUI(screen)
+        state = {"col": 0}
+
+        def run():
+            if full:
+                ui.invalidate()
+                col = 0
+            else:
+                state["col"] = col = (state["col"] + 1) % 6
+            ui.draw(logic.editor, logic.result, logic.history, 1, col,
+                    logic.cursor_pos, False, logic.mode)
+            return screen
+        return run
+    return setup
+
+
+BENCHMARKS = [
+    Benchmark("safe_eval.short", _safe_eval("1+2*x"), "短表达式，缓存命中"),
+    Benchmark("safe_eval.long", _safe_eval(_long_expression()), "200 项表达式，缓存命中"),
+    Benchmark("safe_eval.long_compile", _safe_eval(_long_expression(), cached=False),
+              "200 项表达式，每次重新编译"),
+    Benchmark("evaluate_expression.short", _evaluate_expression("sin(x)+2^10"),
+              "短表达式，含历史记录"),
+    Benchmark("evaluate_expression.long", _evaluate_expression(_long_expression()),
+              "200 项表达式，含历史记录"),
+    Benchmark("evaluate_logic_gate.64", _logic_gate(lambda: f"{_bits(64, 1)} AND {_bits(64, 2)}"),
+              "64 位 AND"),
+    Benchmark("evaluate_logic_gate.wide",
+              _logic_gate(lambda: f"XOR({_bits(65536, 1)}, NAND({_bits(65536, 2)}, {_bits(65536, 3)}))"),
+              "65536 位嵌套 XOR/NAND"),
+    Benchmark("evaluate_logic_gate.not_wide", _logic_gate(lambda: "NOT(0) @1000000"),
+              "一百万位 NOT"),
+    Benchmark("convert_base.small", _convert_base(lambda: "16:FF"), "16:FF"),
+    Benchmark("convert_base.huge_dec",
+              _convert_base(lambda: "10:" + "".join(random.Random(4).choices("0123456789", k=20000))),
+              "两万位十进制转各进制"),
+    Benchmark("convert_base.huge_hex",
+              _convert_base(lambda: "16:" + "".join(random.Random(5).choices("0123456789ABCDEF", k=20000))),
+              "两万位十六进制转各进制"),
+    Benchmark("test_regex.simple", _test_regex(r"\d+,abc 123 def 4567"), "简单模式"),
+    Benchmark("test_regex.nested_quantifier", _test_regex("(a+)+$," + "a" * 5000 + "b"),
+              "(a+)+$，回溯引擎上是指数时间"),
+    Benchmark("test_regex.alternation", _test_regex("(a|aa)+c," + "a" * 5000),
+              "(a|aa)+c，回溯引擎上是指数时间"),
+    Benchmark("test_regex.findall_long", _test_regex(r"\w+@\w+\.com," + "x@y.com foo " * 2000),
+              "长文本 findall"),
+    Benchmark("draw.full", _draw(True), "120x40 整屏重绘"),
+    Benchmark("draw.selection", _draw(False), "120x40 移动选中按钮的局部重绘"),
+]
+
+
+def measure(benchmark, repeat=REPEAT):
+    """测一项，返回 {"best": 秒, "median": 秒, "loops": 每组循环次数}"""
+    func = benchmark.setup()
+    func()  # 预热
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    times = [t / loops for t in timer.repeat(repeat, loops)]
+    return {"best": min(times), "median": statistics.median(times), "loops": loops}
+
+
+def run_suite(pattern="", repeat=REPEAT, out=None):
+    """运行名字包含 pattern 的基准，返回可以保存成 JSON 的结果"""
+    from headless import headless
+    results = {}
+    with headless():  # 绘制基准画在 FakeScreen 上
+        for benchmark in BENCHMARKS:
+            if pattern not in benchmark.name:
+                continue
+            results[benchmark.name] = result = measure(benchmark, repeat)
+            if out is not None:
+                out.write(f"{benchmark.name:<32} {_format_time(result['best']):>10}  "
+                          f"(中位数 {_format_time(result['median'])}, {benchmark.description})\n")
+                out.flush()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "numpy": _has_numpy(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _has_numpy():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _format_time(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.2f} µs"
+
+
+def save(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """比较两份结果，返回 [(名字, 基线秒数, 当前秒数, 变化百分比, 状态)]
+
+    状态是 "回归"（慢了超过 threshold%）、"改进"（快了超过 threshold%）、"持平"、
+    "新增" 或 "缺失"。
+    """
+    old = baseline["results"]
+    new = current["results"]
+    rows = []
+    for name in list(old) + [n for n in new if n not in old]:
+        if name not in new:
+            rows.append((name, old[name]["best"], None, None, "缺失"))
+            continue
+        if name not in old:
+            rows.append((name, None, new[name]["best"], None, "新增"))
+            continue
+        before, after = old[name]["best"], new[name]["best"]
+        change = (after - before) / before * 100 if before else 0.0
+        if change > threshold:
+            status = "回归"
+        elif change < -threshold:
+            status = "改进"
+        else:
+            status = "持平"
+        rows.append((name, before, after, change, status))
+    return rows
+
+
+def report_comparison(rows, threshold=THRESHOLD, out=sys.stdout):
+    """打印比较结果，有回归时返回 False"""
+    for name, before, after, change, status in rows:
+        before_text = _format_time(before) if before is not None else "-"
+        after_text = _format_time(after) if after is not None else "-"
+        change_text = f"{change:+.1f}%" if change is not None else ""
+        out.write(f"{name:<32} {before_text:>10} -> {after_text:>10} {change_text:>8}  {status}\n")
+    regressions = [row for row in rows if row[4] == "回归"]
+    if regressions:
+        out.write(f"{len(regressions)} 项回归超过 {threshold:g}%\n")
+        return False
+    out.write(f"没有超过 {threshold:g}% 的回归\n")
+    return True
@@ -1,59 +1,288 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-
-"""
-TUICalculator - 计算器主类
-"""
-import math
-import curses
-from ui import CalculatorUI
-from logic import CalculatorLogic
-
-class TUICalculator:
-    def __init__(self, stdscr):
-        self.stdscr = stdscr
-        self.ui = CalculatorUI(stdscr)
-        self.logic = CalculatorLogic()
-        self.show_help = False
-        
-    def run(self):
-        """运行计算器主循环"""
-        curses.curs_set(1)  # 显示光标
-        self.ui.draw(self.logic.expression, self.logic.result, 
-                    self.logic.history, self.ui.selected_row, 
-                    self.ui.selected_col, self.logic.cursor_pos, 
-                    self.show_help, self.logic.mode)
-
-        while True:
-            try:
-                key = self.stdscr.getch()
-            except:
-                continue
-
-            if self.show_help:
-                self.show_help = False
-                self.ui.draw(self.logic.expression, self.logic.result, 
-                            self.logic.history, self.ui.selected_row, 
-                            self.ui.selected_col, self.logic.cursor_pos, 
-                            self.show_help, self.logic.mode)
-                continue
-
-            # 处理按键
-            result = self.logic.handle_key(key, self.ui.selected_row, self.ui.selected_col)
-            
-            if result == "SHOW_HELP":
-                self.show_help = True
-            elif result == "QUIT":
-                break
-            elif result == "UPDATE_UI":
-                # 更新UI选择状态
-                if "selected_row" in self.logic.ui_state:
-                    self.ui.selected_row = self.logic.ui_state["selected_row"]
-                if "selected_col" in self.logic.ui_state:
-                    self.ui.selected_col = self.logic.ui_state["selected_col"]
-            
-            # 绘制UI
-            self.ui.draw(self.logic.expression, self.logic.result, 
-                        self.logic.history, self.ui.selected_row, 
-                        self.ui.selected_col, self.logic.cursor_pos, 
-                        self.show_help, self.logic.mode)
\ No newline at end of file
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TUICalculator - 计算器主类
+"""
+import sys
+import threading
+import time
+import curses
+from ui import CalculatorUI
+from logic import CalculatorLogic
+from asynceval import AsyncEvaluator, CPU_BUDGET, MEMORY_BUDGET, POLL_INTERVAL
+from history import HistoryLog, DEFAULT_PATH as HISTORY_PATH
+from perf import PerfMonitor
+
+# 括号粘贴模式的起止标记: ESC [ 2 0 0 ~ / ESC [ 2 0 1 ~
+PASTE_START = (27, ord('['), ord('2'), ord('0'), ord('0'), ord('~'))
+PASTE_END = (27, ord('['), ord('2'), ord('0'), ord('1'), ord('~'))
+
+# 这些可打印字符在 handle_key 中有特殊含义，不能合并成普通文本插入
+COMMAND_KEYS = frozenset(map(ord, "qQhHjJcC \n"))
+
+PERF_KEY = 16  # Ctrl-P: 在状态栏显示/隐藏性能行
+
+
+class TUICalculator:
+    def __init__(self, stdscr, max_fps=60, cpu_budget=CPU_BUDGET, memory_budget=MEMORY_BUDGET,
+                 history_path=HISTORY_PATH, trace=None, recorder=None):
+        self.stdscr = stdscr
+        self.ui = CalculatorUI(stdscr)
+        self.logic = CalculatorLogic()
+        self.logic.evaluator = AsyncEvaluator(cpu_budget, memory_budget)  # 求值放到工作进程
+        self.perf = PerfMonitor(trace)  # trace 是 perf.TraceWriter，导出时间线
+        self.logic.perf = self.perf
+        self.recorder = recorder  # replay.KeyRecorder，把读到的按键连同时间写入文件
+        if history_path:
+            try:
+                self.logic.history.attach(HistoryLog(history_path))
+            except OSError as e:
+                self.logic.result = f"错误: 无法打开历史记录文件: {e}"
+        self.show_help = False
+        self.frame_interval = 1.0 / max_fps  # 帧率上限
+        self.last_frame = 0.0
+
+    def draw(self):
+        """绘制一帧"""
+        start = time.perf_counter()
+        self.ui.perf_line = self.perf.status_line(self.cache_rates()) if self.perf.visible else None
+        misses = self.ui.panel_misses
+        self.ui.draw(self.logic.editor, self.logic.result,
+                    self.logic.history, self.ui.selected_row,
+                    self.ui.selected_col, self.logic.cursor_pos,
+                    self.show_help, self.logic.mode, self.logic.plot,
+                    self.logic.table, self.logic.search)
+        self.perf.frame(start, time.perf_counter(), self.ui.flush_time, self.ui.panel_misses - misses)
+        self.last_frame = time.monotonic()
+
+    def cache_rates(self):
+        """性能行显示的缓存命中率: 表达式编译缓存、面板重绘缓存，绘图时加上采样缓存
+
+        标准模式的求值在工作进程里做，编译缓存的命中数由工作进程随结果一起送回，
+        与界面进程中（工作表、逻辑门等同步求值）的计数合在一起算。
+        """
+        cache = self.logic.expr_cache
+        hits, misses = cache.hits, cache.misses
+        if self.logic.evaluator is not None:
+            worker_hits, worker_misses = self.logic.evaluator.cache_counts()
+            hits += worker_hits
+            misses += worker_misses
+        rates = [("编译", hits / (hits + misses) if hits + misses else 0.0),
+                 ("面板", self.ui.panel_hit_rate())]
+        plot = self.logic.plot
+        if plot is not None and plot.sample_hits + plot.sample_misses:
+            rates.append(("采样", plot.sample_hits / (plot.sample_hits + plot.sample_misses)))
+        return rates
+
+    def set_bracketed_paste(self, enabled):
+        """开关终端的括号粘贴模式"""
+        try:
+            sys.stdout.write("\x1b[?2004h" if enabled else "\x1b[?2004l")
+            sys.stdout.flush()
+        except (OSError, ValueError):
+            pass
+
+    def read_keys(self, timeout_ms=-1):
+        """读取一批按键: 等待第一个键，然后取完所有已到达的键
+
+        如果批次中有未结束的括号粘贴，继续等待直到粘贴结束，
+        保证一次粘贴总是在同一批里处理。
+        """
+        self.stdscr.timeout(timeout_ms)
+        try:
+            key = self.stdscr.getch()
+        except curses.error:
+            return []
+        if key == -1:
+            return []
+        keys = [key]
+        self.stdscr.timeout(0)
+        in_paste = False
+        while True:
+            try:
+                key = self.stdscr.getch()
+            except curses.error:
+                key = -1
+            if key == -1:
+                in_paste = self.paste_open(keys)
+                if not in_paste:
+                    break
+                # 粘贴内容还在路上，稍等片刻
+                self.stdscr.timeout(50)
+                try:
+                    key = self.stdscr.getch()
+                except curses.error:
+                    key = -1
+                self.stdscr.timeout(0)
+                if key == -1:
+                    break
+            keys.append(key)
+        if self.recorder is not None:
+            self.recorder.record(keys, self.stdscr.getmaxyx())
+        return keys
+
+    @staticmethod
+    def paste_open(keys):
+        """批次末尾是否有尚未结束的括号粘贴"""
+        start = _rfind(keys, PASTE_START)
+        return start != -1 and _rfind(keys, PASTE_END) < start
+
+    @staticmethod
+    def coalesce(keys):
+        """把按键批次整理成事件: ('text', 字符串) 或 ('key', 键码)
+
+        括号粘贴的内容和连续的普通可打印字符合并成一次文本插入。
+        """
+        events = []
+        text = []
+
+        def flush():
+            if text:
+                events.append(("text", "".join(text)))
+                text.clear()
+
+        i = 0
+        n = len(keys)
+        while i < n:
+            if tuple(keys[i:i + len(PASTE_START)]) == PASTE_START:
+                flush()
+                start = i + len(PASTE_START)
+                end = _find(keys, PASTE_END, start)
+                stop = n if end == -1 else end
+                data = bytes(k for k in keys[start:stop] if 0 <= k < 256)
+                pasted = data.decode("utf-8", "replace").replace("\t", " ")
+                pasted = "".join(ch for ch in pasted if ch.isprintable())
+                if pasted:
+                    events.append(("text", pasted))
+                i = n if end == -1 else end + len(PASTE_END)
+                continue
+            key = keys[i]
+            if ord(' ') <= key <= ord('~') and key not in COMMAND_KEYS:
+                text.append(chr(key))
+            else:
+                flush()
+                events.append(("key", key))
+            i += 1
+        flush()
+        return events
+
+    def apply(self, event):
+        """处理一个事件，返回 False 表示退出"""
+        kind, value = event
+        if kind == "key" and value == PERF_KEY:
+            self.perf.visible = not self.perf.visible
+            return True
+        if self.show_help:
+            # 帮助界面下任意输入都只是关闭帮助
+            self.show_help = False
+            return True
+
+        if kind == "text":
+            if self.logic.search is not None:
+                self.logic.search.type(value)
+            elif self.logic.plot is not None or self.logic.table is not None:
+                # 绘图和真值表状态下文本按键逐个交给对应的处理
+                for ch in value:
+                    self.logic.handle_key(ord(ch), self.ui.selected_row, self.ui.selected_col)
+            else:
+                self.logic.insert_text(value)
+            return True
+
+        # 处理按键
+        result = self.logic.handle_key(value, self.ui.selected_row, self.ui.selected_col)
+
+        if result == "SHOW_HELP":
+            self.show_help = True
+        elif result == "QUIT":
+            return False
+        elif result == "UPDATE_UI":
+            # 更新UI选择状态
+            if "selected_row" in self.logic.ui_state:
+                self.ui.selected_row = self.logic.ui_state["selected_row"]
+            if "selected_col" in self.logic.ui_state:
+                self.ui.selected_col = self.logic.ui_state["selected_col"]
+        return True
+
+    def run(self, first_frame_only=False):
+        """运行计算器主循环；first_frame_only 为真时画完第一帧就返回（启动基准测试用）"""
+        curses.curs_set(1)  # 显示光标
+        if hasattr(curses, "set_escdelay"):
+            curses.set_escdelay(25)
+        self.set_bracketed_paste(True)
+        try:
+            self.draw()
+            if first_frame_only:
+                return
+            # 搜索索引要读完整个日志，放到后台建立，而且等第一帧画完再开始，不拖慢启动
+            threading.Thread(target=self.logic.history.build_index, daemon=True).start()
+            pending = False  # 是否有尚未绘制的改动
+            while True:
+                timeout_ms = -1
+                if pending:
+                    remaining = self.frame_interval - (time.monotonic() - self.last_frame)
+                    timeout_ms = max(0, int(remaining * 1000))
+                searching = self.logic.search is not None and self.logic.search.partial
+                if self.logic.evaluator.busy or searching:
+                    # 后台求值时定时醒来，取结果并刷新转圈动画；搜索时等待索引建好
+                    poll_ms = int(POLL_INTERVAL * 1000)
+                    timeout_ms = poll_ms if timeout_ms < 0 else min(timeout_ms, poll_ms)
+                keys = self.read_keys(timeout_ms)
+                running, pending = self.step(keys, pending)
+                if not running:
+                    return
+        finally:
+            self.logic.evaluator.close()
+            self.logic.history.close()
+            self.perf.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            self.set_bracketed_paste(False)
+
+    def step(self, keys, pending=False):
+        """主循环的一轮: 处理一批按键，取回后台结果，需要时绘制
+
+        pending 表示之前是否有尚未绘制的改动；返回 (是否继续运行, 是否仍有未绘制的改动)。
+        按键回放也用这个方法驱动，和真实的主循环走同一条路径。
+        """
+        cycle_start = time.perf_counter()
+        for event in self.coalesce(keys):
+            start = time.perf_counter()
+            running = self.apply(event)
+            self.perf.key(event, start, time.perf_counter())
+            if not running:
+                return False, pending
+        pending = pending or bool(keys)
+        if self.logic.poll_evaluation():
+            pending = True
+        if self.logic.search is not None and self.logic.search.refresh():
+            pending = True
+
+        # 整批输入只绘制一次，并受帧率上限约束
+        drawn = pending and time.monotonic() - self.last_frame >= self.frame_interval
+        if drawn:
+            self.draw()
+            pending = False
+        if keys or drawn:
+            self.perf.cycle(cycle_start, time.perf_counter(), len(keys))
+        return True, pending
+
+
+def _find(keys, marker, start=0):
+    """在按键序列中查找标记，返回起始下标或 -1"""
+    m = len(marker)
+    first = marker[0]
+    for i in range(start, len(keys) - m + 1):
+        if keys[i] == first and tuple(keys[i:i + m]) == marker:
+            return i
+    return -1
+
+
+def _rfind(keys, marker):
+    """从后往前查找标记，返回起始下标或 -1"""
+    m = len(marker)
+    first = marker[0]
+    for i in range(len(keys) - m, -1, -1):
+        if keys[i] == first and tuple(keys[i:i + m]) == marker:
+            return i
+    return -1
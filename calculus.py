@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+微积分模块 - ∫ 自适应 Gauss–Kronrod 求积，∂ 符号求导（退回 Richardson 外推数值微分）
+
+写法: ∫(f, a, b) dx 求定积分（上下限可以是 ±inf），∂(f) dx 求导函数的表达式，
+∂(f, x0) dx 求 x0 处的导数，∂(f, x0, n) dx 求 n 阶导数；
+省略 dx 时积分变量取 f 中唯一的未定义变量，默认 x。
+求导先做符号求导（symbolic.py），编译后在 x0 处求值，结果是精确的；
+f 中有不能符号求导的函数（如 floor）或导数在 x0 处无定义时改用数值微分。
+被积函数只编译一次，每一轮把所有要求值的节点拼成一个数组批量求值
+（有 NumPy 时走 NumPy 向量化，否则逐点调用编译好的函数，见 plotter.evaluate_grid），
+不逐点 eval。
+"""
+
+import math
+import re
+
+from evaluator import ExpressionError, compile_expression, free_names, parse_expression
+from plotter import evaluate_grid
+from symbolic import CompiledTerm, derivative, display, free_variables, node_count
+from truthtable import split_outputs
+
+EPSABS = 1e-13  # 积分的绝对误差目标
+EPSREL = 1e-12  # 积分的相对误差目标
+LIMIT = 2000  # 最多细分的区间数
+MAX_ORDER = 20  # 导数的最高阶数: 符号导数的节点数随阶数多项式增长，数值求导更早就失去精度
+
+# 15 点 Kronrod 节点（[-1, 1] 上的正半部分，最后一个是 0）和权重，取自 QUADPACK qk15；
+# 下标为奇数的节点同时是 7 点 Gauss 节点
+_XGK = (0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+        0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+        0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+        0.207784955007898467600689403773245, 0.0)
+_WGK = (0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+        0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+        0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+        0.204432940075298892414161999234649, 0.209482141084727828012999174891714)
+_WG = (0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+       0.381830050505118944950369775488975, 0.417959183673469387755102040816327)
+
+# 展开成 15 个节点: -x0..-x6, 0, x6..x0，以及对应的 Kronrod 和 Gauss 权重
+NODES = tuple(-x for x in _XGK[:7]) + (0.0,) + tuple(reversed(_XGK[:7]))
+_KW = _WGK[:7] + (_WGK[7],) + tuple(reversed(_WGK[:7]))
+_GW7 = tuple(_WG[k // 2] if k % 2 else 0.0 for k in range(7))
+_GW = _GW7 + (_WG[3],) + tuple(reversed(_GW7))
+
+_EPMACH = 2.220446049250313e-16
+_UFLOW = 2.2250738585072014e-308
+
+_RICHARDSON_STEP = 1.4  # 每一级步长缩小的倍数
+_RICHARDSON_LEVELS = 10
+_RICHARDSON_SAFE = 2.0  # 外推误差比最好结果大这么多倍时停止
+
+_CALL_RE = re.compile(r"([∫∂])\((.*)\)(?:d([^\W\d]\w*))?", re.DOTALL)
+
+
+class Integrand:
+    """编译好的单变量函数，其余变量绑定为常数；调用时对整组点批量求值"""
+
+    def __init__(self, source, var, variables):
+        tree = parse_expression(source)
+        others = [name for name in free_names(tree) if name != var]
+        for name in others:
+            if name not in variables:
+                raise ExpressionError(f"未定义的变量 '{name}'")
+        self.compiled = compile_expression(source, params=[var] + others)
+        self.args = tuple(variables[name] for name in others)
+        self.calls = 0
+
+    def __call__(self, xs):
+        self.calls += len(xs)
+        return evaluate_grid(self.compiled, xs, self.args).tolist()
+
+
+def _transform(f, a, b):
+    """无穷区间换元到有限区间，返回 (g, a', b')，使 ∫f(a..b) = ∫g(a'..b')"""
+    if math.isinf(a) and math.isinf(b):
+        # x = t/(1-t²), t ∈ (-1, 1)
+        def g(ts):
+            xs = [t / (1 - t * t) for t in ts]
+            return [y * (1 + t * t) / (1 - t * t) ** 2 for y, t in zip(f(xs), ts)]
+        return g, -1.0, 1.0
+    if math.isinf(b):
+        # x = a + t/(1-t), t ∈ [0, 1)
+        def g(ts):
+            xs = [a + t / (1 - t) for t in ts]
+            return [y / (1 - t) ** 2 for y, t in zip(f(xs), ts)]
+        return g, 0.0, 1.0
+    if math.isinf(a):
+        # x = b - (1-t)/t, t ∈ (0, 1]
+        def g(ts):
+            xs = [b - (1 - t) / t for t in ts]
+            return [y / (t * t) for y, t in zip(f(xs), ts)]
+        return g, 0.0, 1.0
+    return f, a, b
+
+
+def _kronrod(f, intervals):
+    """对一批区间做 15 点 Gauss–Kronrod 求积，所有节点一次求值
+
+    返回 [(a, b, 积分, 误差估计, 舍入误差下限)]，误差估计按 QUADPACK qk15 的方式缩放。
+    """
+    xs = []
+    for a, b in intervals:
+        center = 0.5 * (a + b)
+        half = 0.5 * (b - a)
+        xs.extend(center + half * node for node in NODES)
+    ys = f(xs)
+    out = []
+    for i, (a, b) in enumerate(intervals):
+        fv = ys[15 * i:15 * i + 15]
+        half = 0.5 * (b - a)
+        resk = math.fsum(w * y for w, y in zip(_KW, fv))
+        resg = math.fsum(w * y for w, y in zip(_GW, fv))
+        if not math.isfinite(resk):
+            raise ValueError(f"函数在 [{a:g}, {b:g}] 内没有定义或不收敛")
+        mean = 0.5 * resk
+        resabs = abs(half) * sum(w * abs(y) for w, y in zip(_KW, fv))
+        resasc = abs(half) * sum(w * abs(y - mean) for w, y in zip(_KW, fv))
+        err = abs((resk - resg) * half)
+        if resasc and err:
+            err = resasc * min(1.0, (200 * err / resasc) ** 1.5)
+        floor = _EPMACH * 50 * resabs if resabs > _UFLOW / (50 * _EPMACH) else 0.0
+        out.append((a, b, resk * half, max(err, floor), floor))
+    return out
+
+
+def integrate(f, a, b, epsabs=EPSABS, epsrel=EPSREL, limit=LIMIT):
+    """自适应求积，返回 (积分, 误差估计, 区间数)
+
+    每一轮按误差从大到小挑出区间对分，直到剩下的区间误差之和降到容差的一半以下，
+    新区间的节点一起求值；误差已经到舍入下限的区间不再细分。
+    """
+    if a == b:
+        return 0.0, 0.0, 0
+    sign = 1.0
+    if a > b:
+        a, b, sign = b, a, -1.0
+    f, a, b = _transform(f, a, b)
+    intervals = _kronrod(f, [(a, b)])
+    while True:
+        total = math.fsum(iv[2] for iv in intervals)
+        error = sum(iv[3] for iv in intervals)
+        tol = max(epsabs, epsrel * abs(total))
+        if error <= tol or len(intervals) >= limit:
+            break
+        keep = []
+        split = []
+        excess = error - 0.5 * tol  # 还需要消掉的误差
+        for iv in sorted(intervals, key=lambda iv: iv[3], reverse=True):
+            lo, hi, _, err, floor = iv
+            mid = 0.5 * (lo + hi)
+            if (excess > 0 and err > floor and lo < mid < hi
+                    and len(intervals) + len(split) // 2 < limit):
+                split.append((lo, mid))
+                split.append((mid, hi))
+                excess -= err
+            else:
+                keep.append(iv)
+        if not split:
+            break  # 已经细到浮点精度，再分也不会更准
+        intervals = keep + _kronrod(f, split)
+    return sign * total, error, len(intervals)
+
+
+def _extrapolate(estimates):
+    """Ridders 外推表: 步长依次缩小 _RICHARDSON_STEP 倍的差分估计 -> (最好的值, 误差估计)"""
+    best, err = estimates[0], math.inf
+    table = [[estimates[0]]]
+    for i in range(1, len(estimates)):
+        row = [estimates[i]]
+        factor = _RICHARDSON_STEP ** 2
+        for j in range(1, i + 1):
+            row.append((row[j - 1] * factor - table[i - 1][j - 1]) / (factor - 1))
+            factor *= _RICHARDSON_STEP ** 2
+            errt = max(abs(row[j] - row[j - 1]), abs(row[j] - table[i - 1][j - 1]))
+            if errt <= err:
+                best, err = row[j], errt
+        table.append(row)
+        if abs(row[i] - table[i - 1][i - 1]) >= _RICHARDSON_SAFE * err:
+            break
+    return best, err
+
+
+def differentiate(f, x0, order=1, step=None):
+    """x0 处的 order 阶导数（Ridders 的 Richardson 外推），返回 (导数, 误差估计)
+
+    一个初始步长下所有级别的中心差分节点一次求值，从大步长往小步长外推，
+    外推误差开始增大时停止。差分节点落到定义域外，或者误差估计偏大
+    （如初始步长跨过了极点）时，初始步长缩小十倍重来，取误差最小的结果。
+    """
+    if order < 1:
+        raise ValueError("导数阶数必须是正整数")
+    h0 = step or (0.1 + 0.1 * (order - 1)) * max(1.0, abs(x0))
+    offsets = [order / 2 - k for k in range(order + 1)]
+    coeffs = [(-1) ** k * math.comb(order, k) for k in range(order + 1)]
+    n = len(offsets)
+    best, err = math.nan, math.inf
+    tries = 0
+    for attempt in range(12):
+        if attempt:
+            h0 /= 10
+        steps = [h0 / _RICHARDSON_STEP ** i for i in range(_RICHARDSON_LEVELS)]
+        ys = f([x0 + o * h for h in steps for o in offsets])
+        estimates = [math.fsum(c * y for c, y in zip(coeffs, ys[i * n:i * n + n])) / h ** order
+                     for i, h in enumerate(steps)]
+        if not all(map(math.isfinite, estimates)):
+            continue  # 节点落到定义域外（如 x0 靠近 0 时的 ln）
+        value, error = _extrapolate(estimates)
+        if error < err:
+            best, err = value, error
+        elif tries:
+            break  # 步长再小只会让舍入误差变大
+        tries += 1
+        if err <= 1e-13 * max(1.0, abs(best)) or tries >= 3:
+            break
+    if not math.isfinite(best):
+        raise ValueError(f"函数在 {x0:g} 附近没有定义")
+    return best, err
+
+
+class Derivative:
+    """符号求导后编译的 order 阶导函数，其余变量绑定为常数"""
+
+    def __init__(self, source, var, variables, order=1):
+        self.term = derivative(source, var, order)
+        others = [name for name in free_variables(self.term) if name != var]
+        for name in others:
+            if name not in variables:
+                raise ExpressionError(f"未定义的变量 '{name}'")
+        self.compiled = CompiledTerm(self.term, [var] + others)
+        self.args = tuple(variables[name] for name in others)
+
+    def __call__(self, x):
+        return self.compiled(x, *self.args)
+
+    def __str__(self):
+        return display(self.term)
+
+
+def parse_call(text):
+    """'∫(f,a,b)dx' 返回 ('∫', [f, a, b], 'x')；变量省略时为 None；不是这种写法时返回 None"""
+    m = _CALL_RE.fullmatch("".join(text.split()))
+    if m is None:
+        return None
+    return m.group(1), split_outputs(m.group(2)), m.group(3)
+
+
+def integration_variable(source, variables, var=None):
+    """积分/求导变量: 写明时用写明的，否则取唯一的未定义变量，默认 x"""
+    if var:
+        return var
+    unbound = [name for name in free_names(parse_expression(source)) if name not in variables]
+    if len(unbound) > 1:
+        raise ExpressionError(f"有多个变量 ({', '.join(unbound)})，请在末尾写明 dx、dy 等")
+    return unbound[0] if unbound else "x"
+
+
+def _exact(source, var, variables, x0, order):
+    """符号求导后在 x0 处求值；含不能符号求导的函数时返回 None
+
+    导数存在但在 x0 处无定义（除以零、超出定义域、无穷大）时报错，
+    这时数值求导只会给出一个没有意义的数。
+    """
+    try:
+        d = Derivative(source, var, variables, order)
+    except ExpressionError:
+        return None
+    try:
+        value = d(x0)
+    except (TypeError, ValueError, ArithmeticError):
+        value = None
+    if value is None or isinstance(value, complex) or not math.isfinite(value):
+        raise ValueError(f"导数在 x0 = {x0:g} 处无定义")
+    return value
+
+
+def evaluate_call(text, evaluate, variables):
+    """计算 ∫/∂ 表达式，返回 (结果, 误差估计, 说明)
+
+    evaluate 把上下限等参数文本求值成数字，variables 是可用的变量绑定。
+    结果是精确的（符号求导）时误差估计为 None；∂(f) dx 的结果是导函数的表达式文本。
+    """
+    parsed = parse_call(text)
+    if parsed is None:
+        raise ExpressionError("格式应为 ∫(f, a, b) dx 或 ∂(f, x0) dx")
+    op, args, var = parsed
+    source = args[0]
+    var = integration_variable(source, variables, var)
+    if op == "∂" and len(args) == 1:
+        term = derivative(source, var)
+        return display(term), None, f"d/d{var}, {node_count(term)} 个节点"
+    f = Integrand(source, var, variables)
+    if op == "∫":
+        if len(args) != 3:
+            raise ExpressionError("积分格式应为 ∫(f, a, b) dx")
+        a, b = (float(evaluate(arg)) for arg in args[1:])
+        value, error, count = integrate(f, a, b)
+        return value, error, f"{count} 个区间, {f.calls} 次求值"
+    if len(args) not in (2, 3):
+        raise ExpressionError("求导格式应为 ∂(f) dx、∂(f, x0) dx 或 ∂(f, x0, 阶数) dx")
+    x0 = float(evaluate(args[1]))
+    order = evaluate(args[2]) if len(args) == 3 else 1
+    if not float(order).is_integer() or order < 1:
+        raise ValueError("导数阶数必须是正整数")
+    if order > MAX_ORDER:
+        raise ValueError(f"导数阶数最多为 {MAX_ORDER}")
+    order = int(order)
+    value = _exact(source, var, variables, x0, order)
+    if value is not None:
+        return value, None, "符号求导"
+    value, error = differentiate(f, x0, order)
+    return value, error, f"数值求导, {f.calls} 次求值"
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+编辑缓冲模块 - 基于间隙缓冲区的表达式编辑器
+
+光标处的插入和删除均摊 O(1)，只有移动光标时才搬动间隙两侧的字符。
+支持按下标切片取出可见部分，界面无需拼出整个字符串。
+"""
+
+
+class GapBuffer:
+    """间隙缓冲区，光标位置即间隙起点"""
+
+    def __init__(self, text="", capacity=64):
+        self._buf = []
+        self._gap_start = 0
+        self._gap_end = 0
+        self._text = None  # 拼好的完整字符串缓存
+        self.version = 0  # 每次修改递增，供界面判断是否需要重绘
+        self.set_text(text, capacity)
+
+    def set_text(self, text, capacity=64):
+        """整体替换内容，光标移到末尾"""
+        gap = max(capacity, len(text) // 2)
+        self._buf = list(text) + [""] * gap
+        self._gap_start = len(text)
+        self._gap_end = len(self._buf)
+        self._changed()
+        self._text = text
+
+    def _changed(self):
+        self._text = None
+        self.version += 1
+
+    def __len__(self):
+        return len(self._buf) - (self._gap_end - self._gap_start)
+
+    @property
+    def cursor(self):
+        return self._gap_start
+
+    def move_to(self, pos):
+        """把光标（间隙）移动到 pos"""
+        pos = max(0, min(pos, len(self)))
+        if pos < self._gap_start:
+            n = self._gap_start - pos
+            self._buf[self._gap_end - n:self._gap_end] = self._buf[pos:self._gap_start]
+            self._gap_start = pos
+            self._gap_end -= n
+        elif pos > self._gap_start:
+            n = pos - self._gap_start
+            self._buf[self._gap_start:pos] = self._buf[self._gap_end:self._gap_end + n]
+            self._gap_start = pos
+            self._gap_end += n
+
+    def _grow(self, needed):
+        """间隙不足时按倍数扩容"""
+        extra = max(needed, len(self._buf))
+        self._buf[self._gap_end:self._gap_end] = [""] * extra
+        self._gap_end += extra
+
+    def insert(self, text):
+        """在光标处插入文本，光标移到插入内容之后"""
+        n = len(text)
+        if n == 0:
+            return
+        if self._gap_end - self._gap_start < n:
+            self._grow(n)
+        self._buf[self._gap_start:self._gap_start + n] = text
+        self._gap_start += n
+        self._changed()
+
+    def delete_before(self, n=1):
+        """删除光标前 n 个字符（退格）"""
+        n = min(n, self._gap_start)
+        if n > 0:
+            self._gap_start -= n
+            self._changed()
+
+    def delete_after(self, n=1):
+        """删除光标后 n 个字符"""
+        n = min(n, len(self._buf) - self._gap_end)
+        if n > 0:
+            self._gap_end += n
+            self._changed()
+
+    def _physical(self, i):
+        return i if i < self._gap_start else i + (self._gap_end - self._gap_start)
+
+    def __getitem__(self, index):
+        """支持下标和步长为1的切片，只拼接需要的部分"""
+        length = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(length)
+            if step != 1:
+                return self.text()[index]
+            if stop <= start:
+                return ""
+            if stop <= self._gap_start:
+                return "".join(self._buf[start:stop])
+            if start >= self._gap_start:
+                return "".join(self._buf[self._physical(start):self._physical(stop - 1) + 1])
+            return ("".join(self._buf[start:self._gap_start])
+                    + "".join(self._buf[self._gap_end:self._physical(stop - 1) + 1]))
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("GapBuffer index out of range")
+        return self._buf[self._physical(index)]
+
+    def text(self):
+        """完整文本，结果缓存到下一次修改"""
+        if self._text is None:
+            self._text = ("".join(self._buf[:self._gap_start])
+                          + "".join(self._buf[self._gap_end:]))
+        return self._text
+
+    def __str__(self):
+        return self.text()
+
+
+class Viewport:
+    """水平滚动视口，保证光标始终在可见范围内"""
+
+    def __init__(self):
+        self.offset = 0
+
+    def scroll_to(self, cursor, length, width):
+        """根据光标位置调整偏移，返回 (起点, 终点)"""
+        width = max(1, width)
+        if cursor < self.offset:
+            self.offset = cursor
+        elif cursor >= self.offset + width:
+            self.offset = cursor - width + 1
+        # 内容变短时尽量填满视口
+        self.offset = max(0, min(self.offset, max(0, length - width + 1)))
+        return self.offset, min(length, self.offset + width)
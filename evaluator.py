@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+表达式编译模块 - 基于ast的安全表达式编译器
+
+流程: 解析 -> 白名单校验 -> 常量折叠 -> 公共子表达式消除 -> 生成专用代码对象。
+编译结果可以用新的变量绑定反复调用，也可以换一套函数表（如NumPy）做批量求值。
+"""
+
+import ast
+import math
+import operator
+import sys
+from contextlib import contextmanager
+from types import FunctionType, MappingProxyType
+
+
+# 常量表，编译时直接折叠
+CONSTANTS = MappingProxyType({
+    **{k: v for k, v in math.__dict__.items()
+       if not k.startswith("_") and isinstance(v, float)},
+    'π': math.pi,
+    'E': math.e,
+})
+
+# 函数表，键为表达式中允许出现的函数名
+FUNCTIONS = MappingProxyType({
+    **{k: v for k, v in math.__dict__.items()
+       if not k.startswith("_") and callable(v)},
+    'log': math.log10,  # 计算器中 log 为常用对数
+    'ln': math.log,
+    'abs': abs,
+})
+
+# 预构建的只读命名空间（常量 + 函数），所有求值共享
+SAFE_NAMESPACE = MappingProxyType({**FUNCTIONS, **CONSTANTS})
+
+# 生成代码使用的全局命名空间
+_MATH_GLOBALS = {"__builtins__": {}, **FUNCTIONS}
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+_COMPARE_OPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# 编译长表达式时允许的最大递归深度
+_MAX_RECURSION = 50000
+
+# 折叠幂运算时允许的最大整数指数，避免编译阶段卡死
+_MAX_FOLD_EXPONENT = 1024
+
+
+class ExpressionError(ValueError):
+    """表达式不合法或不被允许"""
+
+
+def _is_number(node):
+    return (isinstance(node, ast.Constant)
+            and isinstance(node.value, (int, float, complex))
+            and not isinstance(node.value, bool))
+
+
+class _Validator(ast.NodeTransformer):
+    """白名单校验，同时把 math.xxx 规范化为 xxx"""
+
+    def generic_visit(self, node):
+        raise ExpressionError(f"不支持的语法: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        node.body = self.visit(node.body)
+        return node
+
+    def visit_Constant(self, node):
+        if not _is_number(node):
+            raise ExpressionError(f"不支持的常量: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        if node.id.startswith("_"):
+            raise ExpressionError(f"使用 '{node.id}' 不被允许")
+        if node.id in FUNCTIONS:
+            raise ExpressionError(f"函数 '{node.id}' 必须被调用")
+        return node
+
+    def visit_Attribute(self, node):
+        # 兼容旧写法 math.sin(...) / math.pi
+        if (isinstance(node.value, ast.Name) and node.value.id == "math"
+                and node.attr in SAFE_NAMESPACE):
+            return ast.copy_location(ast.Name(id=node.attr, ctx=ast.Load()), node)
+        raise ExpressionError(f"使用 '{ast.unparse(node)}' 不被允许")
+
+    def visit_BinOp(self, node):
+        if type(node.op) not in _BIN_OPS:
+            raise ExpressionError(f"不支持的运算符: {type(node.op).__name__}")
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        return node
+
+    def visit_UnaryOp(self, node):
+        if type(node.op) not in _UNARY_OPS:
+            raise ExpressionError(f"不支持的运算符: {type(node.op).__name__}")
+        node.operand = self.visit(node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        if not all(isinstance(op, _COMPARE_OPS) for op in node.ops):
+            raise ExpressionError("不支持的比较运算")
+        node.left = self.visit(node.left)
+        node.comparators = [self.visit(c) for c in node.comparators]
+        return node
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            func = self.visit_Attribute(func)
+        if not isinstance(func, ast.Name) or func.id not in FUNCTIONS:
+            raise ExpressionError(f"使用 '{ast.unparse(node.func)}' 不被允许")
+        if node.keywords or any(isinstance(a, ast.Starred) for a in node.args):
+            raise ExpressionError("函数调用只支持位置参数")
+        node.func = func
+        node.args = [self.visit(a) for a in node.args]
+        return node
+
+
+class _Folder:
+    """常量折叠: 常量名替换为数值，纯常量子树在编译时求值"""
+
+    def visit(self, node):
+        if isinstance(node, ast.BinOp):
+            return self.visit_BinOp(node)
+        if isinstance(node, ast.Call):
+            return self.visit_Call(node)
+        if isinstance(node, ast.UnaryOp):
+            return self.visit_UnaryOp(node)
+        if isinstance(node, ast.Name):
+            return self.visit_Name(node)
+        if isinstance(node, ast.Compare):
+            node.left = self.visit(node.left)
+            node.comparators = [self.visit(c) for c in node.comparators]
+        return node
+
+    def visit_Name(self, node):
+        if node.id in CONSTANTS:
+            return ast.copy_location(ast.Constant(CONSTANTS[node.id]), node)
+        return node
+
+    def _fold(self, node, func, *args):
+        try:
+            value = func(*args)
+        except Exception:
+            return node  # 留到运行时报错
+        if isinstance(value, bool) or not isinstance(value, (int, float, complex)):
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def visit_BinOp(self, node):
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+        if _is_number(node.left) and _is_number(node.right):
+            if (isinstance(node.op, ast.Pow) and isinstance(node.right.value, int)
+                    and abs(node.right.value) > _MAX_FOLD_EXPONENT):
+                return node
+            return self._fold(node, _BIN_OPS[type(node.op)],
+                              node.left.value, node.right.value)
+        return node
+
+    def visit_UnaryOp(self, node):
+        node.operand = self.visit(node.operand)
+        if _is_number(node.operand):
+            return self._fold(node, _UNARY_OPS[type(node.op)], node.operand.value)
+        return node
+
+    def visit_Call(self, node):
+        node.args = [self.visit(a) for a in node.args]
+        if all(_is_number(a) for a in node.args):
+            return self._fold(node, FUNCTIONS[node.func.id],
+                              *(a.value for a in node.args))
+        return node
+
+
+def _is_large_int(value):
+    return type(value) is int and value.bit_length() > 10000
+
+
+def _literal(value):
+    """常量的源码形式；大整数写成十六进制，不受整数转十进制字符串的位数上限（4300）限制"""
+    return hex(value) if _is_large_int(value) else repr(value)
+
+
+class _Emitter:
+    """公共子表达式消除并生成函数源码
+
+    自底向上给每个子树分配结构编号（相同结构得到相同编号），
+    出现多次的子树提取为临时变量。
+    """
+
+    def __init__(self, tree):
+        self.ids = {}  # 结构键 -> 编号
+        self.node_ids = {}  # id(节点) -> 编号
+        self.counts = {}
+        self.assigned = {}
+        self.lines = []
+        self._number(tree)
+        self._count(tree)
+
+    @staticmethod
+    def _is_leaf(node):
+        return isinstance(node, (ast.Constant, ast.Name))
+
+    @staticmethod
+    def _children(node):
+        if isinstance(node, ast.BinOp):
+            return [node.left, node.right]
+        if isinstance(node, ast.UnaryOp):
+            return [node.operand]
+        if isinstance(node, ast.Compare):
+            return [node.left] + node.comparators
+        return node.args
+
+    def _number(self, root):
+        # 迭代后序遍历，避免深层表达式的递归开销
+        stack = [(root, False)]
+        while stack:
+            node, done = stack.pop()
+            if not done:
+                stack.append((node, True))
+                if not self._is_leaf(node):
+                    stack.extend((child, False) for child in self._children(node))
+                continue
+            if isinstance(node, ast.Constant):
+                key = ("const", type(node.value), node.value)
+            elif isinstance(node, ast.Name):
+                key = ("name", node.id)
+            else:
+                if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+                    tag = type(node.op)
+                elif isinstance(node, ast.Compare):
+                    tag = tuple(type(op) for op in node.ops)
+                else:
+                    tag = node.func.id
+                key = (type(node), tag) + tuple(self.node_ids[id(c)] for c in self._children(node))
+            self.node_ids[id(node)] = self.ids.setdefault(key, len(self.ids))
+
+    def _count(self, root):
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if self._is_leaf(node):
+                continue
+            key = self.node_ids[id(node)]
+            self.counts[key] = self.counts.get(key, 0) + 1
+            if self.counts[key] == 1:
+                stack.extend(self._children(node))
+
+    def emit(self, node):
+        if self._is_leaf(node):
+            if isinstance(node, ast.Constant) and _is_large_int(node.value):
+                # ast.unparse 写不出超过 4300 位的整数，提取为十六进制的临时变量
+                return self._temp(self.node_ids[id(node)], _literal(node.value))
+            return node
+        key = self.node_ids[id(node)]
+        if key in self.assigned:
+            return ast.Name(id=self.assigned[key], ctx=ast.Load())
+        if isinstance(node, ast.BinOp):
+            new = ast.BinOp(self.emit(node.left), node.op, self.emit(node.right))
+        elif isinstance(node, ast.UnaryOp):
+            new = ast.UnaryOp(node.op, self.emit(node.operand))
+        elif isinstance(node, ast.Compare):
+            new = ast.Compare(self.emit(node.left), node.ops,
+                              [self.emit(c) for c in node.comparators])
+        else:
+            new = ast.Call(node.func, [self.emit(a) for a in node.args], [])
+        if self.counts.get(key, 0) > 1:
+            return self._temp(key, ast.unparse(new))
+        return new
+
+    def _temp(self, key, source):
+        """编号为 key 的子树赋给临时变量，返回引用它的名字"""
+        name = self.assigned.get(key)
+        if name is None:
+            name = self.assigned[key] = f"_t{len(self.assigned)}"
+            self.lines.append(f"{name} = {source}")
+        return ast.Name(id=name, ctx=ast.Load())
+
+
+class CompiledExpression:
+    """编译后的表达式，可用不同变量绑定反复调用"""
+
+    def __init__(self, source, tree, params):
+        self.source = source
+        self.tree = tree
+        self.params = params
+        self._bound = {}
+        if self.is_constant:
+            # 整体折叠为常量时无需生成代码
+            value = tree.value
+            self.code_text = f"def _expr({', '.join(params)}):\n    return {_literal(value)}"
+            self._code = None
+            self._func = lambda *args, **bindings: value
+            return
+        body = _Emitter(tree)
+        result = ast.unparse(body.emit(tree))
+        lines = [f"def _expr({', '.join(params)}):"]
+        lines += [f"    {line}" for line in body.lines]
+        lines.append(f"    return {result}")
+        self.code_text = "\n".join(lines)
+        scope = {}
+        exec(compile(self.code_text, "<expr>", "exec"), {"__builtins__": {}}, scope)
+        self._code = scope["_expr"].__code__
+        self._func = FunctionType(self._code, _MATH_GLOBALS)
+
+    @property
+    def is_constant(self):
+        return _is_number(self.tree)
+
+    def bind(self, functions):
+        """用另一套函数表（例如NumPy版本）生成可调用对象"""
+        if self._code is None:
+            return self._func
+        return FunctionType(self._code, {"__builtins__": {}, **functions})
+
+    def vectorized(self, key, functions):
+        """返回并缓存绑定到指定函数表的可调用对象"""
+        func = self._bound.get(key)
+        if func is None:
+            func = self._bound[key] = self.bind(functions)
+        return func
+
+    def __call__(self, *args, **bindings):
+        return self._func(*args, **bindings)
+
+    def evaluate(self, variables):
+        """用变量字典求值，缺失变量时报错"""
+        try:
+            args = [variables[name] for name in self.params]
+        except KeyError as e:
+            raise ExpressionError(f"使用 '{e.args[0]}' 不被允许")
+        return self._func(*args)
+
+
+def parse_expression(text):
+    """把计算器输入解析成经过校验和折叠的ast"""
+    text = text.replace("^", "**")
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"语法错误: {e.msg}")
+    tree = _Validator().visit(tree)
+    return _Folder().visit(tree.body)
+
+
+def free_names(tree):
+    """按出现顺序返回表达式中的自由变量"""
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in names:
+            if node.id not in FUNCTIONS:
+                names.append(node.id)
+    return names
+
+
+@contextmanager
+def _recursion_budget(text):
+    """编译各阶段都是递归遍历，长表达式（如粘贴的长串加法）需要更深的递归"""
+    old = sys.getrecursionlimit()
+    needed = min(_MAX_RECURSION, 1000 + 8 * len(text))
+    if needed > old:
+        sys.setrecursionlimit(needed)
+    try:
+        yield
+    except RecursionError:
+        raise ExpressionError("表达式嵌套过深")
+    finally:
+        sys.setrecursionlimit(old)
+
+
+def compile_expression(text, params=None):
+    """编译表达式文本；params 指定参数顺序，默认按出现顺序"""
+    with _recursion_budget(text):
+        tree = parse_expression(text)
+        names = free_names(tree)
+        if params is None:
+            params = names
+        else:
+            params = list(params)
+            for name in names:
+                if name not in params:
+                    raise ExpressionError(f"使用 '{name}' 不被允许")
+        return CompiledExpression(text, tree, params)
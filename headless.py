@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+无终端绘制 - 用内存中的字符网格代替 curses 屏幕
+
+FakeScreen 实现界面用到的那部分窗口接口（derwin、addstr、addch、hline、vline、
+attron/attroff、erase 等），子窗口和父窗口共用同一个网格，和 curses 的 derwin 一样。
+写入的细节也和 curses 一致: addstr 超出右边界时折到下一行，写到窗口最后一格时抛出 curses.error，
+hline/vline 只截断不报错，这样界面在真实终端上会出错或错位的绘制在回放中也能看到。
+headless() 在上下文中替换掉必须先 initscr 才能调用的 curses 函数和 ACS 常量，
+这样 CalculatorUI 可以不接终端直接绘制，用于基准测试和按键回放。
+"""
+
+import curses
+import hashlib
+import unicodedata
+from contextlib import contextmanager
+
+# 没有终端时 curses 不定义 ACS_* 常量，用对应的 Unicode 制表符代替
+ACS = {
+    "ACS_ULCORNER": "┌", "ACS_URCORNER": "┐", "ACS_LLCORNER": "└", "ACS_LRCORNER": "┘",
+    "ACS_HLINE": "─", "ACS_VLINE": "│",
+}
+
+
+class FakeScreen:
+    """内存中的窗口；parent 为 None 时是整个屏幕"""
+
+    def __init__(self, height=40, width=100, parent=None, y=0, x=0):
+        self.height = height
+        self.width = width
+        self.origin = (y, x)  # 在整个屏幕中的位置
+        if parent is None:
+            self.cells = [[(" ", 0)] * width for _ in range(height)]
+            self.root = self
+            self.refreshes = 0
+            self.keys = []  # getch 依次返回的按键
+        else:
+            self.cells = parent.cells
+            self.root = parent.root
+        self.attr = 0
+        self.cursor = (0, 0)
+
+    # 窗口结构
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def derwin(self, height, width, y, x):
+        oy, ox = self.origin
+        if height <= 0 or width <= 0 or y + height > self.height or x + width > self.width:
+            raise curses.error("derwin() returned ERR")
+        return FakeScreen(height, width, self, oy + y, ox + x)
+
+    def resize(self, height, width):
+        """改变整个屏幕的大小（模拟终端窗口缩放），内容清空"""
+        self.height, self.width = height, width
+        self.cells[:] = [[(" ", 0)] * width for _ in range(height)]
+
+    # 写入
+    def _put(self, y, x, text, attr=None):
+        """与 curses 的 waddstr 相同: 写到右边界后折到下一行继续写，换行符清除行尾后换行；
+        光标要移出窗口最后一格时抛出 curses.error，此前的字符（包括最后一格）已经写入
+        """
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("addwstr() returned ERR")
+        attr = self.attr if attr is None else attr | self.attr
+        base = self.origin[1]
+        col = x
+        for ch in text:
+            if ch == "\n":
+                self._row(y)[base + col:base + self.width] = [(" ", attr)] * (self.width - col)
+                y, col = self._newline(y)
+                continue
+            wide = ord(ch) >= 0x1100 and unicodedata.east_asian_width(ch) in "WF"
+            if col + wide >= self.width:
+                # 行尾只剩一列放不下全角字符: 这一列填空格，字符折到下一行
+                self._row(y)[base + col] = (" ", attr)
+                y, col = self._newline(y)
+            row = self._row(y)
+            row[base + col] = (ch, attr)
+            col += 1
+            if wide:
+                row[base + col] = ("", attr)  # 全角字符占两列，第二列留空
+                col += 1
+            if col == self.width:
+                y, col = self._newline(y)
+        self.cursor = (y, col)
+
+    def _row(self, y):
+        return self.cells[self.origin[0] + y]
+
+    def _newline(self, y):
+        """光标移到下一行行首；已在最后一行时停在最后一格并报错（不滚屏）"""
+        if y + 1 >= self.height:
+            self.cursor = (self.height - 1, self.width - 1)
+            raise curses.error("addwstr() returned ERR")
+        return y + 1, 0
+
+    def _line(self, y, x, ch, n):
+        """hline 的写法: 在一行内重复字符，到右边界截断，不折行也不移动光标"""
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("whline() returned ERR")
+        n = min(n, self.width - x)
+        base = self.origin[1] + x
+        self._row(y)[base:base + n] = [(ch, self.attr)] * n
+
+    def addstr(self, y, x, text, attr=None):
+        self._put(y, x, str(text), attr)
+
+    def addch(self, y, x, ch, attr=None):
+        self._put(y, x, chr(ch) if isinstance(ch, int) else ch, attr)
+
+    def hline(self, y, x, ch, n):
+        self._line(y, x, chr(ch) if isinstance(ch, int) else ch, n)
+
+    def vline(self, y, x, ch, n):
+        ch = chr(ch) if isinstance(ch, int) else ch
+        for i in range(min(n, self.height - y)):
+            self._line(y + i, x, ch, 1)
+
+    def border(self, *chars):
+        h, v = ACS["ACS_HLINE"], ACS["ACS_VLINE"]
+        self.hline(0, 0, h, self.width)
+        self.hline(self.height - 1, 0, h, self.width)
+        self.vline(0, 0, v, self.height)
+        self.vline(0, self.width - 1, v, self.height)
+        self._line(0, 0, ACS["ACS_ULCORNER"], 1)
+        self._line(0, self.width - 1, ACS["ACS_URCORNER"], 1)
+        self._line(self.height - 1, 0, ACS["ACS_LLCORNER"], 1)
+        self._line(self.height - 1, self.width - 1, ACS["ACS_LRCORNER"], 1)
+
+    def erase(self):
+        oy, ox = self.origin
+        for y in range(oy, oy + self.height):
+            self.cells[y][ox:ox + self.width] = [(" ", 0)] * self.width
+
+    clear = erase
+
+    def attron(self, attr):
+        self.attr |= attr
+
+    def attroff(self, attr):
+        self.attr &= ~attr
+
+    def move(self, y, x):
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("wmove() returned ERR")
+        self.cursor = (y, x)
+
+    def noutrefresh(self):
+        self.root.refreshes += 1
+
+    refresh = noutrefresh
+
+    # 输入
+    def getch(self):
+        keys = self.root.keys
+        return keys.pop(0) if keys else -1
+
+    def timeout(self, delay):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+    # 检查
+    def text(self):
+        """屏幕上的文字，每行一个字符串"""
+        return ["".join(ch for ch, _ in row).rstrip() for row in self.cells]
+
+    def digest(self):
+        """屏幕内容（含属性）的哈希，比较两次绘制结果是否相同"""
+        h = hashlib.sha1()
+        for row in self.cells:
+            for ch, attr in row:
+                h.update(f"{ch}\0{attr}\0".encode("utf-8"))
+            h.update(b"\n")
+        return h.hexdigest()
+
+
+@contextmanager
+def headless():
+    """在上下文中用空操作代替需要真实终端的 curses 函数"""
+    replacements = dict(ACS)
+    replacements.update(
+        start_color=lambda: None,
+        use_default_colors=lambda: None,
+        init_pair=lambda pair, fg, bg: None,
+        color_pair=lambda n: n << 8,  # 与 curses 相同: 颜色对编号放在第 8 位以上
+        doupdate=lambda: None,
+        curs_set=lambda visibility: 1,
+        set_escdelay=lambda ms: None,
+    )
+    saved = {name: getattr(curses, name) for name in replacements if hasattr(curses, name)}
+    for name, value in replacements.items():
+        setattr(curses, name, value)
+    try:
+        yield
+    finally:
+        for name in replacements:
+            if name in saved:
+                setattr(curses, name, saved[name])
+            else:
+                delattr(curses, name)
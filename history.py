@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+历史记录模块 - 结构化的计算历史，内存中有上限，磁盘上持久保存
+
+每条记录包含表达式、结果、模式、时间戳和耗时。
+内存中用定长 deque 保存最近的记录；磁盘上是追加写入的 JSON Lines 日志，
+每条记录写完立即刷新，崩溃时最多留下最后一行不完整，读取时跳过即可。
+启动时从文件末尾往前读，只解析最后 N 行，耗时与日志总长度无关。
+Ctrl-R 搜索用三元组（trigram）倒排索引，由整个日志建立（界面在后台线程中建立），之后随新记录增量更新；
+索引建好之前只搜索内存中的最近记录。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from itertools import islice
+
+MAX_ENTRIES = 1000  # 内存中保留的条数
+SEARCH_LIMIT = 50  # 每次搜索最多返回的条数
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".multical_history.jsonl")
+
+_BLOCK = 64 << 10  # 从文件末尾往前读时的块大小
+
+
+class HistoryEntry(namedtuple("HistoryEntry", "expression result mode timestamp elapsed")):
+    """一条历史记录: 表达式, 结果, 模式, 时间戳（秒）, 耗时（秒）"""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.expression} = {self.result}"
+
+
+def _decode(line):
+    """解析一行日志，不完整或损坏的行返回 None"""
+    try:
+        record = json.loads(line)
+        return HistoryEntry(record["e"], record["r"], record["m"], record["t"], record["d"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class HistoryLog:
+    """追加写入的历史日志文件"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.file = open(path, "a+b")  # 追加模式: 无论读位置在哪，写入总在末尾
+        size = self._size()
+        if size:
+            self.file.seek(size - 1)
+            if self.file.read(1) != b"\n":
+                # 上次写到一半就退出了: 补一个换行，让坏行单独成行
+                self._write(b"\n")
+
+    def _size(self):
+        return os.fstat(self.file.fileno()).st_size
+
+    def _write(self, data):
+        self.file.write(data)
+        self.file.flush()
+
+    def append(self, entry):
+        record = {"e": entry.expression, "r": entry.result, "m": entry.mode,
+                  "t": round(entry.timestamp, 3), "d": round(entry.elapsed, 6)}
+        self._write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def tail(self, n):
+        """最后 n 条记录（旧的在前），从文件末尾按块往前读"""
+        data = b""
+        pos = self._size()
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(_BLOCK, pos)
+            pos -= step
+            self.file.seek(pos)
+            data = self.file.read(step) + data
+        lines = data.split(b"\n")
+        if pos > 0:
+            lines = lines[1:]  # 第一行可能只读到一半
+        entries = [e for e in map(_decode, lines) if e is not None]
+        return entries[-n:] if n else []
+
+    def read(self, end=None):
+        """前 end 字节内的全部记录（按写入顺序）；另开文件读取，不影响追加写入"""
+        with open(self.path, "rb") as f:
+            data = f.read(end) if end is not None else f.read()
+        return [e for e in map(_decode, data.split(b"\n")) if e is not None]
+
+    def __iter__(self):
+        return iter(self.read())
+
+    def close(self):
+        self.file.close()
+
+
+class TrigramIndex:
+    """历史表达式的三元组倒排索引
+
+    每个三元组对应包含它的记录编号列表，编号按加入顺序递增，
+    所以从列表末尾往前走就是从新到旧。查询取最短的列表作为候选，逐个核对子串，
+    凑够结果就停，不必扫描全部记录。少于三个字符的查询没有三元组可用，从新到旧直接扫描。
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.keys = []  # 小写化的表达式
+        self.postings = defaultdict(list)
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        key = entry.expression.casefold()
+        n = len(self.entries)
+        self.entries.append(entry)
+        self.keys.append(key)
+        postings = self.postings
+        for gram in set(map("".join, zip(key, key[1:], key[2:]))):
+            postings[gram].append(n)
+
+    def candidates(self, query):
+        """可能包含 query 的记录编号，从新到旧"""
+        if len(query) < 3:
+            return range(len(self.entries) - 1, -1, -1)
+        lists = []
+        for gram in {query[i:i + 3] for i in range(len(query) - 2)}:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return ()
+            lists.append(ids)
+        return reversed(min(lists, key=len))
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """包含 query（不区分大小写）的记录，从新到旧，相同的表达式只保留最近一条"""
+        query = query.casefold()
+        keys = self.keys
+        entries = self.entries
+        return _collect(((keys[i], entries[i]) for i in self.candidates(query)), query, limit)
+
+
+def _collect(pairs, query, limit):
+    """从 (小写表达式, 记录) 序列中取前 limit 条包含 query 的记录，相同表达式只取第一条"""
+    results = []
+    seen = set()
+    for key, entry in pairs:
+        if query in key and key not in seen:
+            seen.add(key)
+            results.append(entry)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def scan_recent(entries, query, limit=SEARCH_LIMIT):
+    """不用索引，从新到旧直接扫描 entries；索引建好之前使用"""
+    query = query.casefold()
+    return _collect(((e.expression.casefold(), e) for e in reversed(entries)), query, limit)
+
+
+class HistorySearch:
+    """一次 Ctrl-R 增量搜索的状态: 查询、结果和当前选中项（0 是最新的）
+
+    partial 为真表示索引还没建好，结果只来自内存中的最近记录。
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.query = ""
+        self.selected = 0
+        self.results = []
+        self.partial = False
+        self.update()
+
+    def update(self):
+        index = self.history.index
+        self.partial = index is None
+        if index is None:
+            self.results = scan_recent(self.history.entries, self.query)
+        else:
+            self.results = index.search(self.query)
+        self.selected = 0
+
+    def refresh(self):
+        """索引在搜索过程中建好时，改用完整索引重新搜索；返回是否重新搜索了"""
+        if self.partial and self.history.index is not None:
+            self.update()
+            return True
+        return False
+
+    def type(self, text):
+        self.query += text
+        self.update()
+
+    def backspace(self):
+        if self.query:
+            self.query = self.query[:-1]
+            self.update()
+
+    def move(self, delta):
+        """delta 为正时选更早的结果"""
+        if self.results:
+            self.selected = max(0, min(self.selected + delta, len(self.results) - 1))
+
+    def current(self):
+        return self.results[self.selected] if self.results else None
+
+
+class History:
+    """最近的计算历史: 定长 deque，可选地同步写入 HistoryLog
+
+    offset 是历史面板的滚动位置（最新的几条被滚出视图的条数），
+    page_size 由界面在绘制时更新。
+    """
+
+    def __init__(self, maxlen=MAX_ENTRIES, log=None):
+        self.entries = deque(maxlen=maxlen)
+        self.log = None
+        self.version = 0  # 每次修改加一，界面据此判断是否重绘
+        self.offset = 0
+        self.page_size = 1
+        self.index = None  # 搜索索引，build_index 之后才有
+        self._lock = threading.Lock()
+        self._pending = None  # 建立索引期间新增的记录
+        self._generation = 0  # clear 时加一，作废正在建立的索引
+        if log is not None:
+            self.attach(log)
+
+    def attach(self, log):
+        """接上日志文件并载入其中最近的记录"""
+        self.log = log
+        self.entries.extend(log.tail(self.entries.maxlen))
+        self.version += 1
+
+    def add(self, expression, result, mode, elapsed=0.0):
+        entry = HistoryEntry(expression, result, mode, time.time(), elapsed)
+        self.append(entry)
+        return entry
+
+    def append(self, entry):
+        self.entries.append(entry)
+        if self.log is not None:
+            self.log.append(entry)
+        with self._lock:
+            if self.index is not None:
+                self.index.add(entry)
+            elif self._pending is not None:
+                self._pending.append(entry)
+        if self.offset:
+            # 正在往回翻时保持视图不动
+            self.offset = min(self.offset + 1, len(self.entries) - 1)
+        self.version += 1
+
+    def build_index(self):
+        """由全部历史（有日志时包括日志中更早的记录）建立搜索索引
+
+        日志有几十万条时要几秒，可以在后台线程中调用；期间新增的记录先排队，建好后补进去。
+        """
+        with self._lock:
+            if self.index is not None or self._pending is not None:
+                return self.index
+            self._pending = []
+            generation = self._generation
+            if self.log is not None:
+                self.log.file.flush()
+                source, end = self.log, self.log._size()
+            else:
+                source, end = list(self.entries), None
+        index = TrigramIndex(source.read(end) if end is not None else source)
+        with self._lock:
+            if generation == self._generation:
+                for entry in self._pending:
+                    index.add(entry)
+                self.index = index
+            self._pending = None
+            return self.index
+
+    def clear(self):
+        self.entries.clear()
+        with self._lock:
+            self.index = None
+            self._generation += 1
+        self.offset = 0
+        self.version += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def visible(self, count):
+        """滚动位置上可见的 count 条（旧的在前），只取这几条，不复制整个队列"""
+        newest = islice(reversed(self.entries), self.offset, self.offset + count)
+        return list(newest)[::-1]
+
+    def scroll(self, delta):
+        """delta 为正时往更早的记录翻"""
+        limit = max(0, len(self.entries) - self.page_size)
+        self.offset = max(0, min(self.offset + delta, limit))
+        self.version += 1
+
+    def info(self):
+        if not self.offset:
+            return f"共 {len(self.entries)} 条"
+        newest = len(self.entries) - self.offset
+        return f"第 {max(1, newest - self.page_size + 1)}-{newest} 条 / 共 {len(self.entries)} 条"
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,1088 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+线性时间正则引擎 - 只支持正则语言子集，匹配时间与输入长度成线性
+
+不支持反向引用、前后顾断言、内联标志等需要回溯的特性，遇到时抛出 UnsupportedPattern，
+调用方退回 re 模块。模式先编译为 Thompson NFA 程序:
+  - 不含 $ 的模式用惰性构造的 DFA 查找: 正向 DFA 按 re 的最左优先规则找到匹配终点，
+    反向 DFA 从终点往回找最长匹配得到起点；DFA 状态按需生成，缓存有上限，满了就清空重建。
+  - 含 $ 的模式直接用 Pike VM（带优先级的 NFA 模拟）。
+分组内容在需要时才用 Pike VM 在匹配区间内补算。
+匹配结果（区间和分组）与 re 模块一致，接口也尽量保持一致。
+循环体本身能匹配空串时（如 (a*)+、(?:x|\b)*），re 在一次迭代没有消耗字符后不再继续循环，
+只能接着匹配循环之后的部分。编译时把这种循环体展开成两份: 第一份表示本次迭代还没有消耗字符，
+走完它只能离开循环；一旦消耗字符就跳到第二份的对应位置，走完后才能回到循环开头。
+状态数只是加倍，仍是线性时间，见 tests/test_linregex.py 中与 re 的差分测试。
+"""
+
+import re
+
+from regexstream import compile_template, match_item
+
+MAX_PROGRAM = 20000  # 展开计数重复后的最大指令数
+MAX_DFA_STATES = 4096  # DFA 状态缓存上限
+
+# 位置两侧字符的类别，用于 ^ \A \Z \b \B
+_NONE, _WORD, _OTHER = 0, 1, 2
+
+_REPEAT_RE = re.compile(r"\{(\d*)(?:(,)(\d*))?\}")
+
+
+class UnsupportedPattern(Exception):
+    """模式超出线性引擎支持的子集"""
+
+
+# ---------------------------------------------------------------- 字符类别
+
+def _ascii_word(c):
+    return 48 <= c <= 57 or 65 <= c <= 90 or 97 <= c <= 122 or c == 95
+
+
+def _unicode_word(c):
+    return c == 95 or chr(c).isalnum()
+
+
+_CATEGORIES = {
+    # 转义字母 -> (str 模式下的判断, bytes 模式下的判断)
+    "d": (lambda c: chr(c).isdecimal(), lambda c: 48 <= c <= 57),
+    "w": (_unicode_word, _ascii_word),
+    "s": (lambda c: chr(c).isspace(), lambda c: c in (9, 10, 11, 12, 13, 32)),
+}
+
+_SIMPLE_ESCAPES = {"n": 10, "t": 9, "r": 13, "f": 12, "v": 11, "a": 7, "\\": 92}
+
+
+class CharSet:
+    """字符集合: 单个字符、区间和类别的并集，可取反"""
+
+    def __init__(self, negate=False):
+        self.chars = set()
+        self.ranges = []
+        self.categories = []
+        self.negate = negate
+
+    def __call__(self, c):
+        hit = (c in self.chars
+               or any(lo <= c <= hi for lo, hi in self.ranges)
+               or any(f(c) for f in self.categories))
+        return hit != self.negate
+
+
+def _literal(c):
+    s = CharSet()
+    s.chars.add(c)
+    return s
+
+
+def _category(letter, is_bytes):
+    s = CharSet(negate=letter.isupper())
+    s.categories.append(_CATEGORIES[letter.lower()][1 if is_bytes else 0])
+    return s
+
+
+_ANY = CharSet(negate=True)
+_ANY.chars.add(10)  # . 不匹配换行
+
+
+# ---------------------------------------------------------------- 解析
+
+class _Parser:
+    """把模式解析为元组语法树:
+        ('set', CharSet) ('cat', [..]) ('alt', [..]) ('rep', 节点, 最少, 最多或None, 贪婪)
+        ('group', 编号或None, 节点) ('assert', 种类) ('empty',)
+    """
+
+    def __init__(self, pattern, is_bytes):
+        self.src = pattern
+        self.pos = 0
+        self.is_bytes = is_bytes
+        self.groups = 0
+        self.groupindex = {}
+
+    def peek(self):
+        return self.src[self.pos] if self.pos < len(self.src) else None
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.pos != len(self.src):
+            raise UnsupportedPattern("括号不匹配")
+        return node
+
+    def parse_alt(self):
+        branches = [self.parse_concat()]
+        while self.peek() == "|":
+            self.pos += 1
+            branches.append(self.parse_concat())
+        return branches[0] if len(branches) == 1 else ("alt", branches)
+
+    def parse_concat(self):
+        items = []
+        while self.peek() not in (None, "|", ")"):
+            atom = self.parse_atom()
+            if atom is None:
+                continue
+            items.append(self.parse_quantifiers(atom))
+        if not items:
+            return ("empty",)
+        return items[0] if len(items) == 1 else ("cat", items)
+
+    def parse_quantifiers(self, atom):
+        ch = self.peek()
+        if ch in ("*", "+", "?"):
+            self.pos += 1
+            lo, hi = {"*": (0, None), "+": (1, None), "?": (0, 1)}[ch]
+        elif ch == "{":
+            m = _REPEAT_RE.match(self.src, self.pos)
+            if not m or m.group() == "{}":
+                return atom  # 不是合法的重复次数，'{' 按字面处理
+            self.pos = m.end()
+            lo = int(m.group(1)) if m.group(1) else 0
+            if m.group(2):
+                hi = int(m.group(3)) if m.group(3) else None
+            else:
+                hi = lo
+            if hi is not None and hi < lo:
+                raise UnsupportedPattern("重复次数下限大于上限")
+        else:
+            return atom
+        greedy = True
+        if self.peek() == "?":
+            self.pos += 1
+            greedy = False
+        elif self.peek() == "+":
+            raise UnsupportedPattern("占有型量词")
+        if atom[0] == "assert" or self.peek() in ("*", "+", "?", "{") and _is_quantifier(self.src, self.pos):
+            raise UnsupportedPattern("重复的量词")
+        return ("rep", atom, lo, hi, greedy)
+
+    def parse_atom(self):
+        ch = self.src[self.pos]
+        self.pos += 1
+        if ch == "(":
+            return self.parse_group()
+        if ch == "[":
+            return ("set", self.parse_class())
+        if ch == ".":
+            return ("set", _ANY)
+        if ch == "^":
+            return ("assert", "bol")
+        if ch == "$":
+            return ("assert", "eol")
+        if ch == "\\":
+            return self.parse_escape()
+        if ch in "*+?":
+            raise UnsupportedPattern("没有可重复的内容")
+        return ("set", _literal(ord(ch)))
+
+    def parse_group(self):
+        index = None
+        if self.src.startswith("?:", self.pos):
+            self.pos += 2
+        elif self.src.startswith("?P<", self.pos):
+            end = self.src.find(">", self.pos)
+            name = self.src[self.pos + 3:end]
+            if end < 0 or not name.isidentifier() or name in self.groupindex:
+                raise UnsupportedPattern("分组名无效")
+            self.pos = end + 1
+            self.groups += 1
+            index = self.groups
+            self.groupindex[name] = index
+        elif self.src.startswith("?#", self.pos):
+            end = self.src.find(")", self.pos)
+            if end < 0:
+                raise UnsupportedPattern("注释未结束")
+            self.pos = end + 1
+            return None
+        elif self.peek() == "?":
+            # 前后顾断言、反向引用、条件、原子组和内联标志都需要回溯
+            raise UnsupportedPattern("不支持的分组扩展")
+        else:
+            self.groups += 1
+            index = self.groups
+        node = self.parse_alt()
+        if self.peek() != ")":
+            raise UnsupportedPattern("括号不匹配")
+        self.pos += 1
+        return ("group", index, node)
+
+    def parse_escape(self):
+        if self.pos >= len(self.src):
+            raise UnsupportedPattern("模式以反斜杠结尾")
+        ch = self.src[self.pos]
+        self.pos += 1
+        if ch == "A":
+            return ("assert", "bol")
+        if ch == "Z":
+            return ("assert", "eot")
+        if ch == "b":
+            return ("assert", "word")
+        if ch == "B":
+            return ("assert", "nonword")
+        if ch in "dDwWsS":
+            return ("set", _category(ch, self.is_bytes))
+        return ("set", _literal(self.escape_code(ch)))
+
+    def escape_code(self, ch):
+        """字符转义 -> 码点；类别转义和断言由调用方处理"""
+        if ch in _SIMPLE_ESCAPES:
+            return _SIMPLE_ESCAPES[ch]
+        if ch == "0":
+            digits = ""
+            while len(digits) < 2 and self.peek() is not None and self.peek() in "01234567":
+                digits += self.src[self.pos]
+                self.pos += 1
+            return int(digits or "0", 8)
+        if ch in "xuU":
+            if ch != "x" and self.is_bytes:
+                raise UnsupportedPattern("bytes 模式不支持 \\u")
+            width = {"x": 2, "u": 4, "U": 8}[ch]
+            digits = self.src[self.pos:self.pos + width]
+            if len(digits) != width or not all(d in "0123456789abcdefABCDEF" for d in digits):
+                raise UnsupportedPattern("转义不完整")
+            self.pos += width
+            return int(digits, 16)
+        if ch.isdigit():
+            raise UnsupportedPattern("反向引用")
+        if ch.isascii() and ch.isalpha():
+            raise UnsupportedPattern(f"未知转义 \\{ch}")
+        return ord(ch)
+
+    def parse_class(self):
+        negate = self.peek() == "^"
+        if negate:
+            self.pos += 1
+        s = CharSet(negate)
+        first = True
+        while True:
+            ch = self.peek()
+            if ch is None:
+                raise UnsupportedPattern("字符集未结束")
+            if ch == "]" and not first:
+                self.pos += 1
+                return s
+            first = False
+            lo = self.class_item(s)
+            if lo is None:
+                if self.peek() == "-" and self.src[self.pos + 1:self.pos + 2] not in ("]", ""):
+                    raise UnsupportedPattern("字符范围无效")
+                continue
+            if self.peek() == "-" and self.pos + 1 < len(self.src) and self.src[self.pos + 1] != "]":
+                self.pos += 1
+                hi = self.class_item(s)
+                if hi is None or hi < lo:
+                    raise UnsupportedPattern("字符范围无效")
+                s.ranges.append((lo, hi))
+            else:
+                s.chars.add(lo)
+
+    def class_item(self, s):
+        """读取字符集中的一项；类别转义直接并入 s 并返回 None"""
+        ch = self.src[self.pos]
+        self.pos += 1
+        if ch != "\\":
+            return ord(ch)
+        if self.pos >= len(self.src):
+            raise UnsupportedPattern("字符集未结束")
+        ch = self.src[self.pos]
+        self.pos += 1
+        if ch in "dDwWsS":
+            s.categories.append(_category(ch, self.is_bytes))
+            return None
+        if ch == "b":
+            return 8
+        return self.escape_code(ch)
+
+
+def _is_quantifier(src, pos):
+    if src[pos] != "{":
+        return True
+    m = _REPEAT_RE.match(src, pos)
+    return bool(m) and m.group() != "{}"
+
+
+# ---------------------------------------------------------------- 编译
+
+def _reverse(node):
+    """语法树反向: 连接倒序；断言保持不变，反向 DFA 解析断言时会交换左右两侧"""
+    kind = node[0]
+    if kind == "cat":
+        return ("cat", [_reverse(n) for n in reversed(node[1])])
+    if kind == "alt":
+        return ("alt", [_reverse(n) for n in node[1]])
+    if kind == "rep":
+        return ("rep", _reverse(node[1]), node[2], node[3], node[4])
+    if kind == "group":
+        return ("group", node[1], _reverse(node[2]))
+    return node
+
+
+class _Compiler:
+    """Thompson 构造，指令:
+        ('char', 集合) ('split', 优先, 其次) ('jmp', 目标) ('save', 槽) ('assert', 种类) ('match',)
+    """
+
+    def __init__(self, captures=True):
+        self.prog = []
+        self.captures = captures
+
+    def emit(self, *instr):
+        if len(self.prog) >= MAX_PROGRAM:
+            raise UnsupportedPattern("模式展开后过大")
+        self.prog.append(list(instr))
+        return len(self.prog) - 1
+
+    def compile(self, node):
+        if self.captures:
+            self.emit("save", 0)
+        self.node(node)
+        if self.captures:
+            self.emit("save", 1)
+        self.emit("match")
+        return [tuple(instr) for instr in self.prog]
+
+    def node(self, node):
+        kind = node[0]
+        if kind == "set":
+            self.emit("char", node[1])
+        elif kind == "cat":
+            for child in node[1]:
+                self.node(child)
+        elif kind == "alt":
+            jumps = []
+            for child in node[1][:-1]:
+                split = self.emit("split", None, None)
+                self.prog[split][1] = len(self.prog)
+                self.node(child)
+                jumps.append(self.emit("jmp", None))
+                self.prog[split][2] = len(self.prog)
+            self.node(node[1][-1])
+            for j in jumps:
+                self.prog[j][1] = len(self.prog)
+        elif kind == "group":
+            if node[1] is not None and self.captures:
+                self.emit("save", 2 * node[1])
+                self.node(node[2])
+                self.emit("save", 2 * node[1] + 1)
+            else:
+                self.node(node[2])
+        elif kind == "assert":
+            self.emit("assert", node[1])
+        elif kind == "rep":
+            self.repeat(*node[1:])
+
+    def _split(self, greedy, body, out):
+        return ("split", body, out) if greedy else ("split", out, body)
+
+    def repeat(self, child, lo, hi, greedy):
+        for _ in range(lo):
+            self.node(child)
+        nullable = _nullable(child)
+        exits = []  # 空迭代之后跳到循环出口的指令
+        if hi is None:
+            loop = self.emit("split", None, None)
+            if nullable:
+                exits.append(self.checked_iteration(child))
+            else:
+                self.node(child)
+            self.emit("jmp", loop)
+            splits = [loop]
+        else:
+            splits = []
+            for _ in range(hi - lo):
+                splits.append(self.emit("split", None, None))
+                if nullable:
+                    exits.append(self.checked_iteration(child))
+                else:
+                    self.node(child)
+        out = len(self.prog)
+        for s in splits:
+            self.prog[s][1:] = self._split(greedy, s + 1, out)[1:]
+        for j in exits:
+            self.prog[j][1] = out
+
+    def checked_iteration(self, child):
+        """循环体能匹配空串时的一次可选迭代，模拟 re 的规则: 一次迭代没有读入字符，就不再重复，
+        直接接循环后面的部分（re 在 MAX_UNTIL/MIN_UNTIL 中比较迭代起点）
+
+        循环体编译两份: A 份表示本次迭代还没读入字符，每读入一个字符就转到 B 份的对应位置。
+        A 份走到末尾说明迭代为空，跳到循环出口，返回这条跳转指令由调用方填上出口；
+        B 份紧接在后面，走到末尾时落到调用方放在后面的指令（回到循环开头或下一次迭代）。
+        嵌套的可空循环每层使程序翻倍，受 MAX_PROGRAM 限制。
+        """
+        sub = _Compiler(self.captures)
+        sub.node(child)
+        body = sub.prog
+        a_pos = []
+        pos = len(self.prog)
+        for instr in body:
+            a_pos.append(pos)
+            pos += 2 if instr[0] == "char" else 1
+        a_end = pos
+        b_start = a_end + 1
+
+        def in_a(target):
+            return a_pos[target] if target < len(body) else a_end
+
+        for i, instr in enumerate(body):
+            op = instr[0]
+            if op == "char":
+                self.emit("char", instr[1])
+                self.emit("jmp", b_start + i + 1)
+            elif op == "jmp":
+                self.emit("jmp", in_a(instr[1]))
+            elif op == "split":
+                self.emit("split", in_a(instr[1]), in_a(instr[2]))
+            else:
+                self.emit(*instr)
+        exit_jump = self.emit("jmp", None)
+        for instr in body:
+            op = instr[0]
+            if op == "jmp":
+                self.emit("jmp", b_start + instr[1])
+            elif op == "split":
+                self.emit("split", b_start + instr[1], b_start + instr[2])
+            else:
+                self.emit(*instr)
+        return exit_jump
+
+
+def _nullable(node):
+    """语法树能否匹配空串"""
+    kind = node[0]
+    if kind == "set":
+        return False
+    if kind == "cat":
+        return all(_nullable(child) for child in node[1])
+    if kind == "alt":
+        return any(_nullable(child) for child in node[1])
+    if kind == "group":
+        return _nullable(node[2])
+    if kind == "rep":
+        return node[2] == 0 or _nullable(node[1])
+    return True  # assert、empty
+
+
+# ---------------------------------------------------------------- 断言
+
+def _class_at(text, i, word):
+    """text 中下标 i 处字符的类别，越界为 _NONE"""
+    if i < 0 or i >= len(text):
+        return _NONE
+    c = text[i]
+    return _WORD if word(c if isinstance(c, int) else ord(c)) else _OTHER
+
+
+def _holds(kind, left, right):
+    if kind == "bol":
+        return left == _NONE
+    if kind == "eot":
+        return right == _NONE
+    if kind == "word":
+        return (left == _WORD) != (right == _WORD)
+    # \B: 空字符串中不匹配，与 re 一致
+    return (left == _WORD) == (right == _WORD) and not (left == _NONE and right == _NONE)
+
+
+# ---------------------------------------------------------------- DFA
+
+class _State:
+    __slots__ = ("pcs", "left", "searching", "skip_empty", "next", "final", "dead")
+
+    def __init__(self, pcs, left, searching, skip_empty):
+        self.pcs = pcs  # 按优先级排列、尚未解析断言的线程
+        self.left = left  # 左侧字符的类别
+        self.searching = searching  # 尚未找到匹配，每一步都从当前位置再起一个线程
+        self.skip_empty = skip_empty  # 不接受起点处的空匹配
+        self.next = {}  # 字符 -> (在该字符前是否匹配, 下一状态)
+        self.final = {}  # 右侧类别 -> 是否匹配（扫描结束时）
+        self.dead = not pcs and not searching
+
+
+class _LazyDFA:
+    """在 Thompson 程序上按需构造 DFA 状态
+
+    forward=True 时是最左优先（re 的语义）的非锚定查找；
+    forward=False 时用于反向程序，锚定、取最长匹配。
+    """
+
+    def __init__(self, prog, word, forward, max_states=MAX_DFA_STATES):
+        self.prog = prog
+        self.word = word
+        self.forward = forward
+        self.max_states = max_states
+        self.states = {}
+        self.resets = 0
+        self._closures = {}
+
+    def closure(self, pc):
+        """从 pc 出发沿 jmp/split/save 能到达的字符、断言和匹配指令，按优先级排列"""
+        cached = self._closures.get(pc)
+        if cached is not None:
+            return cached
+        start = pc
+        out = []
+        seen = set()
+        stack = [pc]
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op = self.prog[pc]
+            if op[0] == "jmp":
+                stack.append(op[1])
+            elif op[0] == "split":
+                stack.append(op[2])
+                stack.append(op[1])
+            elif op[0] == "save":
+                stack.append(pc + 1)
+            else:
+                out.append(pc)
+        out = tuple(out)
+        self._closures[start] = out
+        return out
+
+    def state(self, pcs, left, searching, skip_empty=False):
+        key = (pcs, left, searching, skip_empty)
+        st = self.states.get(key)
+        if st is None:
+            if len(self.states) >= self.max_states:
+                # 缓存满了: 断开旧状态之间的引用并清空，之后按需重建
+                for old in self.states.values():
+                    old.next.clear()
+                self.states.clear()
+                self.resets += 1
+            st = _State(pcs, left, searching, skip_empty)
+            self.states[key] = st
+        return st
+
+    def initial(self, left, skip_empty=False):
+        return self.state(self.closure(0), left, self.forward, skip_empty)
+
+    def resolve(self, st, right):
+        """按右侧字符类别展开断言，返回 (可消耗字符的线程, 是否匹配)"""
+        out = []
+        seen = set()
+        matched = False
+        left_cls, right_cls = (st.left, right) if self.forward else (right, st.left)
+        stack = list(reversed(st.pcs))
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op = self.prog[pc]
+            if op[0] == "assert":
+                if _holds(op[1], left_cls, right_cls):
+                    stack.extend(reversed(self.closure(pc + 1)))
+            elif op[0] == "match":
+                if st.skip_empty:
+                    continue
+                matched = True
+                if self.forward:
+                    break  # 最左优先: 优先级更低的线程不再需要
+            else:
+                out.append(pc)
+        return out, matched
+
+    def step(self, st, ch):
+        """计算状态 st 读入字符 ch 后的转移并缓存"""
+        code = ch if isinstance(ch, int) else ord(ch)
+        cls = _WORD if self.word(code) else _OTHER
+        threads, matched = self.resolve(st, cls)
+        pcs = []
+        seen = set()
+        for pc in threads:
+            if self.prog[pc][1](code):
+                for q in self.closure(pc + 1):
+                    if q not in seen:
+                        seen.add(q)
+                        pcs.append(q)
+        searching = st.searching and not matched
+        if searching:
+            for q in self.closure(0):
+                if q not in seen:
+                    seen.add(q)
+                    pcs.append(q)
+        result = (matched, self.state(tuple(pcs), cls, searching))
+        st.next[ch] = result
+        return result
+
+    def at_end(self, st, right):
+        """扫描在此结束（右侧类别为 right）时是否匹配"""
+        matched = st.final.get(right)
+        if matched is None:
+            matched = self.resolve(st, right)[1]
+            st.final[right] = matched
+        return matched
+
+    def find_end(self, text, pos, skip_empty):
+        """正向查找: 返回从 pos 起最左优先匹配的终点，没有匹配返回 -1"""
+        st = self.initial(_class_at(text, pos - 1, self.word), skip_empty)
+        last = -1
+        n = len(text)
+        i = pos
+        while i < n:
+            ch = text[i]
+            t = st.next.get(ch)
+            if t is None:
+                t = self.step(st, ch)
+            if t[0]:
+                last = i
+            st = t[1]
+            if st.dead:
+                return last
+            i += 1
+        if self.at_end(st, _NONE):
+            last = n
+        return last
+
+    def find_start(self, text, end, lower):
+        """反向锚定查找: 返回使 text[s:end] 匹配的最小 s（不小于 lower）"""
+        st = self.initial(_class_at(text, end, self.word))
+        best = -1
+        i = end
+        while True:
+            right = _class_at(text, i - 1, self.word)
+            if self.at_end(st, right):
+                best = i
+            if i <= lower or st.dead:
+                return best
+            ch = text[i - 1]
+            t = st.next.get(ch)
+            if t is None:
+                t = self.step(st, ch)
+            st = t[1]
+            i -= 1
+
+
+class _SetDFA(_LazyDFA):
+    """多个模式合并后的非锚定 DFA，不区分优先级，报告每个位置上结束匹配的所有模式
+
+    匹配指令带模式编号 ('match', 编号)；状态中的线程按编号排序去重。
+    每个位置都要从所有模式的起点再起线程，这部分对所有状态都一样，
+    所以状态里只记其余线程，起点线程的断言展开和字符转移按 (左右类别, 字符) 单独缓存。
+    """
+
+    def __init__(self, prog, starts, word, max_states=MAX_DFA_STATES):
+        super().__init__(prog, word, True, max_states)
+        seen = set()
+        for start in starts:
+            seen.update(self.closure(start))
+        self.start = frozenset(seen)
+        self._start_resolved = {}  # (左类别, 右类别) -> (线程, 匹配的模式)
+        self._start_next = {}  # (左类别, 右类别, 码点) -> 后继线程
+
+    def initial(self, left, skip_empty=False):
+        return self.state((), left, True)
+
+    def _expand(self, pcs, left, right):
+        out = []
+        matched = []
+        seen = set()
+        stack = list(pcs)
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op = self.prog[pc]
+            if op[0] == "assert":
+                if _holds(op[1], left, right):
+                    stack.extend(self.closure(pc + 1))
+            elif op[0] == "match":
+                matched.append(op[1])
+            else:
+                out.append(pc)
+        return out, matched
+
+    def _advance(self, threads, code):
+        pcs = set()
+        for pc in threads:
+            if self.prog[pc][1](code):
+                pcs.update(self.closure(pc + 1))
+        return pcs
+
+    def resolve(self, st, right):
+        """按右侧字符类别展开断言，返回 (可消耗字符的线程, 在此结束匹配的模式编号)
+
+        返回的线程不含起点线程，它们由 step 单独处理。
+        """
+        key = (st.left, right)
+        start = self._start_resolved.get(key)
+        if start is None:
+            start = self._expand(self.start, st.left, right)
+            self._start_resolved[key] = start
+        out, matched = self._expand(st.pcs, st.left, right)
+        return out, tuple(sorted(set(matched).union(start[1])))
+
+    def step(self, st, ch):
+        code = ch if isinstance(ch, int) else ord(ch)
+        cls = _WORD if self.word(code) else _OTHER
+        threads, matched = self.resolve(st, cls)
+        key = (st.left, cls, code)
+        pcs = self._start_next.get(key)
+        if pcs is None:
+            pcs = self._advance(self._start_resolved[st.left, cls][0], code)
+            self._start_next[key] = pcs
+        pcs = pcs.union(self._advance(threads, code)) - self.start
+        result = (matched, self.state(tuple(sorted(pcs)), cls, True))
+        st.next[ch] = result
+        return result
+
+
+class PatternSet:
+    """把多个模式合并为一个自动机，一次扫描统计每个模式的命中
+
+    命中按匹配的结束位置计: 同一模式在不同位置结束的匹配各算一次，
+    因此重叠出现都会计数（与逐个 findall 的不重叠计数不同）。
+    输入可以分块送入（feed），块边界不影响结果。
+    """
+
+    def __init__(self, is_bytes=False):
+        self.is_bytes = is_bytes
+        self.word = _ascii_word if is_bytes else _unicode_word
+        self.prog = []
+        self.starts = []
+        self.trees = []
+        self._dfa = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, pattern):
+        """加入一个模式并返回其编号；不支持的模式（含 $ 的也不支持）抛出 UnsupportedPattern"""
+        text = pattern.decode("latin-1") if isinstance(pattern, bytes) else pattern
+        tree = _Parser(text, self.is_bytes).parse()
+        prog = _Compiler(captures=False).compile(tree)
+        if ("assert", "eol") in prog:
+            raise UnsupportedPattern("$ 需要向后看，不能合并")
+        if len(self.prog) + len(prog) > MAX_PROGRAM * 50:
+            raise UnsupportedPattern("合并后的程序过大")
+        pid = len(self.starts)
+        offset = len(self.prog)
+        for op in prog:
+            if op[0] == "jmp":
+                op = ("jmp", op[1] + offset)
+            elif op[0] == "split":
+                op = ("split", op[1] + offset, op[2] + offset)
+            elif op[0] == "match":
+                op = ("match", pid)
+            self.prog.append(op)
+        self.starts.append(offset)
+        self.trees.append(tree)
+        self._dfa = None
+        return pid
+
+    def scanner(self):
+        """返回一个新的扫描器，开始一次新的扫描"""
+        if self._dfa is None:
+            self._dfa = _SetDFA(self.prog, self.starts, self.word)
+        return _SetScanner(self._dfa, len(self.starts))
+
+    def first_start(self, pid, data, end):
+        """在结束于 end 的匹配中，取最靠左的起点"""
+        prog = _Compiler(captures=False).compile(_reverse(self.trees[pid]))
+        return _LazyDFA(prog, self.word, False).find_start(data, end, 0)
+
+    def cache_info(self):
+        if self._dfa is None:
+            return {}
+        return {"states": len(self._dfa.states), "resets": self._dfa.resets}
+
+
+class _SetScanner:
+    """一次扫描的状态: counts[编号] 命中次数, first_end[编号] 第一次命中的结束位置（-1 表示未命中）"""
+
+    def __init__(self, dfa, n):
+        self.dfa = dfa
+        self.state = dfa.initial(_NONE)
+        self.pos = 0
+        self.counts = [0] * n
+        self.first_end = [-1] * n
+
+    def _record(self, pids, pos):
+        counts = self.counts
+        first_end = self.first_end
+        for pid in pids:
+            if first_end[pid] < 0:
+                first_end[pid] = pos
+            counts[pid] += 1
+
+    def feed(self, chunk):
+        st = self.state
+        pos = self.pos
+        step = self.dfa.step
+        for ch in chunk:
+            t = st.next.get(ch)
+            if t is None:
+                t = step(st, ch)
+            if t[0]:
+                self._record(t[0], pos)
+            st = t[1]
+            pos += 1
+        self.state = st
+        self.pos = pos
+
+    def finish(self):
+        """输入结束，补上在末尾结束的匹配"""
+        matched = self.dfa.resolve(self.state, _NONE)[1]
+        if matched:
+            self._record(matched, self.pos)
+
+
+# ---------------------------------------------------------------- Pike VM
+
+def _pike(prog, text, pos, word, nslots, anchored=False, skip_empty=False):
+    """带优先级的 NFA 模拟，返回最左优先匹配的捕获槽元组，没有匹配返回 None"""
+    n = len(text)
+    matched = None
+
+    def add(threads, seen, pc, caps, i):
+        stack = [(pc, caps)]
+        while stack:
+            pc, caps = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op = prog[pc]
+            kind = op[0]
+            if kind == "jmp":
+                stack.append((op[1], caps))
+            elif kind == "split":
+                stack.append((op[2], caps))
+                stack.append((op[1], caps))
+            elif kind == "save":
+                caps = caps[:op[1]] + (i,) + caps[op[1] + 1:]
+                stack.append((pc + 1, caps))
+            elif kind == "assert":
+                if op[1] == "eol":
+                    ok = i == n or (i == n - 1 and text[i] in ("\n", 10))
+                else:
+                    ok = _holds(op[1], _class_at(text, i - 1, word), _class_at(text, i, word))
+                if ok:
+                    stack.append((pc + 1, caps))
+            else:
+                threads.append((pc, caps))
+
+    empty = (None,) * nslots
+    threads = []
+    seen = set()
+    add(threads, seen, 0, empty, pos)
+    i = pos
+    while True:
+        nxt = []
+        nseen = set()
+        c = None
+        if i < n:
+            c = text[i]
+            c = c if isinstance(c, int) else ord(c)
+        for pc, caps in threads:
+            op = prog[pc]
+            if op[0] == "match":
+                if skip_empty and caps[0] == caps[1] == pos:
+                    continue
+                matched = caps
+                break
+            if c is not None and op[1](c):
+                add(nxt, nseen, pc + 1, caps, i + 1)
+        if i >= n:
+            break
+        i += 1
+        if matched is None and not anchored:
+            add(nxt, nseen, 0, empty, i)
+        elif not nxt:
+            break
+        threads = nxt
+    return matched
+
+
+# ---------------------------------------------------------------- 对外接口
+
+class LinearMatch:
+    """与 re.Match 接口一致的匹配结果，分组在首次访问时计算"""
+
+    def __init__(self, regex, string, start, end, slots=None):
+        self.re = regex
+        self.string = string
+        self.pos = start
+        self._span = (start, end)
+        self._slots = slots
+
+    def _groups_slots(self):
+        if self._slots is None:
+            self._slots = self.re._captures(self.string, *self._span)
+        return self._slots
+
+    def _index(self, g):
+        if isinstance(g, str):
+            if g not in self.re.groupindex:
+                raise IndexError("no such group")
+            return self.re.groupindex[g]
+        if not 0 <= g <= self.re.groups:
+            raise IndexError("no such group")
+        return g
+
+    def span(self, group=0):
+        g = self._index(group)
+        if g == 0:
+            return self._span
+        slots = self._groups_slots()
+        start, end = slots[2 * g], slots[2 * g + 1]
+        return (-1, -1) if start is None or end is None else (start, end)
+
+    def start(self, group=0):
+        return self.span(group)[0]
+
+    def end(self, group=0):
+        return self.span(group)[1]
+
+    def group(self, *groups):
+        if not groups:
+            groups = (0,)
+        values = []
+        for g in groups:
+            start, end = self.span(g)
+            values.append(None if start < 0 else self.string[start:end])
+        return values[0] if len(values) == 1 else tuple(values)
+
+    def __getitem__(self, g):
+        return self.group(g)
+
+    def groups(self, default=None):
+        values = (self.group(g) for g in range(1, self.re.groups + 1))
+        return tuple(default if v is None else v for v in values)
+
+    def groupdict(self, default=None):
+        return {name: (self.group(g) if self.group(g) is not None else default)
+                for name, g in self.re.groupindex.items()}
+
+    def expand(self, template):
+        return compile_template(self.re, template, strict=True)(self)
+
+    def __repr__(self):
+        return f"<LinearMatch span={self._span!r} match={self.group()!r}>"
+
+
+class LinearPattern:
+    """线性时间正则，接口与 re.Pattern 的常用部分一致"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.is_bytes = isinstance(pattern, bytes)
+        text = pattern.decode("latin-1") if self.is_bytes else pattern
+        parser = _Parser(text, self.is_bytes)
+        tree = parser.parse()
+        self.groups = parser.groups
+        self.groupindex = dict(parser.groupindex)
+        self.word = _ascii_word if self.is_bytes else _unicode_word
+        self.prog = _Compiler().compile(tree)
+        self.nslots = 2 * (self.groups + 1)
+        if any(op == ("assert", "eol") for op in self.prog):
+            self.engine = "NFA"  # $ 需要向后看两个字符，交给 Pike VM
+            self._forward = self._backward = None
+        else:
+            self.engine = "DFA"
+            self._forward = _LazyDFA(_Compiler(captures=False).compile(tree), self.word, True)
+            self._backward = _LazyDFA(_Compiler(captures=False).compile(_reverse(tree)),
+                                      self.word, False)
+
+    def _check(self, string):
+        if isinstance(string, str) == self.is_bytes:
+            raise TypeError("模式与主题的类型不一致（str/bytes）")
+
+    def _captures(self, string, start, end):
+        # 非空匹配时跳过起点处的空匹配，与查找时 skip_empty 的效果一致
+        slots = _pike(self.prog, string, start, self.word, self.nslots,
+                      anchored=True, skip_empty=end > start)
+        if slots is None or slots[1] != end:
+            # 理论上不会发生；保守地只给出整体匹配
+            return (start, end) + (None,) * (self.nslots - 2)
+        return slots
+
+    def _search(self, string, pos, anchored=False, skip_empty=False):
+        if self.engine == "NFA":
+            slots = _pike(self.prog, string, pos, self.word, self.nslots, anchored, skip_empty)
+            if slots is None:
+                return None
+            return LinearMatch(self, string, slots[0], slots[1], slots)
+        if anchored:
+            slots = _pike(self.prog, string, pos, self.word, self.nslots, True, skip_empty)
+            if slots is None:
+                return None
+            return LinearMatch(self, string, slots[0], slots[1], slots)
+        end = self._forward.find_end(string, pos, skip_empty)
+        if end < 0:
+            return None
+        start = self._backward.find_start(string, end, pos)
+        return LinearMatch(self, string, start, end, None if self.groups else
+                           (start, end))
+
+    def search(self, string, pos=0):
+        self._check(string)
+        return self._search(string, pos)
+
+    def match(self, string, pos=0):
+        self._check(string)
+        return self._search(string, pos, anchored=True)
+
+    def finditer(self, string, pos=0):
+        self._check(string)
+        skip_empty = False
+        n = len(string)
+        while pos <= n:
+            m = self._search(string, pos, skip_empty=skip_empty)
+            if m is None:
+                return
+            yield m
+            start, end = m.span()
+            # 空匹配之后在同一位置继续找，但不再接受那里的空匹配
+            skip_empty = start == end
+            pos = end
+
+    def findall(self, string, pos=0):
+        return [match_item(m) for m in self.finditer(string, pos)]
+
+    def subn(self, repl, string, count=0):
+        expand = repl if callable(repl) else compile_template(self, repl, strict=True)
+        pieces = []
+        last = 0
+        done = 0
+        for m in self.finditer(string):
+            pieces.append(string[last:m.start()])
+            pieces.append(expand(m))
+            last = m.end()
+            done += 1
+            if done == count:
+                break
+        pieces.append(string[last:])
+        return string[:0].join(pieces), done
+
+    def sub(self, repl, string, count=0):
+        return self.subn(repl, string, count)[0]
+
+    def split(self, string, maxsplit=0):
+        pieces = []
+        last = 0
+        for i, m in enumerate(self.finditer(string)):
+            if maxsplit and i >= maxsplit:
+                break
+            pieces.append(string[last:m.start()])
+            pieces.extend(m.groups())
+            last = m.end()
+        pieces.append(string[last:])
+        return pieces
+
+    def cache_info(self):
+        """DFA 状态缓存的使用情况"""
+        if self.engine != "DFA":
+            return {}
+        return {"states": len(self._forward.states) + len(self._backward.states),
+                "resets": self._forward.resets + self._backward.resets}
+
+
+def compile_linear(pattern):
+    """编译为线性时间引擎；模式超出支持范围时抛出 UnsupportedPattern"""
+    return LinearPattern(pattern)
@@ -3,100 +3,168 @@
 
 """
 逻辑模块 - 处理计算器逻辑和数学计算
+
+各模式专用的模块（绘图、微积分、逻辑门、正则引擎、进制转换、方程求解）
+在用到它们的方法里导入，不拖慢启动；进入模式时由 modes.enter 预先导入。
 """
 
-import math
-import re
+import time
 import curses
+from collections import OrderedDict
+import modes
+from evaluator import compile_expression, ExpressionError
+from editor import GapBuffer
+from history import History, HistorySearch
+from worksheet import Worksheet, parse_assignment
+
+LARGE_INT_BITS = 3322  # 超过约 1000 位十进制的整数结果只显示首尾
+
+
+class LargeIntResult(str):
+    """只显示了首尾几位的大整数结果，value 保留精确值供 ans 使用
+
+    作为 str 可以直接当结果文本显示和写入历史，跨进程传递时连同精确值一起序列化。
+    """
+
+    def __new__(cls, text, value):
+        self = super().__new__(cls, text)
+        self.value = value
+        return self
+
+    def __reduce__(self):
+        return LargeIntResult, (str(self), self.value)
+
+
+class ExpressionCache:
+    """有界LRU缓存: 规范化表达式 -> 已编译的表达式"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(expr):
+        """规范化表达式文本，去掉所有空白"""
+        return "".join(expr.split())
+
+    def lookup(self, expr):
+        """返回已编译的表达式，未命中时编译并缓存"""
+        key = self.normalize(expr)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = self.compile(key)
+        self._entries[key] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    @staticmethod
+    def compile(expr):
+        """编译并校验表达式"""
+        try:
+            return compile_expression(expr)
+        except ExpressionError as e:
+            raise ValueError(f"评估表达式错误: {e}")
+
+    def clear(self):
+        """清空缓存（计数保留）"""
+        self._entries.clear()
+
+    def stats(self):
+        """返回缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
 
 class CalculatorLogic:
     def __init__(self):
-        self.expression = ""
+        self.editor = GapBuffer()  # 表达式编辑缓冲区
         self.result = ""
-        self.history = []
+        self.history = History()  # 计算历史，由界面接上日志文件后持久保存
         self.cursor_pos = 0
-        self.mode = "标准"  # 模式: 标准, 编程, 逻辑门, 正则表达式, 进制换算
+        self.mode = modes.DEFAULT  # 模式: 标准, 编程, 逻辑门, 正则表达式, 进制换算, 求解（见 modes.py）
         self.ui_state = {}  # UI状态存储
-        
-        # 定义按钮布局
-        self.buttons = [
-            ["7", "8", "9", "/", "sin(", "cos(", "∫"],
-            ["4", "5", "6", "*", "tan(", "sqrt(", "∂"],
-            ["1", "2", "3", "-", "log(", "exp(", "dx"],
-            ["0", ".", "π", "+", "(", ")", "dy"],
-            ["=", "C", "Del", "Ans", "Help", "Quit"]
-        ]
-        
-        # 编程按钮布局
-        self.codingbuttons = [
-            ["0", "1"],
-            ["/", " * "],
-            ["-", "+"],
-            ["=",]
-        ]
-
-        # 逻辑门按钮布局
-        self.logic_gate_buttons = [
-            ["AND", "OR", "NOT", "XOR", "NAND", "NOR"],
-            ["Truth", "Table", "Show", "0", "1", "Calc"],
-            ["7", "8", "9", "/", "sin(", "cos("],
-            ["4", "5", "6", "*", "tan(", "sqrt("],
-            ["1", "2", "3", "-", "log(", "exp("],
-            ["0", ".", "π", "+", "(", ")"],
-            ["=", "C", "Del", "Ans", "Help", "Quit"]
-        ]
-
-        # 进制换算按钮布局
-        self.base_conversion_buttons = [
-            ["BIN", "OCT", "DEC", "HEX", "CONV", "SWAP"],
-            ["7", "8", "9", "A", "B", "C"],
-            ["4", "5", "6", "D", "E", "F"],
-            ["1", "2", "3", "CLR", "Help", "Quit"],
-            ["0", ".", "=", "Ans", "Mode", "Back"]
-        ]
-
-        # 正则表达式按钮布局
-        self.regex_buttons = [
-            ["match", "search", "findall", "sub", "split", "compile"],
-            ["^", "$", "*", "+", "?", "."],
-            ["[", "]", "(", ")", "{", "}"],
-            ["|", "\\", "w", "d", "s", "b"],
-            ["CLR", "Test", "=", "Ans", "Help", "Quit"]
-        ]
-    
+        self.expr_cache = ExpressionCache()  # 已编译表达式缓存
+        self.plot = None  # 当前绘图，None表示未在绘图
+        self.table = None  # 正在翻看的真值表，None表示未打开
+        self.current_base = 10  # 进制换算模式下默认的输入进制
+        self._base_converter = None  # 大整数进制转换（缓存幂表），第一次用到时创建
+        self.base_preview_edge = 24  # 进制换算结果超过 2*edge 位时只显示首尾
+        self.regex_engine = "auto"  # 正则引擎: auto（线性优先，必要时退回 re）, linear, re
+        self.evaluator = None  # 后台求值的 AsyncEvaluator，None 表示在当前线程同步求值
+        self.job_previous = ""  # 后台任务开始前的结果，供任务中的 ans 使用
+        self.job_sheet = None  # 后台赋值、删除任务交给工作进程的单元格名
+        self.search = None  # Ctrl-R 历史搜索的 HistorySearch，None 表示未在搜索
+        self.perf = None  # perf.PerfMonitor，记录每次求值的耗时
+        self.worksheet = Worksheet()  # 用户变量（x = 公式），按依赖关系增量重算
+        self.variables = self.worksheet.values  # 求值时的变量绑定；工作进程中换成界面传来的副本
+
+    @property
+    def buttons(self):
+        """当前模式的按钮布局"""
+        return modes.buttons(self.mode)
+
+    @property
+    def base_converter(self):
+        if self._base_converter is None:
+            from baseconv import BaseConverter
+            self._base_converter = BaseConverter()
+        return self._base_converter
+
+    @property
+    def expression(self):
+        """当前表达式文本"""
+        return self.editor.text()
+
+    @expression.setter
+    def expression(self, text):
+        self.editor.set_text(text)
+
+    @property
+    def cursor_pos(self):
+        """光标位置"""
+        return self.editor.cursor
+
+    @cursor_pos.setter
+    def cursor_pos(self, pos):
+        self.editor.move_to(pos)
+
     def handle_key(self, key, selected_row, selected_col):
         """处理按键事件"""
+        if self.search is not None:
+            return self.handle_search_key(key)
         if key == ord('q') or key == ord('Q'):
             return "QUIT"
+        if key == 27 and self.evaluator is not None and self.evaluator.busy:
+            self.cancel_evaluation()
+            return None
+        if self.plot is not None:
+            return self.handle_plot_key(key)
+        if self.table is not None:
+            return self.handle_table_key(key)
         elif key == curses.KEY_UP:
             self.ui_state["selected_row"] = max(0, selected_row - 1)
             return "UPDATE_UI"
         elif key == curses.KEY_DOWN:
-            # 根据模式选择正确的按钮布局长度
-            if self.mode == "编程":
-                max_row = len(self.codingbuttons) - 1
-            elif self.mode == "逻辑门":
-                max_row = len(self.logic_gate_buttons) - 1
-            elif self.mode == "进制换算":
-                max_row = len(self.base_conversion_buttons) - 1
-            elif self.mode == "正则表达式":
-                max_row = len(self.regex_buttons) - 1
-            else:
-                max_row = len(self.buttons) - 1
-            self.ui_state["selected_row"] = min(max_row, selected_row + 1)
+            self.ui_state["selected_row"] = min(len(self.buttons) - 1, selected_row + 1)
             return "UPDATE_UI"
         elif key == curses.KEY_LEFT:
-            # 根据模式选择正确的按钮布局
-            if self.mode == "编程":
-                buttons = self.codingbuttons
-            elif self.mode == "逻辑门":
-                buttons = self.logic_gate_buttons
-            elif self.mode == "进制换算":
-                buttons = self.base_conversion_buttons
-            elif self.mode == "正则表达式":
-                buttons = self.regex_buttons
-            else:
-                buttons = self.buttons
+            buttons = self.buttons
 
             if selected_col > 0:
                 self.ui_state["selected_col"] = selected_col - 1
@@ -105,17 +173,7 @@ class CalculatorLogic:
                 self.ui_state["selected_col"] = len(buttons[selected_row - 1]) - 1
             return "UPDATE_UI"
         elif key == curses.KEY_RIGHT:
-            # 根据模式选择正确的按钮布局
-            if self.mode == "编程":
-                buttons = self.codingbuttons
-            elif self.mode == "逻辑门":
-                buttons = self.logic_gate_buttons
-            elif self.mode == "进制换算":
-                buttons = self.base_conversion_buttons
-            elif self.mode == "正则表达式":
-                buttons = self.regex_buttons
-            else:
-                buttons = self.buttons
+            buttons = self.buttons
 
             if selected_col < len(buttons[selected_row]) - 1:
                 self.ui_state["selected_col"] = selected_col + 1
@@ -123,28 +181,24 @@ class CalculatorLogic:
                 self.ui_state["selected_row"] = selected_row + 1
                 self.ui_state["selected_col"] = 0
             return "UPDATE_UI"
+        elif key == curses.KEY_PPAGE:
+            self.history.scroll(self.history.page_size)
+        elif key == curses.KEY_NPAGE:
+            self.history.scroll(-self.history.page_size)
+        elif key == 18:  # Ctrl-R
+            self.search = HistorySearch(self.history)
         elif key == curses.KEY_BACKSPACE or key == 127:
-            if self.expression and self.cursor_pos > 0:
-                self.expression = self.expression[:self.cursor_pos-1] + self.expression[self.cursor_pos:]
-                self.cursor_pos -= 1
+            self.editor.delete_before(1)
         elif key == curses.KEY_HOME:
             self.cursor_pos = 0
         elif key == curses.KEY_END:
-            self.cursor_pos = len(self.expression)
+            self.cursor_pos = len(self.editor)
         elif key == curses.KEY_LEFT and self.cursor_pos > 0:
             self.cursor_pos -= 1
-        elif key == curses.KEY_RIGHT and self.cursor_pos < len(self.expression):
+        elif key == curses.KEY_RIGHT and self.cursor_pos < len(self.editor):
             self.cursor_pos += 1
         elif key == ord('\n') or key == ord(' '):
-            if self.mode == "逻辑门":
-                buttons = self.logic_gate_buttons
-            elif self.mode == "进制换算":
-                buttons = self.base_conversion_buttons
-            elif self.mode == "正则表达式":
-                buttons = self.regex_buttons
-            else:
-                buttons = self.buttons
-            button = buttons[selected_row][selected_col]
+            button = self.buttons[selected_row][selected_col]
             return self.handle_button_click(button)
         elif key == ord('h') or key == ord('H'):
             return "SHOW_HELP"
@@ -160,19 +214,78 @@ class CalculatorLogic:
         
         return None
     
+    def handle_plot_key(self, key):
+        """绘图状态下的按键: 方向键平移, +/- 缩放, r 重新缩放, 其他键退出"""
+        if key == curses.KEY_LEFT:
+            self.plot.pan(-0.1)
+        elif key == curses.KEY_RIGHT:
+            self.plot.pan(0.1)
+        elif key == curses.KEY_UP:
+            self.plot.pan(0, 0.1)
+        elif key == curses.KEY_DOWN:
+            self.plot.pan(0, -0.1)
+        elif key == ord('+') or key == ord('='):
+            self.plot.zoom(0.5)
+        elif key == ord('-'):
+            self.plot.zoom(2.0)
+        elif key == ord('r') or key == ord('R'):
+            self.plot.reset_scale()
+        else:
+            self.plot = None
+        return None
+
+    def handle_table_key(self, key):
+        """真值表翻页: 上下键逐行, PgUp/PgDn 翻页, Home/End 首尾, n/p 跳到下/上一个为真的行, 其他键退出"""
+        table = self.table
+        if key == curses.KEY_UP:
+            table.scroll(-1)
+        elif key == curses.KEY_DOWN:
+            table.scroll(1)
+        elif key == curses.KEY_PPAGE:
+            table.scroll(-table.page_size)
+        elif key == curses.KEY_NPAGE:
+            table.scroll(table.page_size)
+        elif key == curses.KEY_HOME:
+            table.scroll_to(0)
+        elif key == curses.KEY_END:
+            table.scroll_to(table.rows - table.page_size)
+        elif key == ord('n') or key == ord('N'):
+            table.next_true()
+        elif key == ord('p') or key == ord('P'):
+            table.next_true(forward=False)
+        else:
+            self.table = None
+        return None
+
     def switch_mode(self):
-        """切换计算模式"""
-        modes = ["标准", "编程", "逻辑门", "正则表达式", "进制换算"]
-        current_index = modes.index(self.mode)
-        self.mode = modes[(current_index + 1) % len(modes)]
+        """切换计算模式，第一次进入某个模式时加载它依赖的模块"""
+        self.mode = modes.next_mode(self.mode)
+        modes.enter(self.mode)
     
+    def handle_search_key(self, key):
+        """历史搜索状态下的按键: 输入字符即时搜索，Ctrl-R/上键选更早的结果，下键选更新的，
+        回车把选中的表达式插入到光标处，Esc 或 Ctrl-G 退出搜索"""
+        search = self.search
+        if key == 18 or key == curses.KEY_UP:
+            search.move(1)
+        elif key == curses.KEY_DOWN:
+            search.move(-1)
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            search.backspace()
+        elif key in (ord('\n'), curses.KEY_ENTER):
+            entry = search.current()
+            self.search = None
+            if entry is not None:
+                self.insert_text(entry.expression)
+        elif key in (27, 7):
+            self.search = None
+        elif 32 <= key <= 126:
+            search.type(chr(key))
+        return None
+
     def insert_text(self, text):
         """在光标位置插入文本"""
-        if self.cursor_pos == len(self.expression):
-            self.expression += text
-        else:
-            self.expression = self.expression[:self.cursor_pos] + text + self.expression[self.cursor_pos:]
-        self.cursor_pos += len(text)
+        self.editor.insert(text)
     
     def handle_button_click(self, button):
         """处理按钮点击"""
@@ -197,20 +310,31 @@ class CalculatorLogic:
             self.insert_text("exp()")
             self.cursor_pos -= 1
         elif button == "∫":
-            self.insert_text("∫")
+            self.insert_text("∫()dx")
+            self.cursor_pos -= 3  # 光标停在括号内: ∫(f, a, b)dx
         elif button == "∂":
-            self.insert_text("∂")
+            self.insert_text("∂()dx")
+            self.cursor_pos -= 3  # ∂(f, x0)dx
         elif button == "dx":
             self.insert_text("dx")
         elif button == "dy":
             self.insert_text("dy")
         elif button == "=":
-            if self.expression.startswith("plot "):
-                func_str = self.expression[5:]
-                # 这里需要实现绘图功能
-                pass
+            if self.expression.startswith("plot"):
+                func_str = self.expression[4:]  # 空格键用于点击按钮，允许省略空格
+                from plotter import Plotter
+                try:
+                    self.plot = Plotter(func_str)
+                    self.result = f"绘图: y = {self.plot.func_str}"
+                except ValueError as e:
+                    self.result = f"错误: {e}"
             elif self.mode == "逻辑门":
                 self.result = self.evaluate_logic_gate(self.expression)
+            elif self.evaluator is not None and (self.mode == "求解"
+                                                 or self.expression.strip() != "vars"):
+                self.start_evaluation(self.expression)
+            elif self.mode == "求解":
+                self.result = self.solve_equation(self.expression)
             else:
                 self.result = self.evaluate_expression(self.expression)
         elif button == "C":
@@ -218,12 +342,12 @@ class CalculatorLogic:
             self.cursor_pos = 0
             self.result = ""
         elif button == "Del":
-            if self.expression and self.cursor_pos > 0:
-                self.expression = self.expression[:self.cursor_pos-1] + self.expression[self.cursor_pos:]
-                self.cursor_pos -= 1
+            self.editor.delete_before(1)
         elif button == "Ans":
-            if self.result and not self.result.startswith("错误"):
-                self.insert_text(self.result)
+            if isinstance(self.result, LargeIntResult):
+                self.insert_text("ans")  # 预览文本不是数字，ans 取精确值
+            elif self.result and not self.result.startswith("错误"):
+                self.insert_text(self.result_value_text())
         elif button == "Help":
             return "SHOW_HELP"
         elif button == "Quit":
@@ -250,93 +374,123 @@ class CalculatorLogic:
             self.insert_text(f"\\{button}")
         elif button == "Test":
             self.test_regex()
+        elif button in ["x", "y", "z", ",", ";"]:
+            self.insert_text(button)
+        elif button == "Eq":
+            self.insert_text("=")
         
         return None
     
     def handle_logic_gate(self, gate):
-        """处理逻辑门操作"""
-        if gate == "NOT":
-            self.insert_text("NOT(")
-            self.cursor_pos -= 1
-        else:
-            self.insert_text(f"{gate}(")
-            self.cursor_pos -= 1
+        """处理逻辑门操作，插入 GATE() 并把光标放在括号内"""
+        self.insert_text(f"{gate}()")
+        self.cursor_pos -= 1
 
     def evaluate_logic_gate(self, expression):
-        """评估逻辑门表达式"""
+        """评估逻辑门表达式，支持嵌套、多操作数和任意位宽"""
+        from logicgate import GateExpression, GateSyntaxError
+        if not expression.strip():
+            return "错误: 请输入二进制数字"
+        command, _, rest = expression.strip().partition(" ")
         try:
-            # 解析逻辑表达式，支持AND, OR, NOT, XOR, NAND, NOR
-            # 简单的实现：将二进制数字转换为逻辑运算
-
-            # 提取数字参数
-            import re
-            numbers = re.findall(r'\d+', expression)
-
-            if not numbers:
-                return "错误: 请输入二进制数字"
-
-            # 转换为整数
-            nums = [int(x, 2) for x in numbers]
-
-            if "NOT" in expression and len(nums) >= 1:
-                result = ~nums[0] & 1  # 按位取反并只取最低位
-                return f"NOT({numbers[0]}) = {bin(result)[2:]}"
-            elif "NAND" in expression and len(nums) >= 2:
-                result = 1 - (nums[0] & nums[1])  # NAND逻辑
-                return f"{numbers[0]} NAND {numbers[1]} = {bin(result)[2:]}"
-            elif "NOR" in expression and len(nums) >= 2:
-                result = 1 - (nums[0] | nums[1])  # NOR逻辑
-                return f"{numbers[0]} NOR {numbers[1]} = {bin(result)[2:]}"
-            elif "XOR" in expression and len(nums) >= 2:
-                result = nums[0] ^ nums[1]
-                return f"{numbers[0]} XOR {numbers[1]} = {bin(result)[2:]}"
-            elif "AND" in expression and len(nums) >= 2:
-                result = nums[0] & nums[1]
-                return f"{numbers[0]} AND {numbers[1]} = {bin(result)[2:]}"
-            elif "OR" in expression and len(nums) >= 2:
-                result = nums[0] | nums[1]
-                return f"{numbers[0]} OR {numbers[1]} = {bin(result)[2:]}"
-
-            return "错误: 不支持的逻辑门操作"
-        except Exception as e:
-            return f"逻辑门计算错误: {str(e)}"
+            if command.lower() in ("equiv", "sat", "min"):
+                return self.bdd_command(command.lower(), rest)
+            gate = GateExpression(expression)
+            value = gate.evaluate()
+        except GateSyntaxError as e:
+            return f"逻辑门计算错误: {e}"
+        except RecursionError:
+            # 语法分析、编译和 BDD 构造都是递归的，嵌套几千层时会超出递归深度
+            return "逻辑门计算错误: 表达式嵌套过深"
+        except MemoryError:
+            return "逻辑门计算错误: 内存不足"
+        return f"{gate.text} = {self.format_bits(value, gate.width)}"
+
+    def bdd_command(self, command, body):
+        """基于 BDD 的分析命令:
+        equiv f, g  判断两个表达式是否等价，不等价时给出反例
+        sat f       统计满足赋值个数并给出一个例子
+        min f       输出不可约的积之和形式
+        """
+        from bdd import build_shared
+        from logicgate import GateSyntaxError
+        from truthtable import split_outputs
+        parts = split_outputs(body)
+        if command == "equiv":
+            if len(parts) != 2 or not all(parts):
+                raise GateSyntaxError("用法: equiv 表达式1, 表达式2")
+            manager, (f, g) = build_shared(parts)
+            if f == g:
+                return f"等价 (BDD {manager.size(f)}个节点)"
+            witness = manager.any_sat(manager.xor(f, g))
+            values = " ".join(f"{name}={witness.get(name, 0)}" for name in manager.inputs)
+            return f"不等价, 反例: {values}"
+
+        if len(parts) != 1 or not parts[0]:
+            raise GateSyntaxError(f"用法: {command} 表达式")
+        manager, (f,) = build_shared(parts)
+        n = len(manager.order)
+        if command == "sat":
+            count = manager.sat_count(f)
+            example = manager.any_sat(f)
+            if example is None:
+                return f"不可满足 (0 / {1 << n})"
+            values = " ".join(f"{name}={example[name]}" for name in manager.inputs if name in example)
+            return f"可满足赋值 {count} / {1 << n}, 例如 {values or '任意'}"
+        return f"{manager.format_cover(manager.isop(f))} (BDD {manager.size(f)}个节点)"
+
+    def format_bits(self, value, width):
+        """按位宽格式化结果: 不超过64位时补零显示二进制，更宽时显示十六进制预览"""
+        if width <= 64:
+            return format(value, f"0{width}b")
+        head, tail, _ = self.base_converter.preview(value, 16, self.base_preview_edge)
+        digits = f"{head}…{tail}" if tail else head
+        return f"0x{digits} ({width}位, {value.bit_count()}个1)"
 
     def show_truth_table(self):
-        """显示逻辑门真值表"""
-        table = "逻辑门真值表:\nA B | AND OR XOR NAND NOR\n0 0 |  0   0   0    1    1\n0 1 |  0   1   1    1    0\n1 0 |  0   1   1    1    0\n1 1 |  1   1   0    0    0\n\nNOT: 0->1, 1->0"
-        self.result = table
-        self.history.append(f"真值表 = {table}")
+        """为当前表达式生成真值表，多个输出用逗号分隔；表达式为空时显示常用逻辑门对照表"""
+        from logicgate import GateSyntaxError
+        from truthtable import TruthTable
+        start = time.perf_counter()
+        try:
+            self.table = TruthTable(self.expression)
+        except GateSyntaxError as e:
+            self.result = f"逻辑门计算错误: {e}"
+            return
+        except RecursionError:
+            self.result = "逻辑门计算错误: 表达式嵌套过深"
+            return
+        except MemoryError:
+            self.result = "逻辑门计算错误: 内存不足"
+            return
+        self.result = self.table.summary()
+        self.remember(self.expression or "真值表", self.result, time.perf_counter() - start)
 
     def handle_base_conversion(self, base):
         """处理进制选择"""
-        base_map = {"BIN": 2, "OCT": 8, "DEC": 10, "HEX": 16}
-        self.current_base = base_map[base]
+        from baseconv import BASE_NAMES
+        self.current_base = BASE_NAMES[base]
         self.insert_text(f"{base}:")
 
     def convert_base(self):
         """执行进制转换"""
+        from baseconv import parse_base
+        start = time.perf_counter()
         try:
             # 解析表达式中的进制信息
             parts = self.expression.split(":")
             if len(parts) == 2:
                 base_part, num_part = parts
-                base = int(base_part) if base_part.isdigit() else self.current_base
-                number = num_part.strip()
-
-                # 转换为十进制
-                if base == 16:
-                    decimal = int(number, 16)
-                elif base == 8:
-                    decimal = int(number, 8)
-                elif base == 2:
-                    decimal = int(number, 2)
-                else:
-                    decimal = int(number, 10)
+                base = parse_base(base_part) if base_part.strip() else self.current_base
+                decimal = self.base_converter.to_int(num_part, base)
 
-                # 显示所有进制
-                result = f"DEC: {decimal}, HEX: {hex(decimal)[2:].upper()}, OCT: {oct(decimal)[2:]}, BIN: {bin(decimal)[2:]}"
+                # 显示所有进制，超长的数字只显示首尾
+                edge = self.base_preview_edge
+                result = ", ".join(
+                    f"{name}: {self.base_converter.format_preview(decimal, b, edge)}"
+                    for name, b in (("DEC", 10), ("HEX", 16), ("OCT", 8), ("BIN", 2)))
                 self.result = result
-                self.history.append(f"{self.expression} = {result}")
+                self.remember(self.expression, result, time.perf_counter() - start)
             else:
                 self.result = "错误: 请输入正确的进制格式，如 '16:FF'"
         except Exception as e:
@@ -359,77 +513,349 @@ class CalculatorLogic:
             self.cursor_pos -= 1
 
     def test_regex(self):
-        """测试正则表达式"""
+        """测试正则表达式
+
+        支持的写法（主题以 @ 开头时表示文件路径，按字节处理，不整体读入内存）:
+            pattern,text                    统计匹配并显示前5个
+            re.findall/search/match(pattern,主题)
+            re.compile(pattern)
+            re.sub(pattern,repl,主题)        主题是文件时写成 @输入,@输出
+            re.split(pattern,主题)           同上
+            re.multi(@模式文件,主题)          一次扫描统计文件中每个模式（每行一个）的命中，
+                                            主题写成 @输入,@报告 时把每个模式的结果写入报告
+            engine auto|linear|re           选择正则引擎
+        结果末尾的 [DFA]/[NFA]/[re] 表示实际使用的引擎。
+        """
+        from regexstream import parse_call
+        start = time.perf_counter()
         try:
-            # 解析表达式，期望格式如: pattern,text
-            if "," in self.expression:
-                pattern, text = self.expression.split(",", 1)
-                pattern = pattern.strip()
-                text = text.strip()
-
-                # 编译正则表达式
-                regex = re.compile(pattern)
-                matches = regex.findall(text)
-
-                if matches:
-                    result = f"找到 {len(matches)} 个匹配: {matches[:5]}"  # 只显示前5个
-                    if len(matches) > 5:
-                        result += f" ... (还有 {len(matches) - 5} 个)"
+            command, _, name = self.expression.strip().partition(" ")
+            if command == "engine":
+                self.set_regex_engine(name.strip())
+                return
+            func, args = parse_call(self.expression)
+            if func == "compile":
+                regex = self.compile_regex(args.strip())
+                result = f"编译成功: {regex.groups} 个分组 [{self.engine_name(regex)}]"
+            elif "," not in args:
+                self.result = "错误: 请使用格式 'pattern,text'"
+                return
+            elif func == "multi":
+                rules, subject = (part.strip() for part in args.split(",", 1))
+                result = self.regex_multi(rules, subject)
+            elif func == "sub":
+                pattern, repl, subject = (part.strip() for part in (args.split(",", 2) + [""])[:3])
+                result = self.regex_sub(pattern, repl, subject)
+            else:
+                pattern, subject = (part.strip() for part in args.split(",", 1))
+                if func == "split":
+                    result = self.regex_split(pattern, subject)
                 else:
-                    result = "未找到匹配"
+                    result = self.regex_find(func, pattern, subject)
 
-                self.result = result
-                self.history.append(f"regex: {self.expression} = {result}")
-            else:
-                self.result = "错误: 请使用格式 'pattern,text'"
+            self.result = result
+            self.remember(self.expression, result, time.perf_counter() - start)
         except Exception as e:
             self.result = f"正则表达式错误: {str(e)}"
-    
-    def safe_eval(self, expr, variables={}):
-        """安全地评估数学表达式"""
-        import math
-        allowed_names = {
-            k: v for k, v in math.__dict__.items() if not k.startswith("__")
-        }
-        allowed_names.update(variables)
-        allowed_names['π'] = math.pi
-        allowed_names['pi'] = math.pi
-        allowed_names['e'] = math.e
-        allowed_names['E'] = math.e
-        allowed_names['ans'] = self.result if self.result and self.result.replace('.', '').replace('-', '').isdigit() else 0
-
-        # 替换函数为math等效函数
-        expr = re.sub(r'sin\(', 'math.sin(', expr)
-        expr = re.sub(r'cos\(', 'math.cos(', expr)
-        expr = re.sub(r'tan\(', 'math.tan(', expr)
-        expr = re.sub(r'sqrt\(', 'math.sqrt(', expr)
-        expr = re.sub(r'log\(', 'math.log10(', expr)
-        expr = re.sub(r'ln\(', 'math.log(', expr)
-        expr = re.sub(r'exp\(', 'math.exp(', expr)
-
-        # 处理幂运算
-        expr = re.sub(r'\^', '**', expr)
 
+    def set_regex_engine(self, name):
+        if name not in ("auto", "linear", "re"):
+            self.result = "错误: 引擎只能是 auto、linear 或 re"
+            return
+        self.regex_engine = name
+        self.result = f"正则引擎: {name}"
+
+    def compile_regex(self, pattern):
+        """按当前引擎设置编译；auto 时线性引擎不支持的模式退回 re"""
+        import re
+        from linregex import UnsupportedPattern, compile_linear
+        if self.regex_engine == "re":
+            return re.compile(pattern)
         try:
-            code = compile(expr, "<string>", "eval")
-            for name in code.co_names:
-                if name not in allowed_names and name != 'math':
-                    raise NameError(f"使用 '{name}' 不被允许")
-            return eval(code, {"__builtins__": {}, "math": math}, allowed_names)
+            return compile_linear(pattern)
+        except UnsupportedPattern as e:
+            if self.regex_engine == "linear":
+                raise ValueError(f"线性引擎不支持该模式: {e}")
+            return re.compile(pattern)
+
+    @staticmethod
+    def engine_name(regex):
+        return getattr(regex, "engine", "re")
+
+    @staticmethod
+    def regex_files(subject):
+        """解析 '@输入,@输出' 形式的主题，返回 (输入路径, 输出路径)"""
+        in_path, sep, out_path = subject[1:].partition(",@")
+        if not sep or not out_path.strip():
+            raise ValueError("文件主题需要输出文件，格式如 @输入,@输出")
+        return in_path.strip(), out_path.strip()
+
+    def regex_find(self, func, pattern, subject):
+        """findall/search/match；文件主题用 mmap 惰性扫描"""
+        from regexstream import open_subject, scan
+        is_file = subject.startswith("@")
+        regex = self.compile_regex(pattern.encode() if is_file else pattern)
+        if is_file:
+            path = subject[1:].strip()
+            with open_subject(path) as data:
+                if func == "match":
+                    m = regex.match(data)
+                    result = f"匹配: {m.group()[:40]!r}" if m else "不匹配"
+                    return f"{result} [{self.engine_name(regex)}]"
+                count, first = scan(regex, data, 1 if func == "search" else 5)
+            if not count:
+                result = "未找到匹配"
+            elif func == "search":
+                result = f"第一个匹配 @{first[0][0]}: {first[0][1]!r}"[:60]
+            else:
+                shown = ", ".join(f"@{offset}: {item!r}"[:60] for offset, item in first)
+                result = f"{path}: 找到 {count} 个匹配: {shown}"
+                if count > len(first):
+                    result += f" ... (还有 {count - len(first)} 个)"
+            return f"{result} [{self.engine_name(regex)}]"
+
+        if func == "match":
+            m = regex.match(subject)
+            result = f"匹配: {m.group()!r}" if m else "不匹配"
+        elif func == "search":
+            m = regex.search(subject)
+            result = f"第一个匹配 @{m.start()}: {m.group()!r}" if m else "未找到匹配"
+        else:
+            count, first = scan(regex, subject)
+            if not count:
+                result = "未找到匹配"
+            else:
+                result = f"找到 {count} 个匹配: {[item for _, item in first]}"  # 只显示前5个
+                if count > 5:
+                    result += f" ... (还有 {count - 5} 个)"
+        return f"{result} [{self.engine_name(regex)}]"
+
+    def regex_sub(self, pattern, repl, subject):
+        from regexstream import OVERLAP, sub_file
+        if subject.startswith("@"):
+            in_path, out_path = self.regex_files(subject)
+            regex = self.compile_regex(pattern.encode())
+            count = sub_file(regex, repl.encode(), in_path, out_path)
+            return (f"替换 {count} 处, 已写入 {out_path} (分块处理, 长于 {OVERLAP >> 10} KiB "
+                    f"的单个匹配可能被截断) [{self.engine_name(regex)}]")
+        regex = self.compile_regex(pattern)
+        text, count = regex.subn(repl, subject)
+        return f"替换 {count} 处: {text} [{self.engine_name(regex)}]"
+
+    def regex_split(self, pattern, subject):
+        from regexstream import OVERLAP, split_file
+        if subject.startswith("@"):
+            in_path, out_path = self.regex_files(subject)
+            regex = self.compile_regex(pattern.encode())
+            pieces = split_file(regex, in_path, out_path)
+            return (f"分割为 {pieces} 段, 每段一行写入 {out_path} (分块处理, 长于 {OVERLAP >> 10} KiB "
+                    f"的单个分隔符匹配可能被截断) [{self.engine_name(regex)}]")
+        regex = self.compile_regex(pattern)
+        return f"分割结果: {regex.split(subject)} [{self.engine_name(regex)}]"
+
+    def regex_multi(self, rules, subject):
+        """多模式匹配，显示命中最多的5个模式: '模式'×命中数@第一次命中的偏移
+
+        合并 DFA 的模式按匹配结束位置计数（重叠的也算），标为“含重叠”，和不重叠匹配数分开合计。
+        """
+        from multipattern import COUNT_ENDS, MultiMatcher, load_patterns
+        from regexstream import open_subject
+        if not rules.startswith("@"):
+            raise ValueError("模式集需要写成 @文件，每行一个模式")
+        patterns = load_patterns(rules[1:].strip())
+        if not patterns:
+            raise ValueError("模式文件为空")
+        report = None
+        if subject.startswith("@"):
+            if ",@" in subject:
+                in_path, report = self.regex_files(subject)
+            else:
+                in_path = subject[1:].strip()
+            matcher = MultiMatcher(patterns, is_bytes=True)
+            with open_subject(in_path) as data:
+                results = matcher.scan(data)
+        else:
+            matcher = MultiMatcher(patterns)
+            results = matcher.scan(subject)
+
+        if report:
+            with open(report, "w", encoding="utf-8") as f:
+                f.write("pattern\tcount\tfirst\tengine\tcounting\n")
+                for row in results:
+                    f.write("\t".join(map(str, row)) + "\n")
+        hits = sorted((r for r in results if r[1]), key=lambda r: -r[1])
+        matches = sum(r[1] for r in hits if r[4] != COUNT_ENDS)
+        ends = sum(r[1] for r in hits if r[4] == COUNT_ENDS)
+        engines = "/".join(f"{name} {n}" for name, n in matcher.engines().items() if n)
+        result = f"{len(patterns)} 个模式, {len(hits)} 个命中, 不重叠匹配共 {matches} 处"
+        if ends:
+            result += f", 含重叠的匹配结束位置共 {ends} 处"
+        if hits:
+            result += ": " + ", ".join(f"{p!r}×{c}@{first}" + ("(含重叠)" if rule == COUNT_ENDS else "")
+                                       for p, c, first, _, rule in hits[:5])
+            if len(hits) > 5:
+                result += " ..."
+        if report:
+            result += f", 已写入 {report}"
+        return f"{result} [{engines}]"
+
+    def safe_eval(self, expr, variables=None):
+        """安全地评估数学表达式，variables 默认为工作表中的变量"""
+        compiled = self.expr_cache.lookup(expr)
+        bindings = dict(self.variables if variables is None else variables)
+        bindings['ans'] = self.ans_value()
+        try:
+            return compiled.evaluate(bindings)
         except Exception as e:
             raise ValueError(f"评估表达式错误: {e}")
+
+    def result_value_text(self):
+        """结果中的数值部分，去掉末尾括号里的说明（误差估计、重算个数等）"""
+        return self.result.rsplit(" (", 1)[0]
+
+    def ans_value(self):
+        """上一次结果的数值形式，非数值时为0"""
+        if isinstance(self.result, LargeIntResult):
+            return self.result.value
+        text = self.result_value_text()
+        try:
+            return int(text)  # 整数结果不经过 float，超过 2**53 也不丢精度
+        except (TypeError, ValueError):
+            pass
+        try:
+            return float(text)
+        except (TypeError, ValueError):
+            return 0
+
+    def cache_stats(self):
+        """返回表达式缓存的命中/未命中/淘汰计数"""
+        return self.expr_cache.stats()
     
+    def remember(self, expression, result, elapsed=0.0):
+        """按当前模式添加一条计算历史"""
+        self.history.add(expression, str(result), self.mode, elapsed)
+        if self.perf is not None:
+            self.perf.evaluated(expression, elapsed, self.mode)
+
     def evaluate_expression(self, expr):
         """评估数学表达式"""
         try:
             # 移除任何多余的字符
+            if self.is_worksheet_command(expr):
+                return self.worksheet_command(expr)
+            if expr.lstrip().startswith(("∫", "∂")):
+                return self.calculus(expr)
             expr = expr.replace(' ', '')
-            result = self.safe_eval(expr)
+            start = time.perf_counter()
+            result = self.format_result(self.safe_eval(expr))
             # 将结果添加到历史记录
-            self.history.append(f"{expr} = {result}")
-            # 限制历史记录长度
-            if len(self.history) > 10:
-                self.history.pop(0)
-            return str(result)
+            self.remember(expr, result, time.perf_counter() - start)
+            return result
+        except MemoryError:
+            return "错误: 内存不足"
         except Exception as e:
             return "错误: " + str(e)
+
+    def format_result(self, value):
+        """结果文本；很大的整数用分治进制转换只取首尾几位，str() 超过 4300 位直接报错，而且是平方复杂度"""
+        if type(value) is int and value.bit_length() > LARGE_INT_BITS:
+            text = self.base_converter.format_preview(value, 10, self.base_preview_edge)
+            return LargeIntResult(text, value)
+        return str(value)
+
+    def solve_equation(self, expr):
+        """求解模式: 单个方程求区间内的全部实根，分号分隔的多个方程按方程组求解"""
+        from solver import solve
+        try:
+            start = time.perf_counter()
+            result = solve(expr, self.safe_eval, self.variables)
+            self.remember(expr.strip(), result, time.perf_counter() - start)
+            return result
+        except Exception as e:
+            return "错误: " + str(e)
+
+    def calculus(self, expr):
+        """∫ 数值积分 / ∂ 求导，数值结果后附误差估计"""
+        from calculus import evaluate_call
+        expr = "".join(expr.split())
+        start = time.perf_counter()
+        value, error, note = evaluate_call(expr, self.safe_eval, self.variables)
+        self.remember(expr, value, time.perf_counter() - start)
+        if error is None:
+            return f"{value} ({note})"
+        return f"{value} (误差 ≈ {error:.1e}, {note})"
+
+    @staticmethod
+    def is_worksheet_command(expr):
+        """赋值、删除变量（del x）和列出变量（vars）；有工作进程时只有 vars 在界面进程中执行"""
+        text = expr.strip()
+        return text == "vars" or text.startswith("del ") or parse_assignment(text) is not None
+
+    @staticmethod
+    def worksheet_target(expr):
+        """赋值或删除命令修改的变量名，其他输入返回 None"""
+        text = expr.strip()
+        if text.startswith("del "):
+            return text[4:].strip()
+        assignment = parse_assignment(text)
+        return assignment[0] if assignment else None
+
+    def worksheet_command(self, expr):
+        """执行工作表命令，返回结果文本"""
+        text = expr.strip()
+        if text == "vars":
+            return self.worksheet.summary(self.format_result) or "没有定义变量"
+        if text.startswith("del "):
+            name = text[4:].strip()
+            self.worksheet.delete(name)
+            return f"已删除 {name}，重算 {self.worksheet.recomputed} 个变量"
+        name, source = parse_assignment(text)
+        start = time.perf_counter()
+        cell = self.worksheet.assign(name, source)
+        elapsed = time.perf_counter() - start
+        if cell.error:
+            return f"{cell.error}（{name} 已保存，依赖就绪后自动计算）"
+        value = self.format_result(cell.value)
+        self.remember(f"{name}={source.replace(' ', '')}", value, elapsed)
+        others = self.worksheet.recomputed - 1
+        return value + (f" (重算 {others} 个依赖变量)" if others else "")
+
+    def start_evaluation(self, expr):
+        """在工作进程中求值，结果由 poll_evaluation 取回"""
+        if not self.evaluator.busy:
+            self.job_previous = self.result
+        sheet = None
+        target = self.worksheet_target(expr) if self.mode != "求解" else None
+        if target is not None:
+            # 赋值和删除在工作进程中执行，完成后合并回工作表；取消或失败时工作表不变
+            sheet = self.worksheet.extract(target)
+        self.job_sheet = [state[0] for state in sheet] if sheet is not None else None
+        self.evaluator.submit(expr, self.job_previous, self.variables, self.mode, sheet)
+        self.result = self.evaluator.progress()
+
+    def evaluate_job(self, expr, mode=None):
+        """工作进程中执行一个任务: 求解模式解方程，其他模式按表达式求值"""
+        if mode is not None:
+            self.mode = mode
+        if self.mode == "求解":
+            return self.solve_equation(expr)
+        return self.evaluate_expression(expr)
+
+    def poll_evaluation(self):
+        """检查后台求值: 完成时取回结果，否则刷新进度；返回是否需要重绘"""
+        if self.evaluator is None or not self.evaluator.busy:
+            return False
+        done = self.evaluator.poll()
+        if done is None:
+            self.result = self.evaluator.progress()
+            return True
+        self.result, entry, updates = done
+        if updates is not None:
+            self.worksheet.update(self.job_sheet, *updates)
+        if entry:
+            self.remember(entry.expression, entry.result, entry.elapsed)
+        return True
+
+    def cancel_evaluation(self):
+        self.evaluator.cancel()
+        self.result = "错误: 计算已取消"
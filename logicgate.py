@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+逻辑门模块 - 逻辑门表达式的解析与任意位宽按位求值
+
+支持两种写法并可任意嵌套:
+    函数式: AND(101, 110, 011)、NOT(XOR(1, 0))
+    中缀式: 101 AND 110 OR NOT 001
+运算优先级从高到低: NOT > AND/NAND > XOR/XNOR > OR/NOR。
+操作数默认是二进制数字，也可写 0x/0o/0b 前缀；其他标识符是变量。
+位宽默认取最长字面量的位数，也可在末尾用 @N 指定，如 NOT(0) @4096。
+
+语法树用元组表示:
+    ('const', 值)
+    ('var', 名称)
+    (门名称, (子节点, ...))
+"""
+
+import re
+from functools import reduce
+from operator import and_, or_, xor
+
+GATES = ("AND", "OR", "NOT", "XOR", "NAND", "NOR", "XNOR")
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<width>@\s*\d+)
+    | (?P<number>0[xX][0-9a-fA-F]+|0[oO][0-7]+|0[bB][01]+|[0-9]+)
+    | (?P<gate>(?:NAND|XNOR|XOR|NOR|AND|OR|NOT)(?![A-Za-z_]))
+    | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<punct>[(),])
+    )""", re.VERBOSE | re.IGNORECASE)
+
+# 中缀运算符的优先级，数字越大结合越紧
+_PRECEDENCE = {"OR": 1, "NOR": 1, "XOR": 2, "XNOR": 2, "AND": 3, "NAND": 3}
+
+# 可结合的门在中缀链中展开为多操作数
+_ASSOCIATIVE = {"AND", "OR", "XOR"}
+
+
+class GateSyntaxError(ValueError):
+    """逻辑门表达式语法错误"""
+
+
+def tokenize(text):
+    """把表达式切分为 (类型, 值) 列表"""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise GateSyntaxError(f"无法识别的字符: {text[pos:pos + 10]!r}")
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "gate":
+            value = value.upper()
+        tokens.append((kind, value))
+        pos = m.end()
+    return tokens
+
+
+def parse_literal(token):
+    """解析数字字面量，返回 (值, 位数)"""
+    prefix = token[:2].lower()
+    if prefix == "0x":
+        return int(token[2:], 16), 4 * (len(token) - 2)
+    if prefix == "0o":
+        return int(token[2:], 8), 3 * (len(token) - 2)
+    if prefix == "0b":
+        return int(token[2:], 2), len(token) - 2
+    if set(token) - {"0", "1"}:
+        raise GateSyntaxError(f"'{token}' 不是二进制数字")
+    return int(token, 2), len(token)
+
+
+class _Parser:
+    """递归下降 + 优先级爬升解析器"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.literal_width = 1
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if tok[0] is None or (kind and tok[0] != kind) or (value and tok[1] != value):
+            expected = value or kind or "表达式"
+            found = tok[1] if tok[0] else "结尾"
+            raise GateSyntaxError(f"期望 {expected}，实际为 {found}")
+        self.pos += 1
+        return tok
+
+    def parse_expression(self, min_prec=1):
+        left = self.parse_unary()
+        while True:
+            kind, value = self.peek()
+            if kind != "gate" or value not in _PRECEDENCE or _PRECEDENCE[value] < min_prec:
+                return left
+            self.pos += 1
+            right = self.parse_expression(_PRECEDENCE[value] + 1)
+            if value in _ASSOCIATIVE and left[0] == value:
+                left = (value, left[1] + (right,))
+            else:
+                left = (value, (left, right))
+
+    def parse_unary(self):
+        kind, value = self.peek()
+        if kind == "gate":
+            self.pos += 1
+            if self.peek() == ("punct", "("):
+                return self.parse_call(value)
+            if value != "NOT":
+                raise GateSyntaxError(f"{value} 缺少左操作数")
+            return ("NOT", (self.parse_unary(),))
+        if kind == "number":
+            self.pos += 1
+            literal, width = parse_literal(value)
+            self.literal_width = max(self.literal_width, width)
+            return ("const", literal)
+        if kind == "name":
+            self.pos += 1
+            return ("var", value)
+        if (kind, value) == ("punct", "("):
+            self.pos += 1
+            node = self.parse_expression()
+            self.take("punct", ")")
+            return node
+        raise GateSyntaxError(f"意外的 {value if kind else '结尾'}")
+
+    def parse_call(self, gate):
+        self.take("punct", "(")
+        args = [self.parse_expression()]
+        while self.peek() == ("punct", ","):
+            self.pos += 1
+            args.append(self.parse_expression())
+        self.take("punct", ")")
+        if gate == "NOT" and len(args) != 1:
+            raise GateSyntaxError("NOT 只接受一个操作数")
+        if gate != "NOT" and len(args) < 2:
+            raise GateSyntaxError(f"{gate} 至少需要两个操作数")
+        return (gate, tuple(args))
+
+
+def parse_gate_expression(text):
+    """解析表达式，返回 (语法树, 位宽, 是否显式指定位宽)"""
+    tokens = tokenize(text)
+    width = None
+    if tokens and tokens[-1][0] == "width":
+        width = int(tokens.pop()[1].lstrip("@").strip())
+        if width <= 0:
+            raise GateSyntaxError("位宽必须为正数")
+    if any(kind == "width" for kind, _ in tokens):
+        raise GateSyntaxError("@位宽 只能写在末尾")
+    if not tokens:
+        raise GateSyntaxError("表达式为空")
+    parser = _Parser(tokens)
+    tree = parser.parse_expression()
+    if parser.pos != len(tokens):
+        raise GateSyntaxError(f"多余的 {tokens[parser.pos][1]}")
+    explicit = width is not None
+    return tree, (width if explicit else parser.literal_width), explicit
+
+
+def variables(tree):
+    """按首次出现顺序返回变量名"""
+    names = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node[0] == "var":
+            if node[1] not in names:
+                names.append(node[1])
+        elif node[0] != "const":
+            stack.extend(reversed(node[1]))
+    return names
+
+
+def compile_gate(tree, mask, broadcast=False):
+    """把语法树编译为闭包 f(env) -> int，所有结果都限制在 mask 内
+
+    broadcast 为真时常量只能是 0 或 1，分别扩展为全0和全1，
+    用于每一位代表真值表中一行的按位并行求值。
+    """
+    kind = tree[0]
+    if kind == "const":
+        if broadcast:
+            if tree[1] not in (0, 1):
+                raise GateSyntaxError("真值表中常量只能是 0 或 1")
+            value = mask if tree[1] else 0
+        else:
+            value = tree[1] & mask
+        return lambda env: value
+    if kind == "var":
+        name = tree[1]
+        return lambda env: env[name] & mask
+
+    funcs = [compile_gate(child, mask, broadcast) for child in tree[1]]
+    if kind == "NOT":
+        f = funcs[0]
+        return lambda env: f(env) ^ mask
+
+    base, invert = {
+        "AND": (and_, False), "OR": (or_, False), "XOR": (xor, False),
+        "NAND": (and_, True), "NOR": (or_, True), "XNOR": (xor, True),
+    }[kind]
+    if len(funcs) == 2:
+        f, g = funcs
+        if invert:
+            return lambda env: base(f(env), g(env)) ^ mask
+        return lambda env: base(f(env), g(env))
+    if invert:
+        return lambda env: reduce(base, [f(env) for f in funcs]) ^ mask
+    return lambda env: reduce(base, [f(env) for f in funcs])
+
+
+class GateExpression:
+    """解析并编译好的逻辑门表达式"""
+
+    def __init__(self, text, width=None):
+        self.text = text.strip()
+        self.tree, inferred, explicit = parse_gate_expression(text)
+        self.width = width if width is not None and not explicit else inferred
+        self.mask = (1 << self.width) - 1
+        self.variables = variables(self.tree)
+        self._func = compile_gate(self.tree, self.mask)
+
+    def evaluate(self, env=None):
+        """求值，变量从 env 中取"""
+        env = env or {}
+        missing = [name for name in self.variables if name not in env]
+        if missing:
+            raise GateSyntaxError(f"变量未赋值: {', '.join(missing)}")
+        return self._func(env)
+
+    def compile(self, mask, broadcast=False):
+        """用另一个位宽掩码重新编译（真值表按位并行求值时使用）"""
+        return compile_gate(self.tree, mask, broadcast)
+
+
+def format_tree(tree):
+    """把语法树格式化为函数式写法"""
+    kind = tree[0]
+    if kind == "const":
+        return bin(tree[1])[2:]
+    if kind == "var":
+        return tree[1]
+    return f"{kind}({', '.join(format_tree(child) for child in tree[1])})"
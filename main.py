@@ -6,13 +6,149 @@ TUICalculator - 增强版终端计算器
 具有现代化UI设计和丰富功能
 """
 
+import argparse
 import curses
-from calculator import TUICalculator
+import sys
 
-def main(stdscr):
+import modes
+from history import DEFAULT_PATH as HISTORY_PATH
+
+def main(stdscr, args=None):
     """主函数"""
-    calculator = TUICalculator(stdscr)
-    calculator.run()
+    from calculator import TUICalculator
+    if args is None:
+        calculator = TUICalculator(stdscr)
+    else:
+        trace = None
+        if args.trace:
+            from perf import TraceWriter
+            trace = TraceWriter(args.trace, memory=args.trace_memory)
+        recorder = None
+        if args.record:
+            from replay import KeyRecorder
+            recorder = KeyRecorder(args.record, stdscr.getmaxyx())
+        calculator = TUICalculator(stdscr, cpu_budget=args.cpu_budget,
+                                   memory_budget=args.memory_budget << 20,
+                                   history_path=None if args.no_history else args.history,
+                                   trace=trace, recorder=recorder)
+    calculator.run(first_frame_only=args is not None and args.first_frame)
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="MultiCal 终端计算器")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="无界面批量求值，每行一个表达式；省略FILE或为'-'时读取标准输入")
+    parser.add_argument("--mode", default="standard", choices=list(modes.cli_modes()),
+                        help="批处理模式: 标准/逻辑门/正则表达式/进制换算/求解")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="批处理的工作进程数 (默认 1)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="每次分发给工作进程的行数")
+    parser.add_argument("--echo", action="store_true",
+                        help="输出时带上原表达式，格式为 '表达式 = 结果'")
+    parser.add_argument("--cpu-budget", type=float, default=10.0, metavar="SECONDS",
+                        help="界面中每次求值、批处理中每行的 CPU 时间上限，0 表示不限 (默认 10)")
+    parser.add_argument("--memory-budget", type=int, default=1024, metavar="MB",
+                        help="求值工作进程的内存上限，0 表示不限 (默认 1024)")
+    parser.add_argument("--history", default=HISTORY_PATH, metavar="FILE",
+                        help=f"历史记录文件 (默认 {HISTORY_PATH})")
+    parser.add_argument("--no-history", action="store_true",
+                        help="不读写历史记录文件")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="把每轮按键处理、求值和绘制的耗时写成 Chrome trace JSON 时间线")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="配合 --trace: 用 tracemalloc 记录内存曲线和定时快照（较慢）")
+    parser.add_argument("--record", metavar="FILE",
+                        help="把会话中的按键连同时间录制到文件，供 --replay 回放")
+    parser.add_argument("--replay", nargs="+", metavar="FILE",
+                        help="无界面全速回放录制的按键，报告每批按键的延迟分布和最终画面哈希")
+    parser.add_argument("--replay-repeat", type=int, default=5, metavar="N",
+                        help="每个录制文件回放的次数，取总耗时最少的一次 (默认 5)")
+    parser.add_argument("--replay-save", metavar="FILE",
+                        help="把回放结果保存为 JSON 基线")
+    parser.add_argument("--replay-compare", metavar="FILE",
+                        help="与 JSON 基线比较，总耗时慢了超过阈值时返回1")
+    parser.add_argument("--replay-threshold", type=float, default=10.0, metavar="PERCENT",
+                        help="判定回放变慢的阈值，百分比 (默认 10)")
+    parser.add_argument("--startup-benchmark", nargs="?", type=int, const=10, metavar="RUNS",
+                        help="测量冷启动到第一帧的时间（默认 10 次），中位数超过预算时返回1")
+    parser.add_argument("--startup-budget", type=float, default=None, metavar="MS",
+                        help="启动基准测试的预算，毫秒 (默认 250)")
+    parser.add_argument("--first-frame", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--benchmark", nargs="?", const="", metavar="FILTER",
+                        help="运行求值热路径的微基准测试，FILTER 只运行名字包含它的项")
+    parser.add_argument("--benchmark-save", metavar="FILE",
+                        help="把基准测试结果保存为 JSON 基线")
+    parser.add_argument("--benchmark-compare", nargs="+", metavar="FILE",
+                        help="与 JSON 基线比较，回归超过阈值时返回1；给出两个文件时直接比较这两份结果")
+    parser.add_argument("--benchmark-threshold", type=float, default=10.0, metavar="PERCENT",
+                        help="判定回归的阈值，百分比 (默认 10)")
+    return parser.parse_args(argv)
+
+def run_batch(args):
+    """运行批处理模式，有错误行时返回1"""
+    from batch import run_batch
+    if args.batch == "-":
+        errors = run_batch(sys.stdin, sys.stdout, args.mode, args.jobs, args.chunk_size, args.echo,
+                           args.cpu_budget, args.memory_budget << 20)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            errors = run_batch(f, sys.stdout, args.mode, args.jobs, args.chunk_size, args.echo,
+                               args.cpu_budget, args.memory_budget << 20)
+    return 1 if errors else 0
+
+def run_startup_benchmark(args):
+    """运行启动基准测试，超出预算时返回1"""
+    from startup import STARTUP_BUDGET, run_benchmark
+    extra = ["--no-history"] if args.no_history else ["--history", args.history]
+    budget = STARTUP_BUDGET if args.startup_budget is None else args.startup_budget
+    return 0 if run_benchmark(args.startup_benchmark, budget, extra) else 1
+
+def run_benchmarks(args):
+    """运行微基准测试并保存或比较结果，有回归时返回1"""
+    import benchmark
+    compare = args.benchmark_compare or []
+    if len(compare) > 2:
+        sys.exit("错误: --benchmark-compare 最多给出两个文件")
+    if len(compare) == 2:
+        current = benchmark.load(compare[1])
+    else:
+        current = benchmark.run_suite(args.benchmark or "", out=sys.stdout)
+    if args.benchmark_save:
+        benchmark.save(current, args.benchmark_save)
+    if not compare:
+        return 0
+    rows = benchmark.compare(benchmark.load(compare[0]), current, args.benchmark_threshold)
+    return 0 if benchmark.report_comparison(rows, args.benchmark_threshold) else 1
+
+def run_replays(args):
+    """回放录制的按键并保存或与基线比较，变慢时返回1"""
+    import benchmark
+    import replay
+    try:
+        current = replay.run_replays(args.replay, args.replay_repeat)
+    except (OSError, ValueError, RuntimeError) as e:
+        sys.exit(f"错误: {e}")
+    if args.replay_save:
+        benchmark.save(current, args.replay_save)
+    if not args.replay_compare:
+        return 0
+    baseline = benchmark.load(args.replay_compare)
+    for name in replay.changed_screens(baseline, current):
+        print(f"注意: {name} 的最终画面与基线不同，界面或逻辑的行为有变化")
+    rows = benchmark.compare(baseline, current, args.replay_threshold)
+    return 0 if benchmark.report_comparison(rows, args.replay_threshold) else 1
 
 if __name__ == "__main__":
-    curses.wrapper(main)
\ No newline at end of file
+    args = parse_args()
+    if args.batch is not None:
+        sys.exit(run_batch(args))
+    if args.benchmark is not None or args.benchmark_compare:
+        sys.exit(run_benchmarks(args))
+    if args.startup_benchmark is not None:
+        sys.exit(run_startup_benchmark(args))
+    if args.replay:
+        sys.exit(run_replays(args))
+    if args.trace_memory and not args.trace:
+        sys.exit("错误: --trace-memory 需要和 --trace 一起使用")
+    curses.wrapper(main, args)
\ No newline at end of file
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模式注册表 - 各计算模式的按钮布局、提示和按需加载的模块
+
+界面和逻辑共用这一份注册表，按钮布局只定义一次。
+布局在第一次用到时才构建；模式依赖的模块（逻辑门的 BDD、正则引擎、
+进制转换、方程求解等）在第一次进入该模式时才导入，启动时只加载标准模式需要的部分。
+"""
+
+
+def _standard_buttons():
+    return [
+        ["7", "8", "9", "/", "sin(", "cos(", "∫"],
+        ["4", "5", "6", "*", "tan(", "sqrt(", "∂"],
+        ["1", "2", "3", "-", "log(", "exp(", "dx"],
+        ["0", ".", "π", "+", "(", ")", "dy"],
+        ["=", "C", "Del", "Ans", "Help", "Quit"]
+    ]
+
+
+def _coding_buttons():
+    return [
+        ["0", "1"],
+        ["/", " * "],
+        ["-", "+"],
+        ["=",]
+    ]
+
+
+def _logic_gate_buttons():
+    return [
+        ["AND", "OR", "NOT", "XOR", "NAND", "NOR"],
+        ["Truth", "Table", "Show", "0", "1", "Calc"],
+        ["7", "8", "9", "/", "sin(", "cos("],
+        ["4", "5", "6", "*", "tan(", "sqrt("],
+        ["1", "2", "3", "-", "log(", "exp("],
+        ["0", ".", "π", "+", "(", ")"],
+        ["=", "C", "Del", "Ans", "Help", "Quit"]
+    ]
+
+
+def _regex_buttons():
+    return [
+        ["match", "search", "findall", "sub", "split", "compile"],
+        ["^", "$", "*", "+", "?", "."],
+        ["[", "]", "(", ")", "{", "}"],
+        ["|", "\\", "w", "d", "s", "b"],
+        ["CLR", "Test", "=", "Ans", "Help", "Quit"]
+    ]
+
+
+def _base_conversion_buttons():
+    return [
+        ["BIN", "OCT", "DEC", "HEX", "CONV", "SWAP"],
+        ["7", "8", "9", "A", "B", "C"],
+        ["4", "5", "6", "D", "E", "F"],
+        ["1", "2", "3", "CLR", "Help", "Quit"],
+        ["0", ".", "=", "Ans", "Mode", "Back"]
+    ]
+
+
+def _solve_buttons():
+    return [
+        ["x", "y", "z", "Eq", ",", ";"],
+        ["7", "8", "9", "/", "sin(", "cos("],
+        ["4", "5", "6", "*", "tan(", "sqrt("],
+        ["1", "2", "3", "-", "log(", "exp("],
+        ["0", ".", "π", "+", "(", ")"],
+        ["=", "C", "Del", "Ans", "Help", "Quit"]
+    ]
+
+
+class Mode:
+    """一种计算模式
+
+    cli_name 是批处理的 --mode 名字（None 表示不支持批处理），
+    modules 是进入该模式时预先导入的模块，第一次按 = 时不必再等导入。
+    """
+
+    def __init__(self, name, cli_name, layout, hint=None, modules=()):
+        self.name = name
+        self.cli_name = cli_name
+        self.hint = hint
+        self.modules = modules
+        self._layout = layout
+        self._buttons = None
+        self.loaded = False
+
+    @property
+    def buttons(self):
+        if self._buttons is None:
+            self._buttons = self._layout()
+        return self._buttons
+
+    def load(self):
+        """导入该模式依赖的模块，只在第一次进入时做"""
+        if not self.loaded:
+            for name in self.modules:
+                __import__(name)
+            self.loaded = True
+        return self
+
+
+# 按 j 键切换的顺序
+MODES = {mode.name: mode for mode in (
+    Mode("标准", "standard", _standard_buttons),
+    Mode("编程", None, _coding_buttons),
+    Mode("逻辑门", "logic", _logic_gate_buttons,
+         "提示: 如 101 AND 110，Truth 生成真值表", ("logicgate", "truthtable", "bdd", "baseconv")),
+    Mode("正则表达式", "regex", _regex_buttons,
+         "提示: pattern,text 或 pattern,@文件", ("regexstream", "linregex", "multipattern")),
+    Mode("进制换算", "base", _base_conversion_buttons,
+         "提示: 格式如 16:FF 或 DEC:255", ("baseconv",)),
+    Mode("求解", "solve", _solve_buttons,
+         "提示: f(x) = g(x), 下限, 上限 或 方程1; 方程2", ("solver",)),
+)}
+
+DEFAULT = "标准"
+
+
+def get(name):
+    return MODES[name]
+
+
+def buttons(name):
+    """模式的按钮布局"""
+    return MODES[name].buttons
+
+
+def enter(name):
+    """进入模式: 第一次进入时导入它依赖的模块"""
+    return MODES[name].load()
+
+
+def next_mode(name):
+    names = list(MODES)
+    return names[(names.index(name) + 1) % len(names)]
+
+
+def cli_modes():
+    """批处理模式名 -> 计算器内部模式名"""
+    return {mode.cli_name: mode.name for mode in MODES.values() if mode.cli_name}
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多模式匹配模块 - 一次扫描同时统计大量模式的命中
+
+逐个模式调用 findall 的代价是 模式数 × 文本长度。这里把模式分成三类，文本只扫描一遍:
+  - 纯字面量进入 Aho-Corasick 自动机，状态转移在用到时才补全并缓存；
+  - 线性引擎支持的正则合并为一个惰性 DFA（linregex.PatternSet）；
+  - 其余模式（含 $、反向引用、前后顾等）退回逐个 finditer。
+字面量和退回的模式按 finditer 的规则计数: 从左到右不重叠的匹配（COUNT_MATCHES）；
+合并 DFA 一次扫描得不到 re 的最左优先匹配，按匹配的结束位置计数，重叠出现各算一次（COUNT_ENDS）。
+scan 的结果标明每个模式用的是哪种计数。
+两个自动机都可以分块送入数据，文件按块读取，不整体读入内存。
+"""
+
+import re
+
+from linregex import PatternSet, UnsupportedPattern, compile_linear
+
+CHUNK_SIZE = 4 << 20  # 每块 4 MiB
+
+# 计数方式
+COUNT_MATCHES = "matches"  # 不重叠的匹配数，与 finditer 相同
+COUNT_ENDS = "ends"  # 有匹配结束的位置数，重叠的匹配都算
+
+# 不含正则元字符的模式（允许用反斜杠转义标点）按字面量处理
+_LITERAL_RE = re.compile(r"(?:[^\\.^$*+?{}\[\]|()]|\\[^0-9A-Za-z])+")
+_UNESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+
+
+def literal_of(pattern):
+    """模式是纯字面量时返回它匹配的字符串，否则返回 None"""
+    if not _LITERAL_RE.fullmatch(pattern):
+        return None
+    return _UNESCAPE_RE.sub(r"\1", pattern)
+
+
+def load_patterns(path):
+    """从文件读取模式，每行一个，忽略空行"""
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip()]
+
+
+class AhoCorasick:
+    """多字面量自动机，报告每个位置上结束的所有字面量"""
+
+    def __init__(self):
+        self.goto = [{}]  # 状态 -> {字符: 状态}，构建后用作按需补全的转移表
+        self.fail = [0]
+        self.out = [()]  # 状态 -> 在此结束的 (编号, 长度)
+        self.count = 0
+        self._built = False
+
+    def __len__(self):
+        return self.count
+
+    def add(self, word, pid=None):
+        """加入一个非空字面量（str 或 bytes），返回编号"""
+        if not word:
+            raise ValueError("字面量不能为空")
+        pid = self.count if pid is None else pid
+        state = 0
+        for ch in word:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = nxt
+        self.out[state] += ((pid, len(word)),)
+        self.count += 1
+        self._built = False
+        return pid
+
+    def build(self):
+        """广度优先计算失败链接，并把失败状态的输出并入"""
+        self.trie = [dict(edges) for edges in self.goto]  # 只含前缀树的边
+        queue = list(self.trie[0].values())
+        for state in queue:
+            self.fail[state] = 0
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self.trie[state].items():
+                f = self.fail[state]
+                while f and ch not in self.trie[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.trie[f].get(ch, 0)
+                self.out[nxt] += self.out[self.fail[nxt]]
+                queue.append(nxt)
+        self._built = True
+
+    def _complete(self, state, ch):
+        """沿失败链接求 state 读入 ch 后的状态，并记入转移表"""
+        s = state
+        while s and ch not in self.trie[s]:
+            s = self.fail[s]
+        nxt = self.trie[s].get(ch, 0)
+        self.goto[state][ch] = nxt
+        return nxt
+
+    def scanner(self):
+        if not self._built:
+            self.build()
+        return _ACScanner(self)
+
+
+class _ACScanner:
+    """一次扫描的状态，接口与 linregex 的扫描器一致
+
+    同一字面量的匹配长度相同，按结束位置的顺序贪心地取不重叠的匹配，
+    结果就是 finditer 的最左不重叠匹配。
+    """
+
+    def __init__(self, ac):
+        self.ac = ac
+        self.state = 0
+        self.pos = 0
+        self.counts = {}
+        self.first_start = {}
+        self.last_end = {}  # 编号 -> 上一个计入的匹配的结束位置
+
+    def feed(self, chunk):
+        goto = self.ac.goto
+        out = self.ac.out
+        complete = self.ac._complete
+        counts = self.counts
+        first_start = self.first_start
+        last_end = self.last_end
+        state = self.state
+        pos = self.pos
+        for ch in chunk:
+            pos += 1
+            nxt = goto[state].get(ch)
+            state = complete(state, ch) if nxt is None else nxt
+            if out[state]:
+                for pid, length in out[state]:
+                    if pid not in counts:
+                        counts[pid] = 1
+                        first_start[pid] = pos - length
+                        last_end[pid] = pos
+                    elif pos - length >= last_end[pid]:
+                        counts[pid] += 1
+                        last_end[pid] = pos
+        self.state = state
+        self.pos = pos
+
+    def finish(self):
+        pass
+
+
+class MultiMatcher:
+    """一组模式；scan 返回每个模式的 (模式, 命中数, 第一次命中的起点, 引擎, 计数方式)"""
+
+    def __init__(self, patterns, is_bytes=False):
+        self.patterns = list(patterns)
+        self.is_bytes = is_bytes
+        self.literals = AhoCorasick()
+        self.literal_ids = []
+        self.combined = PatternSet(is_bytes)
+        self.combined_ids = []  # PatternSet 编号 -> 模式编号
+        self.fallback = []  # (模式编号, 编译好的正则)
+        for index, pattern in enumerate(self.patterns):
+            source = pattern.encode() if is_bytes else pattern
+            literal = literal_of(pattern)
+            if literal:
+                self.literals.add(literal.encode() if is_bytes else literal, index)
+                self.literal_ids.append(index)
+                continue
+            try:
+                self.combined.add(source)
+                self.combined_ids.append(index)
+                continue
+            except UnsupportedPattern:
+                pass
+            try:
+                regex = compile_linear(source)
+            except UnsupportedPattern:
+                regex = re.compile(source)
+            self.fallback.append((index, regex))
+
+    def engines(self):
+        """各引擎负责的模式数"""
+        return {"AC": len(self.literals), "DFA": len(self.combined), "逐个": len(self.fallback)}
+
+    def scan(self, data, chunk_size=CHUNK_SIZE):
+        """扫描 str、bytes 或 mmap；大输入按块送入自动机"""
+        scanners = [self.literals.scanner() if len(self.literals) else None,
+                    self.combined.scanner() if len(self.combined) else None]
+        scanners = [s for s in scanners if s is not None]
+        for i in range(0, len(data), chunk_size):
+            chunk = data[i:i + chunk_size]
+            for s in scanners:
+                s.feed(chunk)
+        for s in scanners:
+            s.finish()
+
+        results = [None] * len(self.patterns)
+        if len(self.literals):
+            ac = scanners[0]
+            for index in self.literal_ids:
+                results[index] = (self.patterns[index], ac.counts.get(index, 0),
+                                  ac.first_start.get(index, -1), "AC", COUNT_MATCHES)
+        if len(self.combined):
+            dfa = scanners[-1]
+            for pid, index in enumerate(self.combined_ids):
+                start = -1
+                if dfa.counts[pid]:
+                    start = self.combined.first_start(pid, data, dfa.first_end[pid])
+                results[index] = (self.patterns[index], dfa.counts[pid], start, "DFA", COUNT_ENDS)
+        for index, regex in self.fallback:
+            count = 0
+            first = -1
+            for m in regex.finditer(data):
+                if not count:
+                    first = m.start()
+                count += 1
+            results[index] = (self.patterns[index], count, first, getattr(regex, "engine", "re"),
+                              COUNT_MATCHES)
+        return results
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+性能监测 - 状态栏中的实时性能行和 Chrome trace 时间线
+
+PerfMonitor 记录每次按键处理、求值、绘制一帧和其中输出到终端（doupdate）的耗时，
+各保留最近 WINDOW 个样本，状态栏显示最近一次和 p95。
+输出到终端的时间单独列出: 远程连接上感觉卡顿时，能看出是求值慢还是终端慢。
+
+TraceWriter 把每轮 读键 → handle_key → evaluate → draw 写成 Chrome trace 事件
+（JSON 数组格式，可在 chrome://tracing 或 Perfetto 中打开）。事件边运行边写入文件，
+程序异常退出时已写的部分也能载入；可选用 tracemalloc 记录内存曲线并定时写入分配最多的位置。
+"""
+
+import os
+import sys
+import time
+from collections import deque
+
+WINDOW = 256  # 每类耗时保留的样本数
+SNAPSHOT_INTERVAL = 5.0  # tracemalloc 快照的最小间隔，秒
+SNAPSHOT_TOP = 10  # 每个快照记录分配最多的位置数
+
+
+class Timings:
+    """最近 size 个耗时样本（秒）"""
+
+    def __init__(self, size=WINDOW):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    @property
+    def last(self):
+        return self.samples[-1] if self.samples else None
+
+    def percentile(self, p=95):
+        """最近样本的 p 分位数（取不小于 p% 样本的最小值），没有样本时返回 None"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = max(0, -(-len(ordered) * p // 100) - 1)
+        return ordered[index]
+
+
+def current_rss():
+    """当前进程的常驻内存，字节；没有 /proc 的系统上退回峰值，都取不到时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS 以字节为单位，其他以 KB
+
+
+def _ms(seconds):
+    if seconds is None:
+        return "-"
+    ms = seconds * 1000
+    return f"{ms:.1f}" if ms < 10 else f"{ms:.0f}"
+
+
+class TraceWriter:
+    """Chrome trace 事件文件；时间戳是相对于创建时刻的微秒数"""
+
+    def __init__(self, path, memory=False, snapshot_interval=SNAPSHOT_INTERVAL):
+        import json
+        self._dumps = json.dumps
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write("[\n")
+        self.first = True
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.tracemalloc = None
+        self.snapshot_interval = snapshot_interval
+        self.last_snapshot = self.origin
+        self.metadata("process_name", {"name": "TUICalculator"})
+        self.metadata("thread_name", {"name": "界面"})
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+            self.tracemalloc = tracemalloc
+
+    def _us(self, t):
+        return round((t - self.origin) * 1e6, 1)
+
+    def _write(self, event):
+        event.setdefault("pid", self.pid)
+        event.setdefault("tid", 0)
+        self.file.write(("" if self.first else ",\n") + self._dumps(event, ensure_ascii=False))
+        self.first = False
+
+    def metadata(self, name, args):
+        self._write({"name": name, "ph": "M", "args": args})
+
+    def complete(self, name, start, end, category, args=None):
+        """一段耗时（ph "X"），start/end 是 time.perf_counter() 的值"""
+        event = {"name": name, "cat": category, "ph": "X",
+                 "ts": self._us(start), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self._write(event)
+
+    def counter(self, name, values, t=None):
+        """计数器曲线（ph "C"）"""
+        self._write({"name": name, "ph": "C", "ts": self._us(time.perf_counter() if t is None else t),
+                     "args": values})
+
+    def sample_memory(self):
+        """记录 tracemalloc 的内存曲线，间隔足够长时写入一个快照"""
+        if self.tracemalloc is None:
+            return
+        now = time.perf_counter()
+        current, peak = self.tracemalloc.get_traced_memory()
+        self.counter("Python 内存", {"当前": current, "峰值": peak}, now)
+        if now - self.last_snapshot < self.snapshot_interval:
+            return
+        snapshot = self.tracemalloc.take_snapshot()
+        top = snapshot.statistics("lineno")[:SNAPSHOT_TOP]
+        end = time.perf_counter()
+        # 快照本身很慢，单独记成一段，免得被算到界面头上
+        self.complete("tracemalloc 快照", now, end, "memory", {
+            str(stat.traceback[0]): f"{stat.size / 1024:.1f} KiB, {stat.count} 块" for stat in top})
+        self.last_snapshot = end
+
+    def close(self):
+        if self.file is None:
+            return
+        if self.tracemalloc is not None:
+            self.tracemalloc.stop()
+        self.file.write("\n]\n")
+        self.file.close()
+        self.file = None
+
+
+class PerfMonitor:
+    """按键、求值、绘制的耗时统计，trace 不为 None 时同时写入时间线"""
+
+    def __init__(self, trace=None):
+        self.keys = Timings()
+        self.evaluations = Timings()
+        self.frames = Timings()
+        self.flushes = Timings()  # 每帧中 doupdate 把改动写到终端的时间
+        self.trace = trace
+        self.visible = False  # 状态栏是否显示性能行
+
+    def key(self, event, start, end):
+        """处理了一个输入事件: ('key', 键码) 或 ('text', 文本)"""
+        self.keys.add(end - start)
+        if self.trace is not None:
+            kind, value = event
+            args = {"key": value} if kind == "key" else {"text": value[:80], "length": len(value)}
+            self.trace.complete("handle_key", start, end, "input", args)
+
+    def evaluated(self, expression, elapsed, mode=None):
+        """完成一次求值；elapsed 是求值本身的耗时（后台求值时在工作进程中测得）"""
+        self.evaluations.add(elapsed)
+        if self.trace is not None:
+            end = time.perf_counter()
+            self.trace.complete("evaluate", end - elapsed, end, "evaluate",
+                                {"expression": expression[:200], "mode": mode})
+
+    def frame(self, start, end, flush, panels=None):
+        """绘制了一帧，flush 是其中 doupdate 的耗时"""
+        self.frames.add(end - start)
+        self.flushes.add(flush)
+        if self.trace is not None:
+            self.trace.complete("draw", start, end, "draw", {"panels": panels} if panels else None)
+            if flush:
+                self.trace.complete("doupdate", end - flush, end, "draw")
+
+    def cycle(self, start, end, keys):
+        """主循环的一轮: 读到的按键批次、处理、求值和绘制"""
+        if self.trace is not None:
+            self.trace.complete("cycle", start, end, "loop", {"keys": keys})
+            self.trace.sample_memory()
+
+    def status_line(self, caches=()):
+        """状态栏的性能行: 各项 最近/p95 毫秒、缓存命中率和内存；caches 是 (名字, 命中率)"""
+        parts = [f"{label}{_ms(t.last)}/{_ms(t.percentile())}" for label, t in (
+            ("键", self.keys), ("求值", self.evaluations), ("帧", self.frames), ("输出", self.flushes))]
+        line = " ".join(parts) + "ms"
+        if caches:
+            line += " 命中 " + " ".join(f"{name}{rate:.0%}" for name, rate in caches)
+        rss = current_rss()
+        if rss is not None:
+            line += f" RSS {rss / (1 << 20):.0f}M"
+        return line
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
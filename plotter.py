@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+绘图模块 - 向量化采样与盲文点阵画布
+
+函数在整条x网格上一次性求值（有NumPy时走NumPy，否则退回array逐点调用编译后的函数），
+结果画到离屏的盲文字符画布上，再由UI整块贴到curses窗口中。
+采样网格按步长对齐，平移/缩放时复用已缓存的采样点。
+"""
+
+import ast
+import math
+from array import array
+from collections import OrderedDict
+
+from evaluator import compile_expression
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖
+    np = None
+
+
+# 计算器函数名 -> NumPy函数名
+_NUMPY_NAMES = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan',
+    'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan', 'atan2': 'arctan2',
+    'sinh': 'sinh', 'cosh': 'cosh', 'tanh': 'tanh',
+    'asinh': 'arcsinh', 'acosh': 'arccosh', 'atanh': 'arctanh',
+    'sqrt': 'sqrt', 'exp': 'exp', 'expm1': 'expm1',
+    'log': 'log10', 'ln': 'log', 'log10': 'log10', 'log2': 'log2', 'log1p': 'log1p',
+    'abs': 'abs', 'fabs': 'fabs', 'floor': 'floor', 'ceil': 'ceil', 'trunc': 'trunc',
+    'pow': 'power', 'hypot': 'hypot', 'degrees': 'degrees', 'radians': 'radians',
+    'copysign': 'copysign', 'fmod': 'fmod',
+}
+
+_numpy_functions = None
+
+
+def numpy_functions():
+    """惰性构建NumPy函数表，没有NumPy时返回None"""
+    global _numpy_functions
+    if np is None:
+        return None
+    if _numpy_functions is None:
+        _numpy_functions = {k: getattr(np, v) for k, v in _NUMPY_NAMES.items()}
+    return _numpy_functions
+
+
+def called_functions(tree):
+    """返回表达式树中调用到的函数名"""
+    return {node.func.id for node in ast.walk(tree) if isinstance(node, ast.Call)}
+
+
+def evaluate_grid(compiled, xs, args=()):
+    """在整组x上批量求值，返回与xs等长的浮点序列，无定义处为nan
+
+    args 是其余参数（编译时排在x之后）的标量值。
+    """
+    functions = numpy_functions()
+    if functions is not None and called_functions(compiled.tree) <= functions.keys():
+        func = compiled.vectorized("numpy", functions)
+        xs = np.asarray(xs, dtype=float)
+        with np.errstate(all="ignore"):
+            try:
+                ys = func(xs, *args)
+            except (TypeError, ValueError, ArithmeticError):
+                ys = None
+        if ys is not None:
+            ys = np.broadcast_to(np.asarray(ys), xs.shape)
+            if np.iscomplexobj(ys):
+                ys = np.where(ys.imag == 0, ys.real, np.nan)
+            return np.asarray(ys, dtype=float)
+
+    # 纯Python后备路径: 仍然调用编译好的函数，而不是逐点eval
+    ys = array('d')
+    for x in xs:
+        try:
+            y = compiled(float(x), *args)
+            y = float(y) if not isinstance(y, complex) else math.nan
+        except (TypeError, ValueError, ArithmeticError):
+            y = math.nan
+        ys.append(y)
+    return ys
+
+
+class BrailleCanvas:
+    """盲文点阵画布，每个字符格包含2x4个点"""
+
+    # 点位 (dx, dy) 对应的盲文位
+    _DOT_BITS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.width = cols * 2
+        self.height = rows * 4
+        self.cells = bytearray(cols * rows)
+
+    def set(self, px, py):
+        """点亮一个点，越界时忽略"""
+        if 0 <= px < self.width and 0 <= py < self.height:
+            self.cells[(py >> 2) * self.cols + (px >> 1)] |= self._DOT_BITS[py & 3][px & 1]
+
+    def line(self, x0, y0, x1, y1):
+        """Bresenham画线"""
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.set(x0, y0)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def lines(self):
+        """以字符串列表形式输出画布"""
+        out = []
+        for r in range(self.rows):
+            row = self.cells[r * self.cols:(r + 1) * self.cols]
+            out.append("".join(chr(0x2800 + b) for b in row))
+        return out
+
+
+class Plotter:
+    """函数绘图器，保存视口和采样缓存"""
+
+    def __init__(self, func_str, x_min=-10.0, x_max=10.0, max_levels=8):
+        self.func_str = func_str.strip()
+        self.compiled = compile_expression(self.func_str, params=["x"])
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = None
+        self.y_max = None
+        self.max_levels = max_levels
+        self._samples = OrderedDict()  # 步长 -> {网格下标: y}
+        self.sample_hits = 0
+        self.sample_misses = 0
+
+    def _grid_step(self, width):
+        """把步长对齐到2的幂，使平移和整倍缩放时网格点重合"""
+        raw = (self.x_max - self.x_min) / max(1, width - 1)
+        return 2.0 ** math.floor(math.log2(raw))
+
+    def sample(self, width):
+        """返回覆盖当前视口的 (xs, ys)，复用缓存的网格点"""
+        step = self._grid_step(width)
+        level = self._samples.get(step)
+        if level is None:
+            level = self._samples[step] = {}
+            if len(self._samples) > self.max_levels:
+                self._samples.popitem(last=False)
+        else:
+            self._samples.move_to_end(step)
+
+        first = math.floor(self.x_min / step)
+        last = math.ceil(self.x_max / step)
+        indices = range(first, last + 1)
+        missing = [i for i in indices if i not in level]
+        self.sample_hits += len(indices) - len(missing)
+        self.sample_misses += len(missing)
+        if missing:
+            ys = evaluate_grid(self.compiled, [i * step for i in missing])
+            for i, y in zip(missing, ys):
+                level[i] = float(y)
+        xs = [i * step for i in indices]
+        return xs, [level[i] for i in indices]
+
+    def refine(self, x0, y0, x1, y1, span, depth=6):
+        """在陡变区间内二分补点，返回区间内部的点；无法收敛时视为间断返回None"""
+        if abs(y1 - y0) <= span:
+            return []
+        if depth == 0:
+            return None
+        xm = (x0 + x1) / 2
+        ym = evaluate_grid(self.compiled, [xm])[0]
+        if not math.isfinite(ym):
+            return None
+        left = self.refine(x0, y0, xm, ym, span, depth - 1)
+        right = self.refine(xm, ym, x1, y1, span, depth - 1)
+        if left is None or right is None:
+            return None
+        return left + [(xm, ym)] + right
+
+    def autoscale(self, ys):
+        """根据有限采样值确定y范围"""
+        finite = sorted(y for y in ys if math.isfinite(y))
+        if not finite:
+            self.y_min, self.y_max = -1.0, 1.0
+            return
+        # 去掉两端极值，避免渐近线把图压扁
+        cut = len(finite) // 50
+        lo, hi = finite[cut], finite[-1 - cut]
+        if hi - lo < 1e-12:
+            lo, hi = lo - 1, hi + 1
+        pad = (hi - lo) * 0.05
+        self.y_min, self.y_max = lo - pad, hi + pad
+
+    def render(self, cols, rows):
+        """渲染到 cols x rows 个字符格，返回字符串列表"""
+        canvas = BrailleCanvas(cols, rows)
+        xs, ys = self.sample(canvas.width)
+        if self.y_min is None:
+            self.autoscale(ys)
+        x_scale = (canvas.width - 1) / (self.x_max - self.x_min)
+        y_scale = (canvas.height - 1) / (self.y_max - self.y_min)
+
+        def to_px(x, y):
+            return (round((x - self.x_min) * x_scale),
+                    round((self.y_max - y) * y_scale))
+
+        # 坐标轴
+        if self.y_min <= 0 <= self.y_max:
+            _, py = to_px(0, 0)
+            for px in range(0, canvas.width, 2):
+                canvas.set(px, py)
+        if self.x_min <= 0 <= self.x_max:
+            px, _ = to_px(0, 0)
+            for py in range(0, canvas.height, 2):
+                canvas.set(px, py)
+
+        span = (self.y_max - self.y_min) / 4
+        prev = None
+        for x, y in zip(xs, ys):
+            if not math.isfinite(y):
+                prev = None
+                continue
+            if prev is not None:
+                px0, py0 = to_px(*prev)
+                inner = self.refine(prev[0], prev[1], x, y, span)
+                if inner is None:
+                    canvas.set(*to_px(x, y))
+                else:
+                    for point in inner + [(x, y)]:
+                        px1, py1 = to_px(*point)
+                        # 远离画布的线段只裁剪到边界附近，避免画超长线
+                        py0 = max(-canvas.height, min(2 * canvas.height, py0))
+                        py1 = max(-canvas.height, min(2 * canvas.height, py1))
+                        canvas.line(px0, py0, px1, py1)
+                        px0, py0 = px1, py1
+            prev = (x, y)
+        return canvas.lines()
+
+    def pan(self, fx, fy=0.0):
+        """按视口宽/高的比例平移"""
+        dx = (self.x_max - self.x_min) * fx
+        self.x_min += dx
+        self.x_max += dx
+        if self.y_min is not None:
+            dy = (self.y_max - self.y_min) * fy
+            self.y_min += dy
+            self.y_max += dy
+
+    def zoom(self, factor):
+        """以视口中心缩放，factor<1 为放大"""
+        cx = (self.x_min + self.x_max) / 2
+        half = (self.x_max - self.x_min) * factor / 2
+        self.x_min, self.x_max = cx - half, cx + half
+        if self.y_min is not None:
+            cy = (self.y_min + self.y_max) / 2
+            half = (self.y_max - self.y_min) * factor / 2
+            self.y_min, self.y_max = cy - half, cy + half
+
+    def reset_scale(self):
+        """下次渲染时重新自动确定y范围"""
+        self.y_min = self.y_max = None
+
+    def info(self):
+        """视口描述"""
+        return f"x: [{self.x_min:.4g}, {self.x_max:.4g}]"
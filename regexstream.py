@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+正则流式处理模块 - 对大文件做查找、替换和分割
+
+查找时把文件映射到内存（mmap），用 finditer 惰性地计数并取前几个匹配，
+不会把整个文件读成一个字符串。
+替换和分割按块读取并边处理边写出。块末尾附近的匹配可能还会延伸到下一块，
+所以留下一段重叠区域（OVERLAP）和下一块一起重新匹配，长度不超过它的匹配不会被截断；
+更长的匹配可能被截断，见 iter_segments。
+"""
+
+import mmap
+import re
+from contextlib import contextmanager
+
+CHUNK_SIZE = 4 << 20  # 每次读取 4 MiB
+OVERLAP = 64 << 10  # 块末尾这一段内结束的匹配推迟到下一块再确认
+CONTEXT = 256  # 保留在下一块前面的已处理文本，供后顾断言和 \b 使用
+
+_CALL_RE = re.compile(r"re\.(\w+)\((.*)\)", re.DOTALL)
+_TEMPLATE_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a", "\\": "\\"}
+# 是否 bytes -> (模板转义的正则, 字符转义表)
+_TEMPLATE_SYNTAX = {
+    False: (re.compile(r"\\(?:g<([^>]*)>|([0-9]{1,2})|(.))", re.DOTALL), _TEMPLATE_ESCAPES),
+    True: (re.compile(rb"\\(?:g<([^>]*)>|([0-9]{1,2})|(.))", re.DOTALL),
+           {k.encode(): v.encode() for k, v in _TEMPLATE_ESCAPES.items()}),
+}
+
+
+def parse_call(text):
+    """把 're.sub(a,b,c)' 拆成 ('sub', 'a,b,c')；不是这种写法时返回 (None, text)"""
+    m = _CALL_RE.fullmatch(text.strip())
+    if m:
+        return m.group(1), m.group(2)
+    return None, text
+
+
+def match_item(m):
+    """与 findall 一致的单个结果: 无分组取整个匹配，一个分组取该分组，否则取分组元组"""
+    groups = m.groups()
+    if not groups:
+        return m.group()
+    return groups[0] if len(groups) == 1 else groups
+
+
+@contextmanager
+def open_subject(path):
+    """只读映射文件，空文件得到空字节串"""
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空文件不能映射
+            yield b""
+            return
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def scan(regex, data, k=5):
+    """惰性遍历所有匹配，返回 (匹配数, 前 k 个 (偏移, 结果))"""
+    count = 0
+    first = []
+    for m in regex.finditer(data):
+        if count < k:
+            first.append((m.start(), match_item(m)))
+        count += 1
+    return count, first
+
+
+def iter_segments(regex, reader, chunk_size=CHUNK_SIZE, overlap=OVERLAP, context=CONTEXT):
+    """按块匹配，依次产出 ('text', 字节串) 和 ('match', 匹配对象)
+
+    把所有 text 按顺序拼起来、match 换成匹配文本，就得到原始输入。
+    长度不超过 overlap 的匹配保证与对整个输入匹配的结果一致。
+    更长的匹配不保证: 它的结尾还没读到时，缓冲区中离末尾超过 overlap 的开头部分
+    已经作为 text 产出，剩下的部分可能单独成为一个较短的匹配，也可能不再匹配。
+    re 不支持部分匹配，不缓存全部输入就无法判断一段文本是不是某个长匹配的开头，
+    所以缓冲区不会为此增长。
+    """
+    buf = b""
+    start = 0  # buf 中尚未处理的起点，之前是只作上下文的文本
+    offset = 0  # buf[0] 在整个输入中的偏移
+    last_empty = -1  # 上一个空匹配的绝对位置，避免在重叠处重复产出
+    while True:
+        data = reader.read(chunk_size)
+        eof = not data
+        buf += data
+        pos = start
+        cut = None
+        for m in regex.finditer(buf, start):
+            if not eof and m.end() > len(buf) - overlap:
+                cut = m.start()  # 可能延伸到下一块，留到下一轮
+                break
+            if m.start() == m.end():
+                if offset + m.start() == last_empty:
+                    continue
+                last_empty = offset + m.start()
+            if m.start() > pos:
+                yield "text", buf[pos:m.start()]
+            yield "match", m
+            pos = m.end()
+        if eof:
+            if pos < len(buf):
+                yield "text", buf[pos:]
+            return
+        if cut is None:
+            cut = max(pos, len(buf) - overlap)
+        if cut > pos:
+            yield "text", buf[pos:cut]
+        keep = max(0, cut - context)
+        offset += keep
+        buf = buf[keep:]
+        start = cut - keep
+
+
+def compile_template(regex, repl, strict=False):
+    """把替换模板预先拆成字面量和分组引用，返回 f(匹配) -> 替换结果
+
+    Match.expand 每次调用都要重新解析模板，逐个匹配调用时是主要开销。
+    遇到不认识的转义（如八进制）时退回 expand，保证结果与 re.sub 一致；
+    strict 为真时改为报错，供没有 expand 可退的引擎使用。
+    """
+    is_bytes = isinstance(repl, bytes)
+    empty = b"" if is_bytes else ""
+    if (b"\\" if is_bytes else "\\") not in repl:
+        return lambda m: repl
+    template_re, escapes = _TEMPLATE_SYNTAX[is_bytes]
+    parts = []
+    pos = 0
+    for t in template_re.finditer(repl):
+        if t.start() > pos:
+            parts.append(repl[pos:t.start()])
+        name, number, char = t.groups()
+        if is_bytes and name is not None:
+            name = name.decode("latin-1")
+        if number is not None and number[:1] not in ("0", b"0"):
+            parts.append(int(number))
+        elif name is not None and name.isdigit():
+            parts.append(int(name))
+        elif name is not None and name in regex.groupindex:
+            parts.append(regex.groupindex[name])
+        elif char in escapes:
+            parts.append(escapes[char])
+        elif strict:
+            raise re.error(f"不支持的替换模板转义: {repl[t.start():t.end()]!r}")
+        else:
+            return lambda m: m.expand(repl)
+        pos = t.end()
+    parts.append(repl[pos:])
+    for part in parts:
+        if isinstance(part, int) and part > regex.groups:
+            raise re.error(f"invalid group reference {part}")
+
+    # 合并相邻字面量，得到 字面量, 分组, 字面量, ..., 字面量 交替的形式
+    literals = [empty]
+    groups = []
+    for part in parts:
+        if isinstance(part, int):
+            groups.append(part)
+            literals.append(empty)
+        else:
+            literals[-1] += part
+    if not groups:
+        literal = literals[0]
+        return lambda m: literal
+    if len(groups) == 1:
+        head, tail = literals
+        group = groups[0]
+        return lambda m: head + (m.group(group) or empty) + tail
+
+    def expand(m):
+        out = [literals[0]]
+        for value, literal in zip(m.group(*groups), literals[1:]):
+            out.append(value or empty)
+            out.append(literal)
+        return empty.join(out)
+    return expand
+
+
+def stream_sub(regex, repl, reader, writer, **kwargs):
+    """流式替换，返回替换次数"""
+    expand = compile_template(regex, repl)
+    write = writer.write
+    count = 0
+    for kind, value in iter_segments(regex, reader, **kwargs):
+        if kind == "text":
+            write(value)
+        else:
+            write(expand(value))
+            count += 1
+    return count
+
+
+def stream_split(regex, reader, writer, **kwargs):
+    """流式分割，每段（以及 re.split 会保留的分组）各占一行，返回段数"""
+    pieces = 1
+    for kind, value in iter_segments(regex, reader, **kwargs):
+        if kind == "text":
+            writer.write(value)
+            continue
+        writer.write(b"\n")
+        for group in value.groups():
+            writer.write((group or b"") + b"\n")
+        pieces += 1
+    writer.write(b"\n")
+    return pieces
+
+
+def sub_file(regex, repl, in_path, out_path, **kwargs):
+    with open(in_path, "rb") as reader, open(out_path, "wb") as writer:
+        return stream_sub(regex, repl, reader, writer, **kwargs)
+
+
+def split_file(regex, in_path, out_path, **kwargs):
+    with open(in_path, "rb") as reader, open(out_path, "wb") as writer:
+        return stream_split(regex, reader, writer, **kwargs)
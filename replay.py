@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按键录制与回放 - 端到端的按键延迟回归测试
+
+--record 把真实会话中 read_keys 从 getch() 读到的每批按键连同时间和终端大小写入文件
+（每行一个 JSON）。回放时在 headless.FakeScreen 上新建一个计算器，不等待录制时的间隔，
+按原来的批次逐批交给 TUICalculator.step —— 和真实主循环同一条路径: 合并按键、模式分派、
+求值、差量重绘。每批的耗时就是一次按键的端到端延迟，微基准测不到输入循环、
+模式分派和重绘之间的相互影响，这里都算在内。
+
+回放时同步求值（不启动工作进程），求值的耗时计入按键延迟，结果也与时序无关，
+最后的屏幕哈希可以用来确认两次回放走的是同一条路径。回放不读写历史记录，
+Ctrl-P 性能行的开关会被跳过，因为性能行里的数字每次都不同。
+结果的格式与 benchmark 相同，可以保存成基线并用同样的方式比较。
+"""
+
+import json
+import platform
+import statistics
+import sys
+import time
+
+REPEAT = 5  # 每个录制文件回放的次数
+FORMAT = "multical-keys"
+VERSION = 1
+
+# 延迟直方图的分桶上限，毫秒
+BUCKETS = (0.1, 0.3, 1, 3, 10, 30, 100, 300)
+
+
+class KeyRecorder:
+    """把按键批次写入录制文件；每批一行 [秒, [键码...]]，终端大小变化时附上 [行, 列]"""
+
+    def __init__(self, path, size):
+        self.file = open(path, "w", encoding="utf-8", buffering=1)  # 行缓冲，异常退出也不丢
+        self.start = time.monotonic()
+        self.size = tuple(size)
+        header = {"format": FORMAT, "version": VERSION, "size": list(self.size),
+                  "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, keys, size):
+        if not keys or self.file is None:
+            return
+        line = [round(time.monotonic() - self.start, 4), keys]
+        if tuple(size) != self.size:
+            self.size = tuple(size)
+            line.append(list(self.size))
+        self.file.write(json.dumps(line) + "\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def load(path):
+    """读入录制文件，返回 (文件头, [(秒, 键码列表, 终端大小或 None)])"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise ValueError(f"{path} 不是按键录制文件")
+        if header.get("version") != VERSION:
+            raise ValueError(f"{path}: 不支持的录制格式版本 {header.get('version')}")
+        batches = []
+        for number, line in enumerate(f, 2):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                t, keys = item[0], [int(k) for k in item[1]]
+            except (ValueError, TypeError, IndexError):
+                raise ValueError(f"{path}:{number}: 无法解析的按键记录")
+            batches.append((t, keys, tuple(item[2]) if len(item) > 2 else None))
+    return header, batches
+
+
+def replay_once(header, batches):
+    """回放一次，返回 ([(延迟秒数, 按键时的模式)], 屏幕哈希)；需要在 headless() 中调用"""
+    from calculator import TUICalculator, PERF_KEY
+    from headless import FakeScreen
+    screen = FakeScreen(*header["size"])
+    calculator = TUICalculator(screen, history_path=None)
+    calculator.logic.evaluator = None  # 同步求值
+    calculator.frame_interval = 0.0  # 每批都绘制
+    calculator.draw()
+    latencies = []
+    pending = False
+    for _, keys, size in batches:
+        if size is not None and size != screen.getmaxyx():
+            screen.resize(*size)
+        keys = [k for k in keys if k != PERF_KEY]
+        if not keys:
+            continue
+        mode = calculator.logic.mode
+        start = time.perf_counter()
+        running, pending = calculator.step(keys, pending)
+        latencies.append((time.perf_counter() - start, mode))
+        if not running:
+            break
+    return latencies, screen.digest()
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * p // 100) - 1)]
+
+
+def replay_file(path, repeat=REPEAT):
+    """回放 repeat 次，返回 benchmark 格式的一项结果和最快一次的延迟列表"""
+    header, batches = load(path)
+    runs = []
+    digests = set()
+    for _ in range(max(1, repeat)):
+        latencies, digest = replay_once(header, batches)
+        runs.append((sum(t for t, _ in latencies), latencies))
+        digests.add(digest)
+    if len(digests) > 1:
+        raise RuntimeError(f"{path}: 多次回放的最终画面不同，回放结果依赖时序")
+    totals = [total for total, _ in runs]
+    best, latencies = min(runs, key=lambda run: run[0])
+    times = [t for t, _ in latencies] or [0.0]
+    result = {
+        "best": best,
+        "median": statistics.median(totals),
+        "loops": 1,
+        "keys": len(latencies),
+        "p50": percentile(times, 50),
+        "p95": percentile(times, 95),
+        "p99": percentile(times, 99),
+        "max": max(times),
+        "digest": digests.pop(),
+    }
+    return result, latencies
+
+
+def _format_ms(seconds):
+    return f"{seconds * 1000:.2f} ms"
+
+
+def report(name, result, latencies, out=sys.stdout):
+    """打印一个录制文件的延迟分布: 分位数、直方图和按模式的统计"""
+    out.write(f"{name}: {result['keys']} 批按键, 总计 {_format_ms(result['best'])} "
+              f"(中位数 {_format_ms(result['median'])}), 画面 {result['digest'][:12]}\n")
+    out.write(f"  每批延迟 p50 {_format_ms(result['p50'])}  p95 {_format_ms(result['p95'])}  "
+              f"p99 {_format_ms(result['p99'])}  最大 {_format_ms(result['max'])}\n")
+    if not latencies:
+        return
+    counts = [0] * (len(BUCKETS) + 1)
+    for t, _ in latencies:
+        ms = t * 1000
+        counts[next((i for i, edge in enumerate(BUCKETS) if ms < edge), len(BUCKETS))] += 1
+    width = max(counts)
+    for i, count in enumerate(counts):
+        if not count:
+            continue
+        label = f"< {BUCKETS[i]:g} ms" if i < len(BUCKETS) else f">= {BUCKETS[-1]:g} ms"
+        bar = "#" * max(1, round(count / width * 40))
+        out.write(f"  {label:>10} {count:>6} {bar}\n")
+    by_mode = {}
+    for t, mode in latencies:
+        by_mode.setdefault(mode, []).append(t)
+    if len(by_mode) > 1:
+        for mode, times in by_mode.items():
+            out.write(f"  {mode}: {len(times)} 批, p50 {_format_ms(percentile(times, 50))}, "
+                      f"p95 {_format_ms(percentile(times, 95))}, 最大 {_format_ms(max(times))}\n")
+
+
+def run_replays(paths, repeat=REPEAT, out=sys.stdout):
+    """回放每个录制文件并打印延迟分布，返回 benchmark 格式的结果"""
+    import os
+    from headless import headless
+    results = {}
+    with headless():
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            result, latencies = replay_file(path, repeat)
+            results[name] = result
+            report(name, result, latencies, out)
+            out.flush()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def changed_screens(baseline, current):
+    """最终画面与基线不同的录制文件名: 界面或逻辑的行为变了，耗时不再可比"""
+    old = baseline["results"]
+    return [name for name, result in current["results"].items()
+            if name in old and old[name].get("digest") not in (None, result["digest"])]
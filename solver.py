@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+方程求解模块 - 区间内的全部实根，以及小型非线性方程组
+
+单个方程: 在区间上等距取点，整组点一次求值（有 NumPy 时向量化），
+找出相邻点之间变号的位置，每个变号区间用 Brent 方法求根；
+不变号的重根（如 x^2 = 0）在 |f| 的局部极小处用 Newton 迭代确认。
+方程组: 阻尼 Newton 迭代；没有给初值时从网格上的多个起点出发，收集互不相同的解。
+Newton 用的导数和 Jacobian 由符号求导得到并编译（见 symbolic.py），
+含有不能符号求导的函数时退回差分近似。
+"""
+
+import itertools
+import math
+
+from evaluator import ExpressionError, compile_expression, free_names, parse_expression
+from plotter import evaluate_grid
+from symbolic import CompiledTerm, differentiate, parse
+from truthtable import split_outputs
+
+try:
+    import numpy as np
+except ImportError:  # NumPy为可选依赖
+    np = None
+
+SCAN_POINTS = 4000  # 扫描区间时的分段数
+DEFAULT_INTERVAL = (-10.0, 10.0)
+MAX_ROOTS = 100  # 最多报告的根数
+MAX_UNKNOWNS = 6  # 方程组最多的未知数个数
+NEWTON_WORK = 300000  # 方程组所有起点的 Newton 迭代总工作量上限，每轮按 未知数个数^2 计
+
+_XTOL = 4 * 2.220446049250313e-16
+
+
+class Equation:
+    """'左边 = 右边' 或 '表达式'（= 0），编译成 左边 - 右边 的函数
+
+    unknowns 是未知数（不在已知变量中的名字），其余变量绑定为常数。
+    """
+
+    def __init__(self, text, variables, unknowns=None):
+        lhs, eq, rhs = text.partition("=")
+        if "=" in rhs:
+            raise ExpressionError("一个方程只能有一个等号")
+        self.text = text.strip()
+        source = f"({lhs})-({rhs})" if eq else lhs
+        names = free_names(parse_expression(source))
+        if unknowns is None:
+            unknowns = [name for name in names if name not in variables] or ["x"]
+        others = [name for name in names if name not in unknowns]
+        for name in others:
+            if name not in variables:
+                raise ExpressionError(f"未定义的变量 '{name}'")
+        self.unknowns = list(unknowns)
+        self.source = source
+        self.compiled = compile_expression(source, params=self.unknowns + others)
+        self.others = others
+        self.args = tuple(variables[name] for name in others)
+        self._partials = None  # 各未知数的偏导数，第一次用到时编译；False 表示不能符号求导
+
+    def __call__(self, *xs):
+        """在一个点上求值，无定义时返回 nan"""
+        try:
+            y = self.compiled(*xs, *self.args)
+        except (TypeError, ValueError, ArithmeticError):
+            return math.nan
+        if isinstance(y, complex):
+            return math.nan
+        return float(y)
+
+    def grid(self, xs):
+        """单变量方程在整组点上批量求值"""
+        return evaluate_grid(self.compiled, xs, self.args)
+
+    def gradient(self, *xs):
+        """各未知数的偏导数，不能符号求导或在该点无定义时返回 None"""
+        if self._partials is None:
+            try:
+                term = parse(self.source)
+                params = self.unknowns + self.others
+                self._partials = [CompiledTerm(differentiate(term, name), params)
+                                  for name in self.unknowns]
+            except ExpressionError:
+                self._partials = False
+        if not self._partials:
+            return None
+        try:
+            values = [float(d(*xs, *self.args)) for d in self._partials]
+        except (TypeError, ValueError, ArithmeticError):
+            return None
+        return values if all(map(math.isfinite, values)) else None
+
+    def slope(self, x):
+        """单变量方程的导数，无法给出时返回 None"""
+        gradient = self.gradient(x)
+        return gradient[0] if gradient else None
+
+
+def _sign_changes(ys):
+    """相邻两点严格变号的下标 i（ys[i] 和 ys[i+1] 异号）"""
+    if np is not None:
+        ys = np.asarray(ys, dtype=float)
+        return np.nonzero(ys[:-1] * ys[1:] < 0)[0].tolist()
+    return [i for i in range(len(ys) - 1) if ys[i] * ys[i + 1] < 0]
+
+
+def _local_minima(ys):
+    """|y| 的局部极小且两侧不变号的下标，可能是重根"""
+    if np is not None:
+        a = np.abs(np.asarray(ys, dtype=float))
+        mid = (a[1:-1] < a[:-2]) & (a[1:-1] <= a[2:])
+        return (np.nonzero(mid)[0] + 1).tolist()
+    return [i for i in range(1, len(ys) - 1)
+            if abs(ys[i]) < abs(ys[i - 1]) and abs(ys[i]) <= abs(ys[i + 1])]
+
+
+def brent(f, a, b, fa=None, fb=None, xtol=_XTOL, max_iter=200):
+    """Brent 方法求 [a, b] 内的根，要求 f(a) 与 f(b) 异号"""
+    fa = f(a) if fa is None else fa
+    fb = f(b) if fb is None else fb
+    if fa == 0:
+        return a
+    if fb == 0:
+        return b
+    if fa * fb > 0:
+        raise ValueError("区间两端函数值同号")
+    c, fc = a, fa
+    d = e = b - a
+    for _ in range(max_iter):
+        if fb * fc > 0:
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol = 2 * xtol * abs(b) + 0.5 * 1e-300
+        m = 0.5 * (c - b)
+        if abs(m) <= tol or fb == 0:
+            return b
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            # 割线或反二次插值
+            s = fb / fa
+            if a == c:
+                p = 2 * m * s
+                q = 1 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            else:
+                p = -p
+            if 2 * p < min(3 * m * q - abs(tol * q), abs(e * q)):
+                e, d = d, p / q
+            else:
+                d = e = m
+        else:
+            d = e = m
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, m)
+        fb = f(b)
+    return b
+
+
+def newton(f, x, lo=-math.inf, hi=math.inf, max_iter=60, df=None):
+    """单变量 Newton 迭代，离开 [lo, hi] 或不收敛时返回 None
+
+    df 给出导数（返回 None 表示没有），否则用中心差分。
+    """
+    for _ in range(max_iter):
+        y = f(x)
+        if y == 0:
+            return x
+        slope = df(x) if df is not None else None
+        if slope is None:
+            h = 1e-6 * max(1.0, abs(x))
+            slope = (f(x + h) - f(x - h)) / (2 * h)
+        if not math.isfinite(slope) or slope == 0:
+            return None
+        step = y / slope
+        x -= step
+        if not lo <= x <= hi or not math.isfinite(x):
+            return None
+        if abs(step) <= _XTOL * max(1.0, abs(x)):
+            return x
+    return None
+
+
+def find_roots(eq, a, b, points=SCAN_POINTS):
+    """[a, b] 内的全部实根（按从小到大），扫描分辨率以下的成对根可能漏掉"""
+    if not a < b:
+        raise ValueError("区间下限必须小于上限")
+    step = (b - a) / points
+    xs = [a + i * step for i in range(points)] + [b]
+    ys = eq.grid(xs).tolist()
+    roots = [xs[i] for i, y in enumerate(ys) if y == 0]
+
+    for i in _sign_changes(ys):
+        y0, y1 = ys[i], ys[i + 1]
+        root = brent(eq, xs[i], xs[i + 1], y0, y1)
+        # 跨过极点或跳跃间断点也会变号: 根处的函数值必须远小于两端
+        if abs(eq(root)) <= 1e-8 * max(1.0, min(abs(y0), abs(y1))):
+            roots.append(root)
+
+    for i in _local_minima(ys):
+        if ys[i - 1] * ys[i + 1] <= 0 or not math.isfinite(ys[i]):
+            continue  # 已经按变号处理
+        root = newton(eq, xs[i], xs[i - 1], xs[i + 1], df=eq.slope)
+        if root is not None and abs(eq(root)) <= 1e-12 * max(1.0, abs(ys[i - 1]), abs(ys[i + 1])):
+            roots.append(root)
+
+    roots.sort()
+    merged = []
+    for root in roots:
+        if merged and abs(root - merged[-1]) <= 1e-9 * max(1.0, abs(root)):
+            continue
+        merged.append(root)
+    return merged
+
+
+def _solve_linear(matrix, rhs):
+    """部分主元高斯消元，奇异时返回 None"""
+    n = len(rhs)
+    rows = [list(row) + [v] for row, v in zip(matrix, rhs)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-300:
+            return None
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            if factor:
+                for k in range(col, n + 1):
+                    rows[r][k] -= factor * rows[col][k]
+    out = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        out[r] = (rows[r][n] - sum(rows[r][k] * out[k] for k in range(r + 1, n))) / rows[r][r]
+    return out
+
+
+def newton_system(equations, start, tol=1e-10, max_iter=100):
+    """阻尼 Newton 求解方程组，返回 (解, 迭代轮数)，不收敛时解为 None
+
+    迭代到步长降到浮点精度为止，残差不超过 tol 才算收敛。
+    """
+    x = [float(v) for v in start]
+    n = len(x)
+
+    def residual(point):
+        return [eq(*point) for eq in equations]
+
+    def norm(values):
+        return max(map(abs, values))
+
+    fx = residual(x)
+    for iteration in range(1, max_iter + 1):
+        size = norm(fx)
+        if not math.isfinite(size):
+            return None, iteration
+        if size == 0:
+            return x, iteration
+        jacobian = [eq.gradient(*x) for eq in equations]
+        missing = [i for i, row in enumerate(jacobian) if row is None]
+        if missing:
+            # 不能符号求导的方程用前向差分
+            for i in missing:
+                jacobian[i] = [0.0] * n
+            for j in range(n):
+                h = 1e-7 * max(1.0, abs(x[j]))
+                shifted = x[:]
+                shifted[j] += h
+                for i in missing:
+                    jacobian[i][j] = (equations[i](*shifted) - fx[i]) / h
+        delta = _solve_linear(jacobian, [-v for v in fx])
+        if delta is None:
+            return None, iteration
+        # 回溯线搜索: 残差不下降时步长减半
+        alpha = 1.0
+        while True:
+            trial = [xi + alpha * di for xi, di in zip(x, delta)]
+            f_trial = residual(trial)
+            if norm(f_trial) < size or alpha < 1e-4:
+                break
+            alpha /= 2
+        x, fx = trial, f_trial
+        if norm(delta) * alpha <= _XTOL * (1 + norm(x)):
+            return (x if norm(fx) <= tol else None), iteration
+    return (x if norm(fx) <= tol else None), max_iter
+
+
+def solve_system(equations, starts, work=NEWTON_WORK):
+    """从多个起点求解方程组，返回 (互不相同的解（按字典序）, 实际试过的起点数)
+
+    每轮 Newton 迭代要算 n 行 Jacobian 并解 n 阶线性方程组，按 n^2 计工作量；
+    所有起点的总工作量超过 work 时不再尝试剩下的起点，未知数多时不会卡上几十秒。
+    """
+    solutions = []
+    cost = len(equations) ** 2
+    tried = 0
+    for start in starts:
+        if work <= 0:
+            break
+        tried += 1
+        x, iterations = newton_system(equations, start, max_iter=max(1, min(100, work // cost)))
+        work -= iterations * cost
+        if x is None:
+            continue
+        x = [0.0 if abs(v) < 1e-15 else v for v in x]
+        if any(max(abs(a - b) for a, b in zip(x, s)) <= 1e-8 * (1 + max(map(abs, s)))
+               for s in solutions):
+            continue
+        solutions.append(x)
+    solutions.sort()
+    return solutions, tried
+
+
+def default_starts(n):
+    """没有给初值时的起点: [-10, 10]^n 上的网格，离原点近的在前（工作量用完时先试过的是它们）"""
+    per_axis = {1: 9, 2: 7, 3: 5}.get(n, 3)
+    axis = [-10 + 20 * (k + 0.5) / per_axis for k in range(per_axis)]
+    return sorted(itertools.product(axis, repeat=n), key=lambda p: sum(v * v for v in p))
+
+
+def _format(value):
+    return f"{0.0 if value == 0 else value:.15g}"
+
+
+def solve(text, evaluate, variables):
+    """求解输入，返回结果文本
+
+    'f = g'、'f = g, a, b' 求区间内的全部实根；
+    '方程1; 方程2 [@ 初值1, 初值2]' 求解方程组。evaluate 把区间端点等文本求值成数字。
+    """
+    text, _, guess = text.partition("@")
+    parts = [p for p in text.split(";") if p.strip()]
+    if not parts:
+        raise ExpressionError("请输入方程")
+    if len(parts) == 1 and not guess:
+        args = split_outputs(parts[0])
+        if len(args) not in (1, 3):
+            raise ExpressionError("格式应为 f = g 或 f = g, 下限, 上限")
+        eq = Equation(args[0], variables)
+        if len(eq.unknowns) != 1:
+            raise ExpressionError(f"方程有多个未知数 ({', '.join(eq.unknowns)})，请用 ; 给出足够的方程")
+        a, b = DEFAULT_INTERVAL if len(args) == 1 else (float(evaluate(arg)) for arg in args[1:])
+        roots = find_roots(eq, a, b)
+        name = eq.unknowns[0]
+        if not roots:
+            return f"[{a:g}, {b:g}] 内没有找到实根"
+        shown = ", ".join(map(_format, roots[:MAX_ROOTS]))
+        more = f"（只显示前 {MAX_ROOTS} 个）" if len(roots) > MAX_ROOTS else ""
+        return f"{name} = {shown} (共 {len(roots)} 个根, [{a:g}, {b:g}]){more}"
+
+    # 方程组: 未知数取自所有方程，按名字排序
+    unknowns = sorted({name for part in parts for name in Equation(part, variables).unknowns})
+    if len(unknowns) != len(parts):
+        raise ExpressionError(f"{len(parts)} 个方程, {len(unknowns)} 个未知数 ({', '.join(unknowns)})")
+    if len(unknowns) > MAX_UNKNOWNS:
+        raise ExpressionError(f"最多支持 {MAX_UNKNOWNS} 个未知数")
+    equations = [Equation(part, variables, unknowns) for part in parts]
+    if guess:
+        start = [float(evaluate(v)) for v in split_outputs(guess)]
+        if len(start) != len(unknowns):
+            raise ExpressionError(f"初值个数应为 {len(unknowns)}")
+        starts = [start]
+    else:
+        starts = default_starts(len(unknowns))
+    starts = list(starts)
+    solutions, tried = solve_system(equations, starts)
+    partial = f"，迭代量达到上限，只试了 {tried}/{len(starts)} 个起点" if tried < len(starts) else ""
+    if not solutions:
+        return f"没有找到解，可以用 @ 给出初值试试{partial}"
+    return "; ".join(", ".join(f"{name} = {_format(v)}" for name, v in zip(unknowns, x))
+                     for x in solutions) + f" (共 {len(solutions)} 组解{partial})"
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+启动基准测试 - 冷启动到第一帧的时间
+
+每次启动一个新的解释器，在伪终端（pty）里运行 main.py --first-frame：
+导入模块、初始化 curses、载入历史、画完第一帧后立即退出。
+从创建进程到进程退出的墙钟时间就是一次冷启动的耗时。
+多次运行取中位数，超过预算时返回失败，可以放进提交前的检查里。
+"""
+
+import os
+import select
+import statistics
+import struct
+import subprocess
+import sys
+import time
+
+STARTUP_BUDGET = 250.0  # 毫秒，冷启动到第一帧的中位数上限
+TERMINAL_SIZE = (30, 80)  # 伪终端的 (行, 列)
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def _open_terminal(rows, cols):
+    """打开一对伪终端并设置窗口大小，返回 (主端, 从端)"""
+    import fcntl
+    import pty
+    import termios
+    master, slave = pty.openpty()
+    fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+    return master, slave
+
+
+def _drain(master, proc):
+    """读走子进程的输出直到它退出，免得终端缓冲区写满后子进程阻塞"""
+    while True:
+        ready, _, _ = select.select([master], [], [], 0.05)
+        if ready:
+            try:
+                if not os.read(master, 65536):
+                    break
+            except OSError:  # 子进程退出后从端关闭，Linux 上读主端报 EIO
+                break
+        elif proc.poll() is not None:
+            break
+    return proc.wait()
+
+
+def measure_once(extra_args=()):
+    """冷启动一次，返回到第一帧画完并退出的毫秒数"""
+    master, slave = _open_terminal(*TERMINAL_SIZE)
+    env = dict(os.environ)
+    env.setdefault("TERM", "xterm-256color")
+    try:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, MAIN, "--first-frame", *extra_args],
+                                stdin=slave, stdout=slave, stderr=slave, env=env,
+                                close_fds=True)
+        os.close(slave)
+        slave = None
+        code = _drain(master, proc)
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        if slave is not None:
+            os.close(slave)
+        os.close(master)
+    if code != 0:
+        raise RuntimeError(f"计算器启动失败，退出码 {code}")
+    return elapsed
+
+
+def run_benchmark(runs=10, budget=STARTUP_BUDGET, extra_args=(), out=sys.stdout):
+    """运行 runs 次冷启动并报告，中位数超过 budget 毫秒时返回 False"""
+    if os.name != "posix":
+        raise RuntimeError("启动基准测试需要伪终端，只支持类 Unix 系统")
+    measure_once(extra_args)  # 预热: 生成 .pyc，让磁盘缓存就绪
+    times = sorted(measure_once(extra_args) for _ in range(max(1, runs)))
+    median = statistics.median(times)
+    out.write(f"冷启动到第一帧: 中位数 {median:.1f} ms, 最快 {times[0]:.1f} ms, "
+              f"最慢 {times[-1]:.1f} ms ({len(times)} 次)\n")
+    ok = median <= budget
+    out.write(f"{'通过' if ok else '超出预算'}: 预算 {budget:g} ms\n")
+    return ok
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+符号求导模块 - 哈希共享的项 DAG、化简和编译
+
+表达式转换成项（Term）组成的有向无环图。所有项都经过一张弱引用表哈希共享:
+结构相同的子表达式只有一个对象，所以反复求导时公共部分不会复制，
+导数的节点数随求导次数多项式增长，而展开成树时是指数增长；多项式的次数取决于表达式，
+例如 sin(x)*exp(x)/(1+x^2) 的 5/10/20/40 阶导数分别有 115/467/2652/18197 个节点，
+所以 calculus 限制了求导的阶数。
+构造项时顺带做化简（常量折叠、x+0、x*1、x*x -> x^2、同类项合并等）。
+求导按节点记忆化，共享的子图只求一次；编译时直接由 DAG 生成代码，
+被多处引用的节点算一次存进临时变量，不经过展开成树的文本。
+"""
+
+import ast
+import math
+import weakref
+from itertools import count
+from types import FunctionType
+
+from evaluator import FUNCTIONS, ExpressionError, parse_expression
+
+MAX_DISPLAY_NODES = 400  # 展开成树后超过这么多节点就不显示完整的式子
+
+_table = weakref.WeakValueDictionary()  # 结构 -> 项，哈希共享
+_serial = count()
+
+
+class Term:
+    """DAG 中的一个项: op 为 const/var/add/mul/pow/neg/call，args 为子项或值"""
+
+    __slots__ = ("op", "args", "serial", "__weakref__")
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.serial = next(_serial)  # 创建顺序，用于交换律运算的规范顺序
+
+    @property
+    def value(self):
+        return self.args[0]
+
+    def is_const(self, value=None):
+        if self.op != "const":
+            return False
+        return value is None or (self.args[0] == value and not isinstance(self.args[0], complex))
+
+    def children(self):
+        if self.op in ("const", "var"):
+            return ()
+        if self.op == "call":
+            return self.args[1:]
+        return self.args
+
+    def __str__(self):
+        return to_text(self)
+
+    def __repr__(self):
+        return f"Term({to_text(self)!r})"
+
+
+def _intern(op, args, key=None):
+    key = (op,) + args if key is None else key
+    term = _table.get(key)
+    if term is None:
+        term = Term(op, args)
+        _table[key] = term
+    return term
+
+
+def const(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53:
+        value = int(value)
+    return _intern("const", (value,), ("const", type(value), value))
+
+
+def var(name):
+    return _intern("var", (name,))
+
+
+ZERO = const(0)
+ONE = const(1)
+
+
+def _order(a, b):
+    """交换律运算的规范顺序: 常数在前，其余按创建顺序"""
+    if b.op == "const" and a.op != "const":
+        return b, a
+    if a.op != "const" and b.op != "const" and b.serial < a.serial:
+        return b, a
+    return a, b
+
+
+def _split_coeff(t):
+    """c*x -> (c, x)，常数 c -> (c, 1)，其他 -> (1, t)"""
+    if t.op == "const":
+        return t.value, ONE
+    if t.op == "mul" and t.args[0].op == "const":
+        return t.args[0].value, t.args[1]
+    if t.op == "neg":
+        c, rest = _split_coeff(t.args[0])
+        return -c, rest
+    return 1, t
+
+
+def _split_power(t):
+    """x^c -> (x, c)，其他 -> (t, 1)"""
+    if t.op == "pow" and t.args[1].op == "const":
+        return t.args[0], t.args[1].value
+    return t, 1
+
+
+def add(a, b):
+    if a.is_const(0):
+        return b
+    if b.is_const(0):
+        return a
+    if a.op == "const" and b.op == "const":
+        return const(a.value + b.value)
+    ca, ra = _split_coeff(a)
+    cb, rb = _split_coeff(b)
+    if ra is rb:
+        return mul(const(ca + cb), ra)  # 合并同类项
+    if a.op == "const" and b.op == "add" and b.args[0].op == "const":
+        return add(const(a.value + b.args[0].value), b.args[1])
+    if b.op == "const" and a.op == "add" and a.args[0].op == "const":
+        return add(const(b.value + a.args[0].value), a.args[1])
+    a, b = _order(a, b)
+    return _intern("add", (a, b))
+
+
+def sub(a, b):
+    return add(a, neg(b))
+
+
+def neg(a):
+    if a.op == "const":
+        return const(-a.value)
+    if a.op == "neg":
+        return a.args[0]
+    if a.op == "mul" and a.args[0].op == "const":
+        return mul(const(-a.args[0].value), a.args[1])
+    return _intern("neg", (a,))
+
+
+def mul(a, b):
+    if a.is_const(0) or b.is_const(0):
+        return ZERO
+    if a.is_const(1):
+        return b
+    if b.is_const(1):
+        return a
+    if a.op == "const" and b.op == "const":
+        return const(a.value * b.value)
+    if a.is_const(-1):
+        return neg(b)
+    if b.is_const(-1):
+        return neg(a)
+    if a.op == "neg":
+        return neg(mul(a.args[0], b))
+    if b.op == "neg":
+        return neg(mul(a, b.args[0]))
+    # 常系数提到最前面: c1*(c2*x) -> (c1*c2)*x，x*(c*y) -> c*(x*y)
+    ca, ra = _split_coeff(a)
+    cb, rb = _split_coeff(b)
+    canonical = (a.op == "const" and cb == 1) or (b.op == "const" and ca == 1)
+    if not canonical and (ca != 1 or cb != 1):
+        return mul(const(ca * cb), mul(ra, rb))
+    # 同底数幂相乘: x^a * x^b -> x^(a+b)
+    base_a, exp_a = _split_power(a)
+    base_b, exp_b = _split_power(b)
+    if base_a is base_b:
+        return power(base_a, const(exp_a + exp_b))
+    # 再往下看一层: x * (x*y) -> x^2 * y
+    for x, y, base, exponent in ((a, b, base_a, exp_a), (b, a, base_b, exp_b)):
+        if y.op == "mul":
+            for i in (0, 1):
+                inner_base, inner_exp = _split_power(y.args[i])
+                if inner_base is base:
+                    return mul(power(base, const(exponent + inner_exp)), y.args[1 - i])
+    a, b = _order(a, b)
+    return _intern("mul", (a, b))
+
+
+def div(a, b):
+    return mul(a, power(b, const(-1)))
+
+
+def power(a, b):
+    if b.is_const(0):
+        return ONE
+    if b.is_const(1):
+        return a
+    if a.is_const(1):
+        return ONE
+    if a.op == "const" and b.op == "const":
+        try:
+            if not (isinstance(b.value, int) and abs(b.value) > 1024):
+                value = a.value ** b.value
+                if not isinstance(value, complex):
+                    return const(value)
+        except (ArithmeticError, ValueError):
+            pass
+    if a.op == "pow" and b.op == "const" and isinstance(b.value, int) and a.args[1].op == "const":
+        # (x^c)^n -> x^(c*n)，n 为整数时恒成立
+        return power(a.args[0], const(a.args[1].value * b.value))
+    return _intern("pow", (a, b))
+
+
+def call(name, *args):
+    if all(arg.op == "const" for arg in args):
+        try:
+            value = FUNCTIONS[name](*(arg.value for arg in args))
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return const(value)
+        except (ArithmeticError, ValueError, TypeError):
+            pass
+    return _intern("call", (name,) + args)
+
+
+_BINARY = {ast.Add: add, ast.Sub: sub, ast.Mult: mul, ast.Div: div, ast.Pow: power}
+
+
+def from_ast(node):
+    """把 parse_expression 得到的 ast 转换成项"""
+    if isinstance(node, ast.Constant):
+        return const(node.value)
+    if isinstance(node, ast.Name):
+        return var(node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        return _BINARY[type(node.op)](from_ast(node.left), from_ast(node.right))
+    if isinstance(node, ast.UnaryOp):
+        operand = from_ast(node.operand)
+        return neg(operand) if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Call):
+        args = [from_ast(a) for a in node.args]
+        if node.func.id == "pow" and len(args) == 2:
+            return power(*args)
+        return call(node.func.id, *args)
+    raise ExpressionError(f"不能符号求导: {ast.unparse(node)}")
+
+
+def parse(text):
+    return from_ast(parse_expression(text))
+
+
+_LN10 = const(math.log(10))
+_LN2 = const(math.log(2))
+
+
+def _chain(name, args, dargs):
+    """函数调用的导数（链式法则）"""
+    if len(args) != 1:
+        raise ExpressionError(f"不支持对 {name} 求导")
+    u, = args
+    du, = dargs
+    if name == "sin":
+        outer = call("cos", u)
+    elif name == "cos":
+        outer = neg(call("sin", u))
+    elif name == "tan":
+        outer = add(ONE, power(call("tan", u), const(2)))
+    elif name == "asin":
+        outer = power(sub(ONE, power(u, const(2))), const(-0.5))
+    elif name == "acos":
+        outer = neg(power(sub(ONE, power(u, const(2))), const(-0.5)))
+    elif name == "atan":
+        outer = div(ONE, add(ONE, power(u, const(2))))
+    elif name == "sinh":
+        outer = call("cosh", u)
+    elif name == "cosh":
+        outer = call("sinh", u)
+    elif name == "tanh":
+        outer = sub(ONE, power(call("tanh", u), const(2)))
+    elif name == "sqrt":
+        outer = div(const(0.5), call("sqrt", u))
+    elif name == "exp":
+        outer = call("exp", u)
+    elif name == "expm1":
+        outer = call("exp", u)
+    elif name == "ln":
+        outer = div(ONE, u)
+    elif name in ("log", "log10"):
+        outer = div(ONE, mul(_LN10, u))
+    elif name == "log2":
+        outer = div(ONE, mul(_LN2, u))
+    elif name == "log1p":
+        outer = div(ONE, add(ONE, u))
+    elif name in ("abs", "fabs"):
+        outer = div(u, call(name, u))
+    elif name == "radians":
+        outer = const(math.pi / 180)
+    elif name == "degrees":
+        outer = const(180 / math.pi)
+    else:
+        raise ExpressionError(f"不支持对 {name} 求导")
+    return mul(outer, du)
+
+
+def differentiate(term, name):
+    """term 对变量 name 的导数；共享的子图只求一次"""
+    memo = {}
+    # 迭代的后序遍历，子项的导数先算好
+    stack = [(term, False)]
+    while stack:
+        t, done = stack.pop()
+        if id(t) in memo:
+            continue
+        if not done:
+            stack.append((t, True))
+            stack.extend((c, False) for c in t.children() if id(c) not in memo)
+            continue
+        op = t.op
+        if op == "const":
+            d = ZERO
+        elif op == "var":
+            d = ONE if t.value == name else ZERO
+        elif op == "add":
+            d = add(memo[id(t.args[0])], memo[id(t.args[1])])
+        elif op == "neg":
+            d = neg(memo[id(t.args[0])])
+        elif op == "mul":
+            a, b = t.args
+            d = add(mul(memo[id(a)], b), mul(a, memo[id(b)]))
+        elif op == "pow":
+            a, b = t.args
+            da, db = memo[id(a)], memo[id(b)]
+            if db is ZERO:
+                # x^c -> c*x^(c-1)*x'
+                d = mul(mul(b, power(a, sub(b, ONE))), da)
+            elif da is ZERO:
+                # c^u -> c^u*ln(c)*u'
+                d = mul(mul(t, call("ln", a)), db)
+            else:
+                d = mul(t, add(mul(db, call("ln", a)), mul(b, div(da, a))))
+        else:
+            args = t.args[1:]
+            d = _chain(t.args[0], args, [memo[id(a)] for a in args])
+        memo[id(t)] = d
+    return memo[id(term)]
+
+
+def _postorder(root):
+    """DAG 中从 root 可达的节点，子项在前，每个节点只出现一次"""
+    order = []
+    seen = set()
+    stack = [(root, False)]
+    while stack:
+        t, done = stack.pop()
+        if done:
+            order.append(t)
+            continue
+        if id(t) in seen:
+            continue
+        seen.add(id(t))
+        stack.append((t, True))
+        stack.extend((c, False) for c in t.children())
+    return order
+
+
+def node_count(root):
+    """DAG 中的节点数"""
+    return len(_postorder(root))
+
+
+def tree_size(root):
+    """展开成树之后的节点数（不共享时的大小）"""
+    sizes = {}
+    for t in _postorder(root):
+        sizes[id(t)] = 1 + sum(sizes[id(c)] for c in t.children())
+    return sizes[id(root)]
+
+
+# 运算优先级，数值越大结合越紧
+_PRECEDENCE = {"add": 1, "neg": 2, "mul": 2, "pow": 4}
+
+
+def _number_text(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def to_text(root):
+    """用计算器的写法（^ 表示乘方）输出，共享的子式按展开后的树写出"""
+    texts = {}
+    for t in _postorder(root):
+        texts[id(t)] = _format(t, texts)
+    return texts[id(root)][0]
+
+
+def _format(t, texts):
+    """返回 (文本, 优先级)"""
+    op = t.op
+    if op == "const":
+        text = _number_text(t.value)
+        return text, (2 if t.value < 0 else 5)
+    if op == "var":
+        return t.value, 5
+    if op == "call":
+        return f"{t.args[0]}({', '.join(texts[id(a)][0] for a in t.args[1:])})", 5
+
+    def wrap(child, level):
+        text, prec = texts[id(child)]
+        return f"({text})" if prec < level else text
+
+    if op == "add":
+        a, b = t.args
+        if a.op == "const" or (_negative(a) and not _negative(b)):
+            a, b = b, a  # 常数项和减去的项写在后面: x + 1, y - x
+        if b.op == "neg":
+            return f"{wrap(a, 1)} - {wrap(b.args[0], 2)}", 1
+        if b.op == "const" and b.value < 0:
+            return f"{wrap(a, 1)} - {_number_text(-b.value)}", 1
+        if b.op == "mul" and b.args[0].op == "const" and b.args[0].value < 0:
+            # x + -2*y -> x - 2*y
+            rest = b.args[1]
+            denominator = _denominator(rest, texts)
+            coeff = _number_text(-b.args[0].value)
+            term = f"{coeff}/{denominator}" if denominator else f"{coeff}*{wrap(rest, 2)}"
+            return f"{wrap(a, 1)} - {term}", 1
+        return f"{wrap(a, 1)} + {wrap(b, 1)}", 1
+    if op == "neg":
+        return f"-{wrap(t.args[0], 2)}", 2
+    if op == "mul":
+        a, b = t.args
+        if _denominator(a, texts) is not None and _denominator(b, texts) is None:
+            a, b = b, a  # 分母写在后面: x^3/(x + 1)^3
+        denominator = _denominator(b, texts)
+        if denominator is not None:
+            return f"{wrap(a, 2)}/{denominator}", 2
+        return f"{wrap(a, 2)}*{wrap(b, 2)}", 2
+    a, b = t.args
+    denominator = _denominator(t, texts)
+    if denominator is not None:
+        return f"1/{denominator}", 2
+    return f"{wrap(a, 5)}^{wrap(b, 4)}", 4
+
+
+def _negative(t):
+    """是否以负号开头: -x、负常数、负系数的乘积"""
+    if t.op == "neg":
+        return True
+    if t.op == "const":
+        return t.value < 0
+    return t.op == "mul" and t.args[0].op == "const" and t.args[0].value < 0
+
+
+def _denominator(t, texts):
+    """x^(-n) 写成分母 x^n 时的文本，不是负常数次幂时返回 None"""
+    if t.op != "pow" or t.args[1].op != "const" or not t.args[1].value < 0:
+        return None
+    base, exponent = t.args
+    text, prec = texts[id(base)]
+    if exponent.value == -1:
+        return f"({text})" if prec < 3 else text
+    text = f"({text})" if prec < 5 else text
+    return f"{text}^{_number_text(-exponent.value)}"
+
+
+def display(root):
+    """显示用的文本；展开后太大时只给出规模"""
+    size = tree_size(root)
+    if size > MAX_DISPLAY_NODES:
+        return f"<展开后 {size} 个节点，共享后 {node_count(root)} 个>"
+    return to_text(root)
+
+
+def _code(t, names):
+    """一个节点的 Python 代码，子项用 names 中的代码"""
+    op = t.op
+    if op == "const":
+        return f"({t.value!r})"
+    if op == "var":
+        return t.value
+    if op == "call":
+        return f"{t.args[0]}({', '.join(names[id(a)] for a in t.args[1:])})"
+    if op == "neg":
+        return f"(-{names[id(t.args[0])]})"
+    a, b = (names[id(c)] for c in t.args)
+    symbol = {"add": "+", "mul": "*", "pow": "**"}[op]
+    return f"({a} {symbol} {b})"
+
+
+class CompiledTerm:
+    """由 DAG 直接生成的函数，被引用多次的节点存进临时变量"""
+
+    def __init__(self, root, params):
+        self.root = root
+        self.params = list(params)
+        order = _postorder(root)
+        refs = {}
+        for t in order:
+            for c in t.children():
+                refs[id(c)] = refs.get(id(c), 0) + 1
+        names = {}
+        lines = [f"def _expr({', '.join(self.params)}):"]
+        for t in order:
+            code = _code(t, names)
+            if refs.get(id(t), 0) > 1 and t.op not in ("const", "var"):
+                name = f"_t{len(lines) - 1}"
+                lines.append(f"    {name} = {code}")
+                code = name
+            names[id(t)] = code
+        for t in order:
+            if t.op == "var" and t.value not in self.params:
+                raise ExpressionError(f"未定义的变量 '{t.value}'")
+        lines.append(f"    return {names[id(root)]}")
+        self.code_text = "\n".join(lines)
+        scope = {}
+        exec(compile(self.code_text, "<derivative>", "exec"), {"__builtins__": {}}, scope)
+        self._func = FunctionType(scope["_expr"].__code__, {"__builtins__": {}, **FUNCTIONS})
+
+    def __call__(self, *args):
+        return self._func(*args)
+
+
+def derivative(text, name, order=1):
+    """表达式文本对 name 的 order 阶导数（项）"""
+    term = parse(text)
+    for _ in range(order):
+        term = differentiate(term, name)
+    return term
+
+
+def free_variables(term):
+    return [t.value for t in _postorder(term) if t.op == "var"]
@@ -0,0 +1,85 @@
+"""分治进制转换的测试: 往返转换、位数和预览都与内置的 int/format 比较"""
+
+import random
+import sys
+
+import pytest
+
+from baseconv import BaseConverter
+
+BASES = [2, 8, 10, 16]
+FORMATS = {2: "b", 8: "o", 10: "d", 16: "X"}
+
+
+@pytest.fixture(autouse=True)
+def unlimited_int_digits():
+    # 比较用的 str()/int() 不受 4300 位的限制，被测代码本身不依赖这个设置
+    if not hasattr(sys, "set_int_max_str_digits"):
+        yield
+        return
+    old = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    yield
+    sys.set_int_max_str_digits(old)
+
+
+def sample_values():
+    rng = random.Random(0)
+    values = [0, 1, 9, 10, 10 ** 2047, 10 ** 2048 - 1, 10 ** 2048, 10 ** 4096 + 1]
+    for bits in (1, 64, 6799, 6800, 6801, 13600, 40000, 120000):
+        values.append(rng.getrandbits(bits) | (1 << (bits - 1)))
+    values += [-v for v in values[1:4]]
+    return values
+
+
+@pytest.mark.parametrize("base", BASES)
+def test_round_trip(base):
+    converter = BaseConverter()
+    for value in sample_values():
+        text = converter.to_str(value, base)
+        assert text == format(value, FORMATS[base])
+        assert converter.to_int(text, base) == value
+
+
+@pytest.mark.parametrize("base", BASES)
+def test_digit_count(base):
+    converter = BaseConverter()
+    for value in sample_values():
+        assert converter.digit_count(value, base) == len(format(abs(value), FORMATS[base]))
+
+
+@pytest.mark.parametrize("base", BASES)
+def test_preview_matches_full_string(base):
+    converter = BaseConverter()
+    for value in sample_values():
+        full = format(abs(value), FORMATS[base])
+        head, tail, total = converter.preview(value, base, edge=16)
+        sign = "-" if value < 0 else ""
+        assert total == len(full)
+        if tail:
+            assert head == sign + full[:16] and tail == full[-16:]
+        else:
+            assert head == sign + full
+
+
+def test_iter_digits_concatenates_to_full_string():
+    converter = BaseConverter()
+    value = random.Random(1).getrandbits(100000)
+    for base in BASES:
+        assert "".join(converter.iter_digits(value, base, chunk=1000)) == format(value, FORMATS[base])
+
+
+def test_power_cache_stays_small():
+    converter = BaseConverter()
+    for digits in range(3000, 60000, 997):
+        converter.digit_count(10 ** digits, 10)
+    assert converter.pow10(12345) == 10 ** 12345
+    assert len(converter._pow5) <= 6
+
+
+def test_rejects_bad_digits():
+    converter = BaseConverter()
+    with pytest.raises(ValueError):
+        converter.to_int("12a", 10)
+    with pytest.raises(ValueError):
+        converter.to_int("", 16)
@@ -0,0 +1,80 @@
+"""BDD 的测试: 等价、满足赋值个数和最简式都与逐行枚举的真值表比较"""
+
+import itertools
+import random
+
+import pytest
+
+from bdd import BDD, FALSE, TRUE, BDDTooLarge, build_shared
+from logicgate import GateExpression, parse_gate_expression
+
+NAMES = ["a", "b", "c", "d", "e"]
+GATES = ["AND", "OR", "XOR", "NAND", "NOR", "XNOR"]
+
+
+def random_gate(rng, depth=3):
+    if depth == 0 or rng.random() < 0.25:
+        return rng.choice(NAMES + ["0", "1"] if rng.random() < 0.1 else NAMES)
+    if rng.random() < 0.2:
+        return f"NOT ({random_gate(rng, depth - 1)})"
+    return f"({random_gate(rng, depth - 1)} {rng.choice(GATES)} {random_gate(rng, depth - 1)})"
+
+
+def truth_table(text, names=NAMES):
+    """按 names 的全部赋值逐行求值，返回输出列"""
+    expr = GateExpression(text, width=1)
+    return tuple(expr.evaluate(dict(zip(names, bits)))
+                 for bits in itertools.product((0, 1), repeat=len(names)))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_expressions_match_truth_table(seed):
+    rng = random.Random(seed)
+    for _ in range(30):
+        f_text, g_text = random_gate(rng), random_gate(rng)
+        manager = BDD(NAMES)
+        f, g = (manager.build(parse_gate_expression(text)[0]) for text in (f_text, g_text))
+        f_table, g_table = truth_table(f_text), truth_table(g_text)
+
+        assert (f == g) == (f_table == g_table), (f_text, g_text)
+        assert manager.sat_count(f) == sum(f_table)
+
+        witness = manager.any_sat(f)
+        if witness is None:
+            assert not any(f_table)
+        else:
+            for name in NAMES:
+                witness.setdefault(name, 0)
+            assert GateExpression(f_text, width=1).evaluate(witness) == 1
+
+        cover = manager.format_cover(manager.isop(f))
+        assert truth_table(cover) == f_table, (f_text, cover)
+
+
+def test_equivalent_forms_share_a_root():
+    manager, (f, g) = build_shared(["NOT (a AND b)", "NOT a OR NOT b"])
+    assert f == g
+    manager, (f, g) = build_shared(["a XOR b XOR c", "(a XNOR b) XNOR c"])
+    assert f == g
+
+
+def test_terminals():
+    manager = BDD(["a"])
+    a = manager.var("a")
+    assert manager.conj(a, manager.negate(a)) == FALSE
+    assert manager.disj(a, manager.negate(a)) == TRUE
+    assert manager.sat_count(TRUE) == 2
+    assert manager.any_sat(FALSE) is None
+
+
+def test_many_inputs_stay_small():
+    # 40 个输入的奇偶校验: 真值表有 2**40 行，BDD 只有线性个节点
+    names = [f"x{i}" for i in range(40)]
+    manager, (f,) = build_shared([" XOR ".join(names)])
+    assert manager.size(f) == 2 * len(names) + 1
+    assert manager.sat_count(f) == 1 << 39
+
+
+def test_node_limit():
+    with pytest.raises(BDDTooLarge):
+        build_shared(["(a AND b) OR (c AND d) OR (e AND f)"], max_nodes=4)
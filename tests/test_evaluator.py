@@ -0,0 +1,100 @@
+"""表达式编译器的测试: 与 Python 直接求值比较，白名单拒绝不安全的语法，整数结果不丢精度"""
+
+import math
+import random
+
+import pytest
+
+from evaluator import ExpressionError, compile_expression
+from logic import CalculatorLogic, LargeIntResult
+
+OPERATORS = ["+", "-", "*", "/", "//", "%"]
+FUNCTIONS = ["sin", "cos", "asin", "sqrt", "exp", "abs"]
+
+
+def random_expression(rng, depth=3):
+    """由 x、y、小整数、白名单函数组成的随机表达式，重复的子式用来检查公共子表达式消除"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(["x", "y", str(rng.randint(1, 9)), "(x*y)"])
+    if rng.random() < 0.25:
+        return f"{rng.choice(FUNCTIONS)}({random_expression(rng, depth - 1)})"
+    left = random_expression(rng, depth - 1)
+    right = left if rng.random() < 0.2 else random_expression(rng, depth - 1)
+    return f"({left} {rng.choice(OPERATORS)} {right})"
+
+
+def python_value(text, x, y):
+    namespace = {name: getattr(math, name) for name in FUNCTIONS if name != "abs"}
+    namespace.update(abs=abs, x=x, y=y)
+    try:
+        return eval(text, {"__builtins__": {}}, namespace)
+    except (ArithmeticError, ValueError, TypeError) as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_expressions_match_python(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        text = random_expression(rng)
+        compiled = compile_expression(text, ["x", "y"])
+        for x, y in ((0.5, 2), (3, 7), (-0.25, 0.75)):
+            expected = python_value(text, x, y)
+            try:
+                actual = compiled(x, y)
+            except (ArithmeticError, ValueError, TypeError) as e:
+                actual = type(e)
+            if isinstance(expected, float) and isinstance(actual, float):
+                assert actual == pytest.approx(expected, rel=1e-12, nan_ok=True), text
+            else:
+                assert actual == expected, text
+
+
+def test_function_names_are_not_rewritten_inside_longer_names():
+    assert compile_expression("asin(x) + sin(x)")(0.5) == pytest.approx(math.asin(0.5) + math.sin(0.5))
+
+
+def test_common_subexpressions_are_computed_once():
+    compiled = compile_expression("sin(x) * sin(x) + sin(x)")
+    assert compiled.code_text.count("sin(") == 1
+    assert compiled(0.3) == pytest.approx(math.sin(0.3) ** 2 + math.sin(0.3))
+
+
+def test_constants_are_folded():
+    compiled = compile_expression("2**100 + 1")
+    assert compiled.is_constant
+    assert compiled() == 2 ** 100 + 1
+
+
+@pytest.mark.parametrize("text", [
+    "__import__('os')", "x.__class__", "open('f')", "[1, 2]", "lambda: 1", "(1).real", "x[0]",
+])
+def test_rejects_unsafe_syntax(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ExpressionError):
+        compile_expression("x + z", ["x"])
+
+
+def calculate(logic, text):
+    logic.expression = text
+    logic.handle_button_click("=")
+    return logic.result
+
+
+def test_integer_ans_is_exact_above_2_53():
+    logic = CalculatorLogic()
+    assert calculate(logic, "2**53 + 1") == "9007199254740993"
+    assert calculate(logic, "ans + 1") == "9007199254740994"
+
+
+def test_large_integer_result_is_a_preview_with_exact_ans():
+    logic = CalculatorLogic()
+    result = calculate(logic, "factorial(5000)")
+    assert isinstance(result, LargeIntResult)
+    assert result.value == math.factorial(5000)
+    assert "…" in result and "(16326位)" in result
+    assert calculate(logic, "ans % 1000003") == str(math.factorial(5000) % 1000003)
@@ -0,0 +1,63 @@
+"""FakeScreen 的写入规则要与 curses 一致: 折行、最后一格报错、hline 截断"""
+
+import curses
+
+import pytest
+
+from headless import FakeScreen
+
+
+def test_addstr_wraps_past_right_edge():
+    screen = FakeScreen(3, 5)
+    screen.addstr(0, 3, "abcdef")
+    assert screen.text() == ["   ab", "cdef", ""]
+    assert screen.cursor == (1, 4)
+
+
+def test_writing_the_last_cell_raises_after_drawing_it():
+    screen = FakeScreen(2, 4)
+    with pytest.raises(curses.error):
+        screen.addstr(1, 2, "xy")
+    assert screen.text()[1] == "  xy"
+    with pytest.raises(curses.error):
+        screen.addstr(1, 0, "123456")
+    assert screen.text() == ["", "1234"]
+
+
+def test_subwindow_wraps_inside_its_own_columns():
+    screen = FakeScreen(4, 10)
+    window = screen.derwin(2, 4, 1, 3)
+    with pytest.raises(curses.error):
+        window.addstr(0, 0, "abcdefghij")
+    assert screen.text() == ["", "   abcd", "   efgh", ""]
+
+
+def test_wide_character_that_does_not_fit_moves_to_next_line():
+    screen = FakeScreen(2, 5)
+    screen.addstr(0, 2, "a中文")
+    assert [ch for ch, _ in screen.cells[0]] == [" ", " ", "a", "中", ""]
+    assert screen.cells[1][:2] == [("文", 0), ("", 0)]
+
+
+def test_newline_clears_rest_of_line():
+    screen = FakeScreen(2, 5)
+    screen.addstr(0, 0, "xxxx")
+    screen.addstr(0, 1, "a\nb")
+    assert screen.text() == ["xa", "b"]
+
+
+def test_lines_and_border_truncate_without_error():
+    screen = FakeScreen(3, 4)
+    screen.hline(2, 1, "-", 10)
+    screen.vline(1, 3, "|", 10)
+    assert screen.text() == ["", "   |", " --|"]
+    screen.border()
+    assert screen.text() == ["┌──┐", "│  │", "└──┘"]
+
+
+def test_start_outside_window_raises():
+    screen = FakeScreen(2, 2)
+    with pytest.raises(curses.error):
+        screen.addstr(2, 0, "a")
+    with pytest.raises(curses.error):
+        screen.hline(0, 2, "-", 1)
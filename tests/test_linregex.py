@@ -0,0 +1,110 @@
+"""linregex 与 re 的差分测试: 随机生成支持子集内的模式，比较匹配区间和分组"""
+
+import random
+import re
+
+import pytest
+
+from linregex import PatternSet, UnsupportedPattern, compile_linear
+
+ALPHABET = "ab1 x"
+ATOMS = ["a", "b", "x", "1", " ", ".", r"\w", r"\W", r"\d", r"\s", "[ab]", "[^a ]", "[a-x]"]
+ASSERTS = ["^", "$", r"\b", r"\B", r"\A", r"\Z"]
+QUANTIFIERS = ["*", "+", "?", "*?", "+?", "??", "{2}", "{0,2}", "{1,3}?", "{2,}"]
+
+
+def random_pattern(rng, depth=2):
+    """支持子集内的随机模式，包括能匹配空串的循环体；规模要小，否则 re 自己会回溯到超时"""
+    items = []
+    for _ in range(rng.randint(1, 3)):
+        roll = rng.random()
+        if depth and roll < 0.3:
+            inner = "|".join(random_pattern(rng, depth - 1) for _ in range(rng.randint(1, 2)))
+            atom = rng.choice(["(", "(?:"]) + inner + ")"
+        elif roll < 0.4:
+            items.append(rng.choice(ASSERTS))
+            continue
+        elif roll < 0.45:
+            atom = "(?:)"
+        else:
+            atom = rng.choice(ATOMS)
+        if rng.random() < 0.5:
+            atom += rng.choice(QUANTIFIERS)
+        items.append(atom)
+    return "".join(items)
+
+
+def random_text(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 10)))
+
+
+def spans(matches):
+    return [(m.span(), m.groups()) for m in matches]
+
+
+def check(pattern, texts):
+    try:
+        linear = compile_linear(pattern)
+    except UnsupportedPattern:
+        return False
+    expected = re.compile(pattern)
+    for text in texts:
+        assert spans(linear.finditer(text)) == spans(expected.finditer(text)), (pattern, text)
+        m = linear.search(text)
+        e = expected.search(text)
+        assert (m and (m.span(), m.groups())) == (e and (e.span(), e.groups())), (pattern, text)
+        m = linear.match(text)
+        e = expected.match(text)
+        assert (m and m.span()) == (e and e.span()), (pattern, text)
+    assert linear.split("ab 1x ab") == expected.split("ab 1x ab"), pattern
+    assert linear.sub("-", "ab 1x ab") == expected.sub("-", "ab 1x ab"), pattern
+    return True
+
+
+@pytest.mark.parametrize("pattern, text", [
+    (r"(?:.??(?:b|)*\w?)*", "a11 acax"),
+    (r"(a*)*", "aab"),
+    (r"(|a)*", "aa"),
+    (r"(a|)+b", "aab"),
+    (r"(?:x|\b)*", "x yx"),
+    (r"(a?){2,4}", "aaaaa"),
+    (r"((a|)(b|))*", "abba"),
+])
+def test_empty_loop_bodies(pattern, text):
+    """循环体能匹配空串时，空迭代之后退出循环，与 re 一致"""
+    check(pattern, [text])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_patterns(seed):
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(50):
+        pattern = random_pattern(rng)
+        texts = [random_text(rng) for _ in range(5)] + ["", "ab 1x ab"]
+        checked += check(pattern, texts)
+    assert checked > 25  # 大部分随机模式在支持的子集内
+
+
+def test_bytes_patterns():
+    for pattern in [rb"\w+", rb"(a|b)*?b", rb"[^\s]+\b"]:
+        linear = compile_linear(pattern)
+        for text in [b"ab ba", b"", b"\xff\xfeab"]:
+            assert spans(linear.finditer(text)) == spans(re.finditer(pattern, text))
+
+
+def test_pattern_set_counts_match_ends():
+    """PatternSet 按匹配结束位置计数: 有非空匹配在此结束的位置数"""
+    patterns = ["a+", r"(a|)b", r"\bx", "1?1"]
+    text = "aab x11 ab a1x"
+    ps = PatternSet()
+    for pattern in patterns:
+        ps.add(pattern)
+    scanner = ps.scanner()
+    scanner.feed(text)
+    scanner.finish()
+    for pid, pattern in enumerate(patterns):
+        regex = re.compile(pattern)
+        ends = {end for end in range(1, len(text) + 1)
+                if any(regex.fullmatch(text, i, end) for i in range(end))}
+        assert scanner.counts[pid] == len(ends), pattern
@@ -0,0 +1,73 @@
+"""符号求导的测试: 导数值与已知的解析式比较，化简、共享节点和阶数上限"""
+
+import math
+
+import pytest
+
+from calculus import MAX_ORDER, evaluate_call
+from symbolic import CompiledTerm, derivative, display, node_count, parse, to_text
+
+# (表达式, 导函数)，都在 x = 0.3、0.7、1.9 处比较
+CASES = [
+    ("x**3", lambda x: 3 * x ** 2),
+    ("sin(x)*cos(x)", lambda x: math.cos(2 * x)),
+    ("tan(x)", lambda x: 1 / math.cos(x) ** 2),
+    ("sqrt(x)", lambda x: 0.5 / math.sqrt(x)),
+    ("log(x)", lambda x: 1 / (x * math.log(10))),  # 计算器中 log 为常用对数
+    ("ln(x)", lambda x: 1 / x),
+    ("exp(2*x)", lambda x: 2 * math.exp(2 * x)),
+    ("pow(x, 2.5)", lambda x: 2.5 * x ** 1.5),
+    ("x**x", lambda x: x ** x * (math.log(x) + 1)),
+    ("1/(1+x**2)", lambda x: -2 * x / (1 + x ** 2) ** 2),
+    ("exp(sin(x))/x", lambda x: math.exp(math.sin(x)) * (x * math.cos(x) - 1) / x ** 2),
+]
+
+
+def compiled_derivative(text, order=1):
+    return CompiledTerm(derivative(text, "x", order), ["x"])
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_first_derivative(text, expected):
+    d = compiled_derivative(text)
+    for x in (0.3, 0.7, 1.9):
+        assert d(x) == pytest.approx(expected(x), rel=1e-12)
+
+
+def test_derivative_text_compiles_to_the_same_values():
+    # 显示的式子可以重新解析，值与 DAG 直接编译的一致
+    for text, _ in CASES:
+        term = derivative(text, "x")
+        again = CompiledTerm(parse(to_text(term)), ["x"])
+        assert again(0.7) == pytest.approx(CompiledTerm(term, ["x"])(0.7), rel=1e-12)
+
+
+@pytest.mark.parametrize("order", [1, 2, 5, 10])
+def test_higher_orders(order):
+    # sin 的各阶导数循环，exp(2x) 的 n 阶导数是 2**n exp(2x)
+    x = 0.7
+    cycle = [math.sin, math.cos, lambda t: -math.sin(t), lambda t: -math.cos(t)]
+    assert compiled_derivative("sin(x)", order)(x) == pytest.approx(cycle[order % 4](x), abs=1e-12)
+    assert compiled_derivative("exp(2*x)", order)(x) == pytest.approx(2 ** order * math.exp(2 * x), rel=1e-12)
+
+
+def test_simplification():
+    assert display(derivative("x*x", "x")) == "2*x"
+    assert display(derivative("3*x + 5", "x")) == "3"
+    assert display(derivative("y*x", "x")) == "y"
+    assert display(derivative("sin(y)", "x")) == "0"
+
+
+def test_repeated_derivatives_share_nodes():
+    # 哈希共享使节点数多项式增长，数值与模块说明中的一致
+    text = "sin(x)*exp(x)/(1+x^2)"
+    counts = [node_count(derivative(text, "x", order)) for order in (5, 10)]
+    assert counts == [115, 467]
+
+
+def test_order_limit():
+    variables = {}
+    value, error, note = evaluate_call(f"∂(x**3, 2, {MAX_ORDER})dx", float, variables)
+    assert value == 0 and error is None
+    with pytest.raises(ValueError, match=f"最多为 {MAX_ORDER}"):
+        evaluate_call(f"∂(x**3, 2, {MAX_ORDER + 1})dx", float, variables)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+真值表模块 - 按位并行（bit-slicing）生成任意表达式的真值表
+
+N 个变量的真值表有 2^N 行。每个变量表示为一个 2^N 位的整数，
+第 r 位就是该变量在第 r 行的取值，表达式只需对这些整数求值一次，
+得到的整数的第 r 位即第 r 行的输出。
+表格内容按页取出，界面只格式化当前可见的几行。
+较长的输出表达式用 f1、f2 … 作列名，表头下方给出对照，输出列不会被撑宽。
+"""
+
+from functools import lru_cache
+
+from logicgate import GateSyntaxError, compile_gate, parse_gate_expression, variables
+
+MAX_VARIABLES = 24
+MAX_LABEL_WIDTH = 8  # 输出表达式不超过这个宽度时直接作列名
+
+# 表达式为空时显示的常用逻辑门对照表
+DEFAULT_EXPRESSION = "A AND B, A OR B, A XOR B, A NAND B, A NOR B, NOT A"
+
+
+@lru_cache(maxsize=2)
+def variable_patterns(n):
+    """n 个变量的位模式，第一个变量是行号的最高位
+
+    第 j 位的模式是 2^j 个0、2^j 个1 交替，先构造一个周期，再倍增铺满 2^n 位。
+    """
+    rows = 1 << n
+    patterns = []
+    for k in range(n):
+        half = 1 << (n - 1 - k)
+        pattern = ((1 << half) - 1) << half
+        period = 2 * half
+        while period < rows:
+            pattern |= pattern << period
+            period *= 2
+        patterns.append(pattern)
+    return tuple(patterns)
+
+
+def split_outputs(text):
+    """按最外层的逗号把多个输出表达式分开"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return parts
+
+
+class TruthTable:
+    """一个或多个表达式（以逗号分隔）共享变量的真值表"""
+
+    def __init__(self, text, max_variables=MAX_VARIABLES):
+        self.labels = split_outputs(text.strip() or DEFAULT_EXPRESSION)
+        self.names = [label if len(label) <= MAX_LABEL_WIDTH else f"f{i + 1}"
+                      for i, label in enumerate(self.labels)]
+        trees = []
+        for label in self.labels:
+            if not label:
+                raise GateSyntaxError("输出表达式为空")
+            tree, _, explicit = parse_gate_expression(label)
+            if explicit:
+                raise GateSyntaxError("真值表不支持 @位宽")
+            trees.append(tree)
+
+        self.variables = []
+        for tree in trees:
+            for name in variables(tree):
+                if name not in self.variables:
+                    self.variables.append(name)
+        n = len(self.variables)
+        if n > max_variables:
+            raise GateSyntaxError(f"变量太多: {n} 个，最多 {max_variables} 个")
+
+        self.rows = 1 << n
+        mask = (1 << self.rows) - 1
+        env = dict(zip(self.variables, variable_patterns(n)))
+        self.outputs = [compile_gate(tree, mask, broadcast=True)(env) for tree in trees]
+        self.top = 0  # 当前页第一行
+        self.page_size = 1  # 由界面在绘制时更新
+
+    def true_count(self, index=0):
+        """第 index 个输出为真的行数"""
+        return self.outputs[index].bit_count()
+
+    def summary(self):
+        """一行摘要，显示在结果区"""
+        counts = "/".join(str(out.bit_count()) for out in self.outputs)
+        return f"真值表: {len(self.variables)}个变量, {self.rows}行, 为真的行数 {counts}"
+
+    def header(self):
+        inputs = " ".join(self.variables)
+        return f"{inputs} | {'  '.join(self.names)}" if inputs else f"| {'  '.join(self.names)}"
+
+    def legend(self):
+        """缩写列名的对照，每个一行"""
+        return [f"{name} = {label}" for name, label in zip(self.names, self.labels) if name != label]
+
+    def page(self, start, count):
+        """格式化第 start 行起的 count 行；每个输出只做一次移位取出整页"""
+        start = max(0, min(start, self.rows - 1))
+        count = max(0, min(count, self.rows - start))
+        window = (1 << count) - 1
+        chunks = [(out >> start) & window for out in self.outputs]
+        n = len(self.variables)
+        widths = [len(name) for name in self.variables]
+        lines = []
+        for i in range(count):
+            r = start + i
+            bits = " ".join(bit.rjust(w) for bit, w in zip(format(r, f"0{n}b"), widths))
+            cells = "  ".join(str((chunk >> i) & 1).center(len(name))
+                              for chunk, name in zip(chunks, self.names))
+            lines.append(f"{bits} | {cells}" if n else f"| {cells}")
+        return lines
+
+    def scroll(self, delta):
+        self.top = max(0, min(self.top + delta, self.rows - 1))
+
+    def scroll_to(self, row):
+        self.top = max(0, min(row, self.rows - 1))
+
+    def next_true(self, forward=True):
+        """跳到下一/上一个第一个输出为真的行，没有则不动"""
+        out = self.outputs[0]
+        if forward:
+            rest = out >> (self.top + 1)
+            if rest:
+                self.top += 1 + ((rest & -rest).bit_length() - 1)
+        else:
+            rest = out & ((1 << self.top) - 1)
+            if rest:
+                self.top = rest.bit_length() - 1
+
+    def info(self):
+        end = min(self.rows, self.top + self.page_size)
+        return f"第 {self.top}-{end - 1} 行 / 共 {self.rows} 行"
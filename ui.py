@@ -6,7 +6,23 @@ UI模块 - 处理计算器界面绘制
 """
 
 import curses
+import time
+import unicodedata
+import modes
 from style import CalculatorStyle
+from editor import Viewport
+
+
+def text_key(text):
+    """表达式的变化标识: 编辑缓冲区用版本号，字符串用自身"""
+    version = getattr(text, "version", None)
+    return text if version is None else (id(text), version)
+
+
+def text_width(text):
+    """字符串在终端中占的列数，全角字符占两列"""
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
 
 class CalculatorUI:
     def __init__(self, stdscr):
@@ -14,76 +30,149 @@ class CalculatorUI:
         self.style = CalculatorStyle()
         self.selected_row = 0
         self.selected_col = 0
+        self.windows = {}  # 各面板的子窗口
+        self.geometry = None  # 创建子窗口时的 (高, 宽, 按钮行数)
+        self.panel_state = {}  # 各面板上次绘制时的输入，用于判断是否需要重绘
+        self.viewport = Viewport()  # 表达式的水平滚动视口
+        self.panel_hits = 0  # 输入未变、跳过重绘的面板次数
+        self.panel_misses = 0
+        self.flush_time = 0.0  # 上一帧 doupdate 的耗时，秒
+        self.perf_line = None  # 性能行，不为 None 时代替状态栏的按键提示
         
         # 初始化颜色
         curses.start_color()
         curses.use_default_colors()
         for i, color in enumerate(self.style.colors.values(), 1):
             curses.init_pair(i, color, -1)
-        
-        # 定义按钮布局
-        self.buttons = [
-            ["7", "8", "9", "/", "sin(", "cos("],
-            ["4", "5", "6", "*", "tan(", "sqrt("],
-            ["1", "2", "3", "-", "log(", "exp("],
-            ["0", ".", "π", "+", "(", ")"],
-            ["=", "C", "Del", "Ans", "Help", "Quit"]
-        ]
-        
-        # 编程按钮布局
-        self.codingbuttons = [
-            ["0", "1"],
-            ["/", " * "],
-            ["-", "+"],
-            ["=",]
-        ]
 
-        # 逻辑门按钮布局
-        self.logic_gate_buttons = [
-            ["AND", "OR", "NOT", "XOR", "NAND", "NOR"],
-            ["Truth", "Table", "Show", "0", "1", "Calc"],
-            ["7", "8", "9", " / ", "sin(", "cos("],
-            ["4", "5", "6", " * ", "tan(", "sqrt("],
-            ["1", "2", "3", " - ", "log(", "exp("],
-            ["0", ".", "π", " + ", "(", ")"],
-            ["=", "C", "Del", "Ans", "Help", "Quit"]
-        ]
+    def get_buttons(self, mode):
+        """模式的按钮布局，与逻辑共用 modes 中的定义"""
+        return modes.buttons(mode)
 
-        # 进制换算按钮布局
-        self.base_conversion_buttons = [
-            ["BIN", "OCT", "DEC", "HEX", "CONV", "SWAP"],
-            ["7", "8", "9", "A", "B", "C"],
-            ["4", "5", "6", "D", "E", "F"],
-            ["1", "2", "3", "CLR", "Help", "Quit"],
-            ["0", ".", "=", "Ans", "Mode", "Back"]
-        ]
+    def invalidate(self):
+        """标记所有面板需要重绘"""
+        self.panel_state = {}
 
-        # 正则表达式按钮布局
-        self.regex_buttons = [
-            ["match", "search", "findall", "sub", "split", "compile"],
-            ["^", "$", "*", "+", "?", "."],
-            ["[", "]", "(", ")", "{", "}"],
-            ["|", "\\", "w", "d", "s", "b"],
-            ["CLR", "Test", "=", "Ans", "Help", "Quit"]
-        ]
-        
-    def draw(self, expression, result, history, selected_row, selected_col, cursor_pos, show_help, mode):
-        """绘制整个界面"""
-        self.stdscr.clear()
+    def build_windows(self, height, width, button_rows):
+        """按当前终端大小和按钮行数创建各面板的子窗口"""
+        buttons_height = button_rows * 2 + 1
+        history_start_y = 8 + buttons_height + 1
+        history_height = height - history_start_y - 2
+        self.windows = {
+            'display': self.stdscr.derwin(6, width - 2, 1, 1),
+            'buttons': self.stdscr.derwin(min(buttons_height, height - 9), width - 2, 8, 1),
+            'plot': self.stdscr.derwin(height - 9, width - 2, 8, 1),
+            'status': self.stdscr.derwin(1, width - 2, height - 1, 1),
+        }
+        if height >= 25 and history_height >= 3:
+            self.windows['history'] = self.stdscr.derwin(history_height, width - 2, history_start_y, 1)
+        self.geometry = (height, width, button_rows)
+        self.invalidate()
+
+    def panel_changed(self, name, key):
+        """面板输入是否变化，变化时记录新的输入"""
+        if self.panel_state.get(name) == key:
+            self.panel_hits += 1
+            return False
+        self.panel_state[name] = key
+        self.panel_misses += 1
+        return True
+
+    def panel_hit_rate(self):
+        total = self.panel_hits + self.panel_misses
+        return self.panel_hits / total if total else 0.0
+
+    def flush(self):
+        """把各窗口的改动写到终端，记录耗时（远程终端慢时主要慢在这里）"""
+        start = time.perf_counter()
+        curses.doupdate()
+        self.flush_time = time.perf_counter() - start
+
+    def draw(self, expression, result, history, selected_row, selected_col, cursor_pos, show_help, mode, plot=None, table=None, search=None):
+        """差量绘制界面: 只重绘输入发生变化的面板"""
+        prev_selected = (self.selected_row, self.selected_col)
         self.selected_row = selected_row
         self.selected_col = selected_col
-        
-        if not self.draw_border():
+        height, width = self.stdscr.getmaxyx()
+        self.flush_time = 0.0
+
+        # 检查窗口大小是否足够
+        if height < 20 or width < 60:
+            self.draw_border()
+            self.geometry = None
             return
-            
+
+        buttons = self.get_buttons(mode)
+        if self.geometry != (height, width, len(buttons)):
+            self.build_windows(height, width, len(buttons))
+
         if show_help:
-            self.draw_help()
+            if self.panel_changed('frame', 'help'):
+                self.stdscr.erase()
+                self.draw_border()
+                self.draw_help()
+                self.stdscr.noutrefresh()
+                self.flush()
+                self.panel_state = {'frame': 'help'}
+            return
+
+        if self.panel_changed('frame', (height, width)):
+            # 子窗口与stdscr共享内存，擦除边框层后所有面板都需要重绘
+            self.stdscr.erase()
+            self.draw_border()
+            self.stdscr.noutrefresh()
+            self.panel_state = {'frame': (height, width)}
+
+        if self.panel_changed('status', self.status_text()):
+            self.draw_status()
+            self.windows['status'].noutrefresh()
+
+        search_key = None
+        if search is not None:
+            search_key = (search.query, search.selected, id(search.results), search.partial)
+        if self.panel_changed('display', (text_key(expression), result, cursor_pos, mode, search_key)):
+            self.draw_display(expression, result, cursor_pos, mode, search)
+            self.windows['display'].noutrefresh()
+
+        if plot is not None:
+            self.panel_state.pop('buttons', None)
+            self.panel_state.pop('history', None)
+            if self.panel_changed('plot', (id(plot), plot.x_min, plot.x_max, plot.y_min, plot.y_max)):
+                self.draw_plot(plot)
+                # 首次渲染会自动确定y范围，记录渲染后的视口
+                self.panel_state['plot'] = (id(plot), plot.x_min, plot.x_max, plot.y_min, plot.y_max)
+                self.windows['plot'].noutrefresh()
+        elif table is not None:
+            # 真值表与绘图共用按钮区域
+            self.panel_state.pop('buttons', None)
+            self.panel_state.pop('history', None)
+            if self.panel_changed('plot', (id(table), table.top)):
+                self.draw_table(table)
+                self.windows['plot'].noutrefresh()
         else:
-            self.draw_display(expression, result, cursor_pos, mode)
-            self.draw_buttons(mode)
-            self.draw_history(history)
-        
-        self.stdscr.refresh()
+            if self.panel_state.pop('plot', None) is not None:
+                self.windows['plot'].erase()
+                self.windows['plot'].noutrefresh()
+            if self.panel_changed('buttons', (mode, id(buttons))):
+                self.draw_buttons(mode)
+                self.windows['buttons'].noutrefresh()
+            elif prev_selected != (selected_row, selected_col):
+                # 只有选中项变化: 重绘原来和现在选中的两个按钮
+                for i, j in self.buttons_to_repaint(buttons, [prev_selected, (selected_row, selected_col)]):
+                    self.draw_button(buttons, i, j)
+                self.windows['buttons'].noutrefresh()
+            if 'history' in self.windows:
+                if self.panel_changed('history', (id(history), history.version, search_key)):
+                    self.draw_history(history, search)
+                    self.windows['history'].noutrefresh()
+
+        # 最后刷新显示区，让终端光标停在表达式上（搜索时停在查询末尾）
+        if search is not None:
+            self.place_search_cursor(search)
+        else:
+            self.place_cursor(expression, cursor_pos)
+        self.windows['display'].noutrefresh()
+        self.flush()
     
     def draw_border(self):
         """绘制边框"""
@@ -91,9 +180,10 @@ class CalculatorUI:
         
         # 检查窗口大小是否足够
         if height < 20 or width < 60:
-            self.stdscr.clear()
-            self.stdscr.addstr(0, 0, "窗口太小，请调整终端大小")
-            self.stdscr.refresh()
+            if self.panel_changed('frame', 'too_small'):
+                self.stdscr.clear()
+                self.stdscr.addstr(0, 0, "窗口太小，请调整终端大小")
+                self.stdscr.refresh()
             return False
             
         # 绘制外边框
@@ -108,174 +198,317 @@ class CalculatorUI:
         self.stdscr.addstr(0, title_x, title)
         self.stdscr.attroff(curses.color_pair(self.style.color_pairs['title']) | curses.A_BOLD)
         
-        # 绘制底部状态栏
-        status = "| 按 'h' 显示帮助 | 按 'q' 退出 | 按 'j' 切换模式 | "
-        status_x = max(1, (width - len(status)) // 2)
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['border']))
-        self.stdscr.addstr(height-1, status_x, status)
-        self.stdscr.attroff(curses.color_pair(self.style.color_pairs['border']))
-        
         return True
+
+    def status_text(self):
+        """底部状态栏文字；打开性能行时显示性能行"""
+        if self.perf_line is not None:
+            return self.perf_line
+        return "| 按 'h' 显示帮助 | 按 'q' 退出 | 按 'j' 切换模式 | "
+
+    def draw_status(self):
+        """绘制底部状态栏"""
+        win = self.windows['status']
+        width = win.getmaxyx()[1]
+        status = self.status_text()
+        status_x = max(0, (width + 2 - len(status)) // 2 - 1)
+        if self.perf_line is not None:
+            # 性能行几乎占满一行，按显示宽度居中，放不下时截掉末尾
+            while text_width(status) > width - 2:
+                status = status[:-1]
+            status_x = max(0, (width - text_width(status)) // 2)
+        win.erase()
+        win.attron(curses.color_pair(self.style.color_pairs['border']))
+        win.hline(0, 0, curses.ACS_HLINE, width)
+        try:
+            win.addstr(0, status_x, status[:width - status_x - 1])
+        except:
+            pass
+        win.attroff(curses.color_pair(self.style.color_pairs['border']))
     
-    def draw_display(self, expression, result, cursor_pos, mode):
+    def draw_display(self, expression, result, cursor_pos, mode, search=None):
         """绘制显示区域"""
-        height, width = self.stdscr.getmaxyx()
-        
-        # 检查窗口大小是否足够
-        if height < 20 or width < 60:
-            return
+        win = self.windows['display']
+        win.erase()
+        width = win.getmaxyx()[1] + 2  # 按整屏宽度计算，坐标相对子窗口偏移1
             
         # 绘制模式指示器
         mode_text = f"模式: {mode}"
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['title']))
-        self.stdscr.addstr(1, 2, mode_text)
-        self.stdscr.attroff(curses.color_pair(self.style.color_pairs['title']))
+        win.attron(curses.color_pair(self.style.color_pairs['title']))
+        win.addstr(0, 1, mode_text)
+        win.attroff(curses.color_pair(self.style.color_pairs['title']))
 
         # 为不同模式显示特殊提示
-        if mode == "逻辑门":
-            hint = "提示: 输入二进制数字，如 101 AND 110"
-            self.stdscr.attron(curses.color_pair(self.style.color_pairs['expression']))
-            self.stdscr.addstr(1, width - len(hint) - 2, hint)
-            self.stdscr.attroff(curses.color_pair(self.style.color_pairs['expression']))
-        elif mode == "进制换算":
-            hint = "提示: 格式如 16:FF 或 DEC:255"
-            self.stdscr.attron(curses.color_pair(self.style.color_pairs['expression']))
-            self.stdscr.addstr(1, width - len(hint) - 2, hint)
-            self.stdscr.attroff(curses.color_pair(self.style.color_pairs['expression']))
-        elif mode == "正则表达式":
-            hint = "提示: 格式如 pattern,text"
-            self.stdscr.attron(curses.color_pair(self.style.color_pairs['expression']))
-            self.stdscr.addstr(1, width - len(hint) - 2, hint)
-            self.stdscr.attroff(curses.color_pair(self.style.color_pairs['expression']))
+        hint = modes.get(mode).hint
+        if hint:
+            win.attron(curses.color_pair(self.style.color_pairs['expression']))
+            win.addstr(0, max(len(mode_text) * 2 + 2, width - text_width(hint) - 4), hint)
+            win.attroff(curses.color_pair(self.style.color_pairs['expression']))
         
         # 绘制显示区域边框
         display_height = 4
         display_width = width - 6
         
+        win.attron(curses.color_pair(self.style.color_pairs['border']))
         # 上边框
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['border']))
-        self.stdscr.addch(2, 2, curses.ACS_ULCORNER)
-        self.stdscr.addch(2, min(width-3, width-1), curses.ACS_URCORNER)
-        for x in range(3, min(width-3, width)):
-            self.stdscr.addch(2, x, curses.ACS_HLINE)
+        win.addch(1, 1, curses.ACS_ULCORNER)
+        win.addch(1, width - 4, curses.ACS_URCORNER)
+        win.hline(1, 2, curses.ACS_HLINE, width - 6)
         
         # 下边框
-        self.stdscr.addch(2+display_height, 2, curses.ACS_LLCORNER)
-        self.stdscr.addch(2+display_height, min(width-3, width-1), curses.ACS_LRCORNER)
-        for x in range(3, min(width-3, width)):
-            self.stdscr.addch(2+display_height, x, curses.ACS_HLINE)
+        win.addch(1 + display_height, 1, curses.ACS_LLCORNER)
+        win.addch(1 + display_height, width - 4, curses.ACS_LRCORNER)
+        win.hline(1 + display_height, 2, curses.ACS_HLINE, width - 6)
         
         # 侧边框
-        for y in range(3, min(2+display_height, height)):
-            self.stdscr.addch(y, 2, curses.ACS_VLINE)
-            self.stdscr.addch(y, min(width-3, width-1), curses.ACS_VLINE)
-        
-        # 表达式显示
-        expr_display = expression[:display_width-10]  # 保留一些空间给"表达式: "前缀
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['expression']))
-        self.stdscr.addstr(3, 3, "表达式: " + expr_display)
-        
-        # 光标位置
-        if cursor_pos < len(expr_display):
-            cursor_x = 3 + 8 + min(cursor_pos, width-12)
-            if cursor_x < width - 4:
-                try:
-                    self.stdscr.move(3, cursor_x)
-                except:
-                    pass
+        win.vline(2, 1, curses.ACS_VLINE, display_height - 1)
+        win.vline(2, width - 4, curses.ACS_VLINE, display_height - 1)
+        win.attroff(curses.color_pair(self.style.color_pairs['border']))
+        
+        # 表达式显示: 只取视口内可见的一段，保证光标可见
+        visible = display_width - 10  # 保留一些空间给"表达式: "前缀
+        start, end = self.viewport.scroll_to(cursor_pos, len(expression), visible)
+        expr_display = expression[start:end]
+        if start > 0:
+            expr_display = "<" + expr_display[1:]
+        if end < len(expression):
+            expr_display = expr_display[:-1] + ">"
+        win.attron(curses.color_pair(self.style.color_pairs['expression']))
+        win.addstr(2, 2, "表达式: " + expr_display)
+        win.attroff(curses.color_pair(self.style.color_pairs['expression']))
         
         # 结果显示
         result_display = result[:display_width-8]  # 保留一些空间给"结果: "前缀
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['result']))
-        self.stdscr.addstr(4, 3, "结果:   " + result_display)
-        self.stdscr.attroff(curses.color_pair(self.style.color_pairs['result']))
+        win.attron(curses.color_pair(self.style.color_pairs['result']))
+        win.addstr(3, 2, "结果:   " + result_display)
+        win.attroff(curses.color_pair(self.style.color_pairs['result']))
+
+        # Ctrl-R 历史搜索的提示行
+        if search is not None:
+            current = search.current()
+            prompt = self.search_prompt(search) + (current.expression if current is not None else "")
+            win.attron(curses.color_pair(self.style.color_pairs['history']))
+            try:
+                win.addstr(4, 2, prompt[:display_width - 2])
+            except:
+                pass
+            win.attroff(curses.color_pair(self.style.color_pairs['history']))
+
+    def search_prompt(self, search):
+        state = "failing " if search.query and not search.results else ""
+        return f"({state}reverse-i-search)`{search.query}': "
+
+    def place_cursor(self, expression, cursor_pos):
+        """把光标移动到表达式中的插入位置"""
+        win = self.windows['display']
+        width = win.getmaxyx()[1] + 2
+        cursor_x = 2 + 8 + cursor_pos - self.viewport.offset
+        if cursor_x < width - 5:
+            try:
+                win.move(2, cursor_x)
+            except:
+                pass
+
+    def place_search_cursor(self, search):
+        """把光标移动到搜索提示行的查询末尾"""
+        win = self.windows['display']
+        width = win.getmaxyx()[1] + 2
+        cursor_x = 2 + text_width(self.search_prompt(search)) - 3
+        if cursor_x < width - 5:
+            try:
+                win.move(4, cursor_x)
+            except:
+                pass
+
+    def button_origin(self, row, i, j):
+        """按钮 (i, j) 在按钮子窗口中的左上角坐标"""
+        width = self.windows['buttons'].getmaxyx()[1] + 2
+        start_x = max(2, (width - (len(row) * 8 - 1)) // 2)
+        return i * 2, start_x + j * 8 - 1
+
+    def button_rect(self, buttons, i, j):
+        """按钮 (i, j) 占据的区域 (y0, x0, y1, x1)，坐标含端点"""
+        y, x = self.button_origin(buttons[i], i, j)
+        return y, x, y + 2, x + len(buttons[i][j]) + 3
+
+    def buttons_to_repaint(self, buttons, changed):
+        """按绘制顺序返回需要重绘的按钮
+
+        按钮框上下相邻时会互相覆盖一行，重绘某个按钮后，
+        绘制顺序在它之后且与它重叠的按钮也要重绘，才能和整体重绘的结果一致。
+        """
+        changed = {(i, j) for i, j in changed
+                   if 0 <= i < len(buttons) and 0 <= j < len(buttons[i])}
+        if not changed:
+            return []
+        result = []
+        rects = []
+        for i in range(min(changed)[0], len(buttons)):
+            for j in range(len(buttons[i])):
+                y0, x0, y1, x1 = rect = self.button_rect(buttons, i, j)
+                if (i, j) in changed or any(
+                        y0 <= ry1 and ry0 <= y1 and x0 <= rx1 and rx0 <= x1
+                        for ry0, rx0, ry1, rx1 in rects):
+                    result.append((i, j))
+                    rects.append(rect)
+        return result
+
+    def draw_button(self, buttons, i, j):
+        """绘制单个按钮"""
+        if not (0 <= i < len(buttons) and 0 <= j < len(buttons[i])):
+            return
+        win = self.windows['buttons']
+        win_height, win_width = win.getmaxyx()
+        y, btn_x = self.button_origin(buttons[i], i, j)
+        btn_text = f" {buttons[i][j]} "
+
+        # 检查按钮是否在屏幕内
+        if btn_x + 1 + len(btn_text) + 2 >= win_width + 2 or y + 2 >= win_height:
+            return
+
+        if i == self.selected_row and j == self.selected_col:
+            # 选中的按钮
+            attr = curses.color_pair(self.style.color_pairs['selected']) | curses.A_REVERSE
+        else:
+            # 未选中的按钮
+            attr = curses.color_pair(self.style.color_pairs['button'])
+        win.attron(attr)
+        try:
+            win.addstr(y, btn_x, "╭" + "─"*(len(btn_text)) + "╮")
+            win.addstr(y + 1, btn_x, "│" + btn_text + "│")
+            win.addstr(y + 2, btn_x, "╰" + "─"*(len(btn_text)) + "╯")
+        except:
+            pass
+        win.attroff(attr)
     
     def draw_buttons(self, mode):
         """绘制按钮"""
-        height, width = self.stdscr.getmaxyx()
-        
-        # 检查窗口大小是否足够
-        if height < 20 or width < 60:
-            return
-            
-        
-        # 根据模式选择按钮布局
-        if mode == "编程":
-            buttons = self.codingbuttons
-        elif mode == "逻辑门":
-            buttons = self.logic_gate_buttons
-        elif mode == "进制换算":
-            buttons = self.base_conversion_buttons
-        elif mode == "正则表达式":
-            buttons = self.regex_buttons
-        else:
-            buttons = self.buttons
-        start_y = 8
-        
+        buttons = self.get_buttons(mode)
+        self.windows['buttons'].erase()
         for i, row in enumerate(buttons):
-            start_x = max(2, (width - (len(row) * 8 - 1)) // 2)
-            for j, button in enumerate(row):
-                # 绘制按钮边框
-                btn_x = start_x + j * 8
-                btn_text = f" {button} "
-                
-                # 检查按钮是否在屏幕内
-                if btn_x + len(btn_text) + 2 >= width or start_y + i*2 + 2 >= height:
-                    continue
-                
-                if i == self.selected_row and j == self.selected_col:
-                    # 选中的按钮
-                    self.stdscr.attron(curses.color_pair(self.style.color_pairs['selected']) | curses.A_REVERSE)
-                    try:
-                        self.stdscr.addstr(start_y + i*2, btn_x, "╭" + "─"*(len(btn_text)) + "╮")
-                        self.stdscr.addstr(start_y + i*2 + 1, btn_x, "│" + btn_text + "│")
-                        self.stdscr.addstr(start_y + i*2 + 2, btn_x, "╰" + "─"*(len(btn_text)) + "╯")
-                    except:
-                        pass
-                    self.stdscr.attroff(curses.color_pair(self.style.color_pairs['selected']) | curses.A_REVERSE)
-                else:
-                    # 未选中的按钮
-                    self.stdscr.attron(curses.color_pair(self.style.color_pairs['button']))
-                    try:
-                        self.stdscr.addstr(start_y + i*2, btn_x, "╭" + "─"*(len(btn_text)) + "╮")
-                        self.stdscr.addstr(start_y + i*2 + 1, btn_x, "│" + btn_text + "│")
-                        self.stdscr.addstr(start_y + i*2 + 2, btn_x, "╰" + "─"*(len(btn_text)) + "╯")
-                    except:
-                        pass
-                    self.stdscr.attroff(curses.color_pair(self.style.color_pairs['button']))
+            for j in range(len(row)):
+                self.draw_button(buttons, i, j)
+
+    def draw_plot(self, plot):
+        """把离屏渲染好的函数图像贴到按钮区域"""
+        win = self.windows['plot']
+        win.erase()
+        win_height, win_width = win.getmaxyx()
+        rows = win_height - 2
+        cols = win_width - 4
+        try:
+            lines = plot.render(cols, rows)
+        except Exception as e:
+            lines = [f"绘图错误: {e}"]
+
+        win.attron(curses.color_pair(self.style.color_pairs['expression']))
+        for i, line in enumerate(lines):
+            try:
+                win.addstr(i, 2, line)
+            except:
+                pass
+        win.attroff(curses.color_pair(self.style.color_pairs['expression']))
+
+        # 视口信息和操作提示
+        info = f"{plot.info()} | 方向键平移 +/- 缩放 r 重新缩放 其他键返回"
+        win.attron(curses.color_pair(self.style.color_pairs['history']))
+        try:
+            win.addstr(win_height - 1, 2, info[:win_width - 4])
+        except:
+            pass
+        win.attroff(curses.color_pair(self.style.color_pairs['history']))
     
-    def draw_history(self, history):
-        """绘制历史记录"""
-        height, width = self.stdscr.getmaxyx()
-        
-        # 检查窗口大小是否足够
-        if height < 25 or width < 60:
+    def draw_table(self, table):
+        """绘制真值表的当前页，只格式化可见的行"""
+        win = self.windows['plot']
+        win.erase()
+        win_height, win_width = win.getmaxyx()
+        # 缩写列名的对照放在表头下方，至少给表格留一行
+        legend = table.legend()[:max(0, win_height - 3)]
+        table.page_size = max(1, win_height - 2 - len(legend))
+
+        win.attron(curses.color_pair(self.style.color_pairs['title']) | curses.A_BOLD)
+        try:
+            win.addstr(0, 2, table.header()[:win_width - 4])
+        except:
+            pass
+        win.attroff(curses.color_pair(self.style.color_pairs['title']) | curses.A_BOLD)
+
+        win.attron(curses.color_pair(self.style.color_pairs['history']))
+        for i, line in enumerate(legend):
+            try:
+                win.addstr(i + 1, 2, line[:win_width - 4])
+            except:
+                pass
+        win.attroff(curses.color_pair(self.style.color_pairs['history']))
+
+        win.attron(curses.color_pair(self.style.color_pairs['expression']))
+        for i, line in enumerate(table.page(table.top, table.page_size)):
+            try:
+                win.addstr(i + 1 + len(legend), 2, line[:win_width - 4])
+            except:
+                pass
+        win.attroff(curses.color_pair(self.style.color_pairs['expression']))
+
+        info = f"{table.info()} | 上下键/PgUp/PgDn 翻页 n/p 下/上一个真值行 其他键返回"
+        win.attron(curses.color_pair(self.style.color_pairs['history']))
+        try:
+            win.addstr(win_height - 1, 2, info[:win_width - 4])
+        except:
+            pass
+        win.attroff(curses.color_pair(self.style.color_pairs['history']))
+
+    def draw_history(self, history, search=None):
+        """绘制历史记录: 只格式化滚动位置上可见的几条，PgUp/PgDn 翻页；搜索时改为列出搜索结果"""
+        win = self.windows['history']
+        win.erase()
+        history_height, win_width = win.getmaxyx()
+        width = win_width + 2
+        history.page_size = max(1, history_height - 1)
+        if search is not None:
+            self.draw_search_results(search)
             return
-            
-        # 绘制历史记录区域
-        history_start_y = 8 + len(self.buttons) * 2 + 2
-        history_height = height - history_start_y - 2
-        
-        if history_height < 3:
-            return  # 没有足够的空间显示历史记录
         
         # 历史记录标题
-        title = "历史记录"
-        self.stdscr.attron(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
+        title = f"历史记录 ({history.info()})"
+        win.attron(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
         try:
-            self.stdscr.addstr(history_start_y, 4, title)
+            win.addstr(0, 3, title)
         except:
             pass
-        self.stdscr.attroff(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
+        win.attroff(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
         
         # 历史记录内容
-        for i, item in enumerate(history[-history_height+1:]):
-            if i < history_height - 1:
-                try:
-                    self.stdscr.addstr(history_start_y + i + 1, 4, item[:width-8])
-                except:
-                    pass
+        for i, item in enumerate(history.visible(history_height - 1)):
+            try:
+                win.addstr(i + 1, 3, str(item)[:width-8])
+            except:
+                pass
     
+    def draw_search_results(self, search):
+        """列出搜索结果（最新的在上），选中项反色显示"""
+        win = self.windows['history']
+        history_height, win_width = win.getmaxyx()
+        width = win_width + 2
+        rows = max(1, history_height - 1)
+
+        note = "，索引建立中，仅搜索最近记录" if search.partial else ""
+        title = f"搜索历史 ({len(search.results)} 条{note})"
+        win.attron(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
+        try:
+            win.addstr(0, 3, title)
+        except:
+            pass
+        win.attroff(curses.color_pair(self.style.color_pairs['history']) | curses.A_BOLD)
+
+        top = max(0, search.selected - rows + 1)
+        for i, item in enumerate(search.results[top:top + rows]):
+            attr = curses.A_REVERSE if top + i == search.selected else 0
+            try:
+                win.addstr(i + 1, 3, str(item)[:width-8], attr)
+            except:
+                pass
+
     def draw_help(self):
         """绘制帮助信息"""
         height, width = self.stdscr.getmaxyx()
@@ -330,15 +563,20 @@ class CalculatorUI:
             "数字键: 直接输入数字",
             "运算符: 直接输入 + - * /",
             "退格键: 删除上一个字符",
+            "Esc: 取消正在进行的计算",
+            "PgUp/PgDn: 翻看历史记录",
+            "Ctrl-R: 搜索历史记录 (回车插入, Esc 退出)",
+            "Ctrl-P: 在状态栏显示/隐藏性能数据",
             "h: 显示/隐藏帮助",
-            "j: 切换计算模式 (标准/编程/逻辑门/正则表达式/进制换算)",
+            "j: 切换计算模式 (标准/编程/逻辑门/正则表达式/进制换算/求解)",
             "q: 退出计算器",
             "--------------------------------",
             "标准模式: 基本数学运算和函数",
             "编程模式: 简单的编程计算",
             "逻辑门模式: 二进制逻辑运算 (AND/OR/NOT/XOR/NAND/NOR)",
-            "正则表达式模式: 正则表达式测试",
+            "正则表达式模式: 正则表达式测试 (engine auto/linear/re 切换引擎)",
             "进制换算模式: 2/8/10/16进制转换",
+            "求解模式: 区间内的全部实根, 分号分隔的方程组",
             "--------------------------------",
             "Nekosparry浪费了114514秒打造",
             "--------------------------------"
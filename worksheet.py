@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工作表模块 - 变量赋值和按依赖关系增量重算
+
+每个变量是一个单元格: 公式文本、编译好的表达式、当前值（或错误）。
+公式中引用的变量构成依赖图，修改一个单元格时只重算依赖它的单元格，
+按拓扑顺序计算；某个单元格重算后值没有变化时，它的下游不再重算。
+公式只在文本变化时重新编译。
+
+界面进程中赋值和删除交给工作进程执行（9**9**9 这类公式的编译和求值不能卡住界面）:
+extract 取出受影响的单元格（目标及其全部下游），工作进程用 restore 重建这部分工作表并执行命令，
+界面再用 update 合并回来。传回的单元格不带编译结果，下次需要求值时才重新编译。
+"""
+
+import re
+
+from evaluator import CONSTANTS, FUNCTIONS, ExpressionError, compile_expression
+
+# name = 公式，排除 ==
+_ASSIGN_RE = re.compile(r"\s*([^\W\d]\w*)\s*=(?!=)(.*)", re.DOTALL)
+
+RESERVED = frozenset({"ans"})  # 由计算器自己维护的名字
+
+
+def parse_assignment(text):
+    """'x = 公式' 返回 (x, 公式)，不是赋值时返回 None"""
+    m = _ASSIGN_RE.fullmatch(text)
+    if m is None:
+        return None
+    return m.group(1), m.group(2).strip()
+
+
+def _state(cell):
+    """比较重算前后用的状态；带上类型，1 变成 1.0 也算变化"""
+    return type(cell.value), cell.value, cell.error
+
+
+class Cell:
+    """一个单元格: 公式、编译结果、依赖的变量、当前值或错误
+
+    compiled 为 None 时 deps 必须给出，第一次求值时再编译。
+    """
+
+    __slots__ = ("name", "source", "compiled", "deps", "value", "error")
+
+    def __init__(self, name, source, compiled, deps=None):
+        self.name = name
+        self.source = source
+        self.compiled = compiled
+        self.deps = tuple(compiled.params if compiled is not None else deps)
+        self.value = None
+        self.error = None
+
+    def state(self):
+        """可以在进程间传递的 (名字, 公式, 依赖, 值, 错误)"""
+        return self.name, self.source, self.deps, self.value, self.error
+
+    @classmethod
+    def from_state(cls, state, compiled=None):
+        name, source, deps, value, error = state
+        cell = cls(name, source, compiled, deps)
+        cell.value = value
+        cell.error = error
+        return cell
+
+    def display(self, fmt=str):
+        return f"{self.name} = {self.error if self.error else fmt(self.value)}"
+
+
+class Worksheet:
+    """变量单元格及其依赖图
+
+    values 是所有求值成功的变量的 名字 -> 值，随重算增量维护，可以直接作为求值的变量绑定。
+    dependents 记录 名字 -> 引用它的单元格，包括尚未定义的名字，定义之后引用者随之重算。
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.dependents = {}
+        self.values = {}
+        self.recomputed = 0  # 最近一次修改重算的单元格数
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, name):
+        return name in self.cells
+
+    def __getitem__(self, name):
+        return self.cells[name]
+
+    def assign(self, name, source):
+        """设置单元格公式并重算受影响的单元格，返回该单元格"""
+        if name in RESERVED or name in CONSTANTS or name in FUNCTIONS or name.startswith("_"):
+            raise ExpressionError(f"不能给 '{name}' 赋值")
+        old = self.cells.get(name)
+        compiled = old.compiled if old is not None and old.source == source else None
+        if compiled is None:
+            compiled = compile_expression(source)
+        for dep in compiled.params:
+            if dep in RESERVED:
+                raise ExpressionError(f"变量公式中不能使用 '{dep}'")
+        cycle = self._find_cycle(name, compiled.params)
+        if cycle:
+            raise ExpressionError("循环引用: " + " -> ".join(cycle))
+
+        before = None
+        if old is not None:
+            self._unlink(old)
+            before = _state(old)
+        cell = self.cells[name] = Cell(name, source, compiled)
+        for dep in cell.deps:
+            self.dependents.setdefault(dep, set()).add(name)
+        self._propagate(name, before)
+        return cell
+
+    def delete(self, name):
+        """删除单元格，引用它的单元格变为错误"""
+        cell = self.cells.pop(name, None)
+        if cell is None:
+            raise ExpressionError(f"未定义的变量 '{name}'")
+        self._unlink(cell)
+        self.values.pop(name, None)
+        self._propagate(name)
+
+    def extract(self, name):
+        """name 及其全部下游单元格的状态: 对 name 赋值或删除时只会读写这些单元格"""
+        names = ([name] if name in self.cells else []) + self._downstream(name)
+        return [self.cells[n].state() for n in names]
+
+    @classmethod
+    def restore(cls, states, values):
+        """用 extract 取出的单元格和全部变量的值 values 重建部分工作表，values 随重算更新"""
+        sheet = cls()
+        sheet.values = values
+        for state in states:
+            cell = sheet.cells[state[0]] = Cell.from_state(state)
+            for dep in cell.deps:
+                sheet.dependents.setdefault(dep, set()).add(cell.name)
+        return sheet
+
+    def states(self):
+        return [cell.state() for cell in self.cells.values()]
+
+    def update(self, sent, states, recomputed=0):
+        """合并工作进程执行命令后的单元格: sent 是交给它的单元格名，states 是它返回的全部单元格"""
+        returned = set()
+        for state in states:
+            name = state[0]
+            returned.add(name)
+            old = self.cells.get(name)
+            compiled = None
+            if old is not None:
+                self._unlink(old)
+                if old.source == state[1]:
+                    compiled = old.compiled
+            cell = self.cells[name] = Cell.from_state(state, compiled)
+            for dep in cell.deps:
+                self.dependents.setdefault(dep, set()).add(name)
+            if cell.error:
+                self.values.pop(name, None)
+            else:
+                self.values[name] = cell.value
+        for name in sent:
+            if name not in returned and name in self.cells:
+                self._unlink(self.cells.pop(name))
+                self.values.pop(name, None)
+        self.recomputed = recomputed
+
+    def clear(self):
+        self.cells.clear()
+        self.dependents.clear()
+        self.values.clear()
+
+    def _unlink(self, cell):
+        for dep in cell.deps:
+            users = self.dependents.get(dep)
+            if users is not None:
+                users.discard(cell.name)
+                if not users:
+                    del self.dependents[dep]
+
+    def _find_cycle(self, name, deps):
+        """给 name 设置依赖 deps 后是否成环，成环时返回环上的路径"""
+        # 从 deps 沿已有的依赖往下走，能走回 name 就成环
+        stack = [(dep, (name, dep)) for dep in deps]
+        seen = set()
+        while stack:
+            current, path = stack.pop()
+            if current == name:
+                return path
+            if current in seen:
+                continue
+            seen.add(current)
+            cell = self.cells.get(current)
+            if cell is not None:
+                stack.extend((dep, path + (dep,)) for dep in cell.deps)
+        return None
+
+    def _downstream(self, name):
+        """name 的所有下游单元格，按拓扑顺序（依赖在前）"""
+        order = []
+        visited = set()
+        # 迭代的后序遍历: 一个单元格在它的所有下游之后输出，反过来就是拓扑序
+        stack = [(name, False)]
+        while stack:
+            current, done = stack.pop()
+            if done:
+                order.append(current)
+                continue
+            if current in visited:
+                continue
+            visited.add(current)
+            stack.append((current, True))
+            for user in self.dependents.get(current, ()):
+                if user not in visited:
+                    stack.append((user, False))
+        order.reverse()
+        return order[1:]  # 不含 name 本身
+
+    def _propagate(self, name, before=None):
+        """name 已修改: 先算它自己，再按拓扑顺序重算值可能变化的下游
+
+        before 是 name 修改前的状态，重算后没有变化时下游不用动。
+        """
+        changed = {name}
+        self.recomputed = 0
+        if name in self.cells:
+            self._evaluate(self.cells[name])
+            if _state(self.cells[name]) == before:
+                return
+        for user in self._downstream(name):
+            cell = self.cells[user]
+            if not any(dep in changed for dep in cell.deps):
+                continue  # 上游重算后值都没变
+            before = _state(cell)
+            self._evaluate(cell)
+            if _state(cell) != before:
+                changed.add(user)
+
+    def _evaluate(self, cell):
+        self.recomputed += 1
+        if cell.compiled is None:
+            try:
+                cell.compiled = compile_expression(cell.source)
+            except Exception as e:
+                cell.error = f"错误: {e}"
+                cell.value = None
+                self.values.pop(cell.name, None)
+                return
+        args = []
+        for dep in cell.deps:
+            if dep in self.values:
+                args.append(self.values[dep])
+                continue
+            upstream = self.cells.get(dep)
+            cell.error = f"错误: 依赖的 '{dep}' 出错" if upstream else f"错误: 未定义的变量 '{dep}'"
+            cell.value = None
+            self.values.pop(cell.name, None)
+            return
+        try:
+            value = cell.compiled(*args)
+        except Exception as e:
+            cell.error = f"错误: {e}"
+            cell.value = None
+            self.values.pop(cell.name, None)
+            return
+        cell.error = None
+        cell.value = value
+        self.values[cell.name] = value
+
+    def summary(self, fmt=str):
+        """按定义顺序列出所有单元格，fmt 把值转成文本"""
+        return ", ".join(cell.display(fmt) for cell in self.cells.values())